@@ -0,0 +1,48 @@
+"""Chart core shared by the Streamlit app and scripts.
+
+Importing the package is cheap: submodules (and NumPy/Pillow with them) are
+loaded on first attribute access, so process-pool workers and CLIs only pay
+for what they use.
+"""
+
+import importlib
+
+_EXPORTS = {
+    "EMPTY": "grid",
+    "FILL": "grid",
+    "X": "grid",
+    "O": "grid",
+    "STITCH_NAMES": "grid",
+    "METHODS": "pattern",
+    "Pattern": "pattern",
+    "chart_editor": "editor",
+    "HgridFile": "hgrid",
+    "encode_hgrid": "hgrid",
+    "read_hgrid": "hgrid",
+    "write_hgrid": "hgrid",
+    "ChartStore": "store",
+    "VersionConflict": "store",
+    "RelayClient": "relay",
+    "serve_relay": "relay",
+    "iter_pdf": "pdf",
+    "pdf_bytes": "pdf",
+    "write_pdf": "pdf",
+    "render_array": "render",
+    "render_chart": "render",
+    "save_png": "render",
+    "encode_cells": "codecs",
+    "decode_cells": "codecs",
+    "pack_runs": "codecs",
+    "unpack_runs": "codecs",
+    "server_pattern_payload": "codecs",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
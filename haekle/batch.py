@@ -0,0 +1,201 @@
+"""Convert folders of photos to charts in parallel.
+
+    python -m haekle.batch photos/ "more/*.jpg" -o charts --cols 60 --method dither
+
+Each photo becomes <name>.json (rows, cols and base64 cells, as the editor
+stores them), <name>.hgrid (haekle.hgrid, opens in the editor), <name>.png
+(haekle.render) and <name>.pdf (haekle.pdf). Conversion is Pattern.from_image,
+the same pipeline as the in-app import. Photos are
+processed in a process pool with a bounded number of jobs in flight, and a
+manifest in the output folder records a content hash per photo so unchanged
+photos with unchanged settings are skipped on the next run.
+"""
+
+import argparse
+import concurrent.futures as cf
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif", ".tif", ".tiff"}
+FORMATS = ("json", "hgrid", "png", "pdf")
+MANIFEST_NAME = ".haekle-batch.json"
+
+
+def find_images(inputs):
+    """Image files from directories (not recursive), globs and plain paths,
+    in a stable order without duplicates."""
+    found = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            candidates = sorted(path.iterdir())
+        elif path.exists():
+            candidates = [path]
+        else:
+            candidates = [Path(p) for p in sorted(glob.glob(item, recursive=True))]
+        found.extend(p for p in candidates if p.is_file() and p.suffix.lower() in IMAGE_SUFFIXES)
+    return list(dict.fromkeys(p.resolve() for p in found))
+
+
+def output_names(paths):
+    """One output name per photo: the file stem, numbered when stems repeat."""
+    names, seen = [], {}
+    for p in paths:
+        n = seen.get(p.stem, 0) + 1
+        seen[p.stem] = n
+        names.append(p.stem if n == 1 else f"{p.stem}_{n}")
+    return names
+
+
+def content_hash(path, settings):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    h.update(json.dumps(settings, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def _write_atomic(path, data):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def convert_one(path, out_dir, name, settings):
+    """Worker: convert one photo and write its outputs. Returns (rows, cols)."""
+    from . import codecs
+    from .pattern import Pattern
+
+    pattern = Pattern.from_image(
+        path, settings["cols"], settings["rows"], method=settings["method"],
+        threshold=settings["threshold"], contrast=settings["contrast"], invert=settings["invert"],
+    )
+    out_dir = Path(out_dir)
+    formats = settings["formats"]
+    if "json" in formats:
+        chart = {"rows": pattern.rows, "cols": pattern.cols, "cells": codecs.encode_cells(pattern.to_bytes())}
+        _write_atomic(out_dir / f"{name}.json", json.dumps(chart).encode())
+    if "hgrid" in formats:
+        from .hgrid import encode_hgrid
+
+        _write_atomic(out_dir / f"{name}.hgrid", encode_hgrid(pattern))
+    if "png" in formats:
+        from .render import save_png
+
+        save_png(pattern, out_dir / f"{name}.png")
+    if "pdf" in formats:
+        from .pdf import write_pdf
+
+        tmp = out_dir / f"{name}.pdf.tmp"
+        write_pdf(pattern, tmp)
+        os.replace(tmp, out_dir / f"{name}.pdf")
+    return pattern.rows, pattern.cols
+
+
+def _load_manifest(out_dir):
+    try:
+        return json.loads((out_dir / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def run(paths, out_dir, settings, jobs=None, log=print):
+    """Convert paths into out_dir; returns (converted, skipped, failed)."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _load_manifest(out_dir)
+    total = len(paths)
+    done = converted = skipped = failed = 0
+
+    pending = []
+    for path, name in zip(paths, output_names(paths)):
+        digest = content_hash(path, settings)
+        outputs = [out_dir / f"{name}.{fmt}" for fmt in settings["formats"]]
+        if manifest.get(name) == digest and all(p.exists() for p in outputs):
+            done += 1
+            skipped += 1
+            log(f"[{done}/{total}] {path.name}: up to date")
+        else:
+            pending.append((path, name, digest))
+
+    jobs = jobs or os.cpu_count() or 1
+    # At most 2 jobs per worker in flight, so decoded photos and rendered
+    # charts never pile up in memory
+    window = 2 * jobs
+    with cf.ProcessPoolExecutor(max_workers=jobs, max_tasks_per_child=50) as pool:
+        queue = iter(pending)
+        running = {}
+
+        def submit_next():
+            item = next(queue, None)
+            if item is not None:
+                path, name, digest = item
+                running[pool.submit(convert_one, path, out_dir, name, settings)] = (item, time.perf_counter())
+
+        for _ in range(window):
+            submit_next()
+        while running:
+            finished, _ = cf.wait(running, return_when=cf.FIRST_COMPLETED)
+            for fut in finished:
+                (path, name, digest), started = running.pop(fut)
+                done += 1
+                try:
+                    rows, cols = fut.result()
+                except Exception as e:
+                    failed += 1
+                    manifest.pop(name, None)
+                    log(f"[{done}/{total}] {path.name}: FAILED ({e})")
+                else:
+                    converted += 1
+                    manifest[name] = digest
+                    log(f"[{done}/{total}] {path.name} -> {name} {cols}x{rows} ({time.perf_counter() - started:.1f} s)")
+                _write_atomic(out_dir / MANIFEST_NAME, json.dumps(manifest, indent=1, sort_keys=True).encode())
+                submit_next()
+    return converted, skipped, failed
+
+
+def main(argv=None):
+    from .pattern import METHODS
+
+    parser = argparse.ArgumentParser(prog="python -m haekle.batch", description="Convert photos to crochet charts.")
+    parser.add_argument("inputs", nargs="+", help="image files, directories or glob patterns")
+    parser.add_argument("-o", "--out-dir", required=True, help="folder for the charts")
+    parser.add_argument("--cols", type=int, default=23, help="chart width in stitches (default 23)")
+    parser.add_argument("--rows", type=int, default=None, help="chart height (default: from the photo's aspect ratio)")
+    parser.add_argument("--method", choices=METHODS, default="otsu")
+    parser.add_argument("--threshold", type=int, default=0, help="-100..100, higher fills more cells")
+    parser.add_argument("--contrast", type=int, default=0, help="percent")
+    parser.add_argument("--invert", action="store_true")
+    parser.add_argument("--formats", default=",".join(FORMATS),
+                        help=f"comma separated outputs out of {', '.join(FORMATS)} (default all)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    formats = [f.strip() for f in args.formats.split(",") if f.strip()]
+    unknown = set(formats) - set(FORMATS)
+    if unknown or not formats:
+        parser.error(f"--formats must be a comma separated subset of {', '.join(FORMATS)}")
+    if args.cols < 1 or (args.rows is not None and args.rows < 1):
+        parser.error("--cols and --rows must be at least 1")
+
+    paths = find_images(args.inputs)
+    if not paths:
+        parser.error("no images found")
+    settings = {
+        "cols": args.cols, "rows": args.rows, "method": args.method, "threshold": args.threshold,
+        "contrast": args.contrast, "invert": args.invert, "formats": sorted(formats),
+    }
+    log = lambda msg: print(msg, file=sys.stderr, flush=True)  # noqa: E731
+    converted, skipped, failed = run(paths, args.out_dir, settings, args.jobs, log)
+    log(f"{converted} converted, {skipped} up to date, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""Cell codecs shared with the editor.
+
+encode_cells/decode_cells match the editor's base64 encodeCells/decodeCells,
+and pack_runs/unpack_runs match its run-length packRuns/unpackRuns (the
+IndexedDB grid format, also the .hgrid rle payload). All work on flat
+row-major cells; runs are found and expanded with NumPy.
+"""
+
+import base64
+import uuid
+
+import numpy as np
+
+
+def encode_cells(cells):
+    return base64.b64encode(bytes(cells)).decode("ascii")
+
+
+def decode_cells(text):
+    return base64.b64decode(text)
+
+
+def pack_runs(cells):
+    """One byte per run: stitch code in the low 2 bits, length-1 in the high
+    6 bits. Runs of 64+ use 63 in the high bits followed by a varint of
+    length-64. cells is bytes or a uint8 array."""
+    if isinstance(cells, (bytes, bytearray, memoryview)):
+        flat = np.frombuffer(cells, dtype=np.uint8)
+    else:
+        flat = np.asarray(cells, dtype=np.uint8).ravel()
+    if not flat.size:
+        return b""
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(flat)) + 1, [flat.size]))
+    lengths = np.diff(bounds)
+    codes = flat[bounds[:-1]]
+    short = lengths < 64
+    if short.all():
+        return (((lengths - 1) << 2) | codes).astype(np.uint8).tobytes()
+    out = bytearray()
+    for code, length, is_short in zip(codes.tolist(), lengths.tolist(), short.tolist()):
+        if is_short:
+            out.append(((length - 1) << 2) | code)
+            continue
+        out.append((63 << 2) | code)
+        rest = length - 64
+        while rest >= 0x80:
+            out.append((rest & 0x7F) | 0x80)
+            rest >>= 7
+        out.append(rest)
+    return bytes(out)
+
+
+def unpack_runs(packed, length):
+    """length cells (bytes) from pack_runs output. Runs past the end are cut
+    and missing cells are empty, as in the editor; a varint cut off before
+    the end raises IndexError."""
+    packed = bytes(packed)
+    data = np.frombuffer(packed, dtype=np.uint8)
+    if not ((data >> 2) == 63).any():
+        # No long runs, so no varints: every byte is one run
+        codes, lengths = data & 3, (data >> 2).astype(np.int64) + 1
+    else:
+        codes, lengths = [], []
+        i, n, total = 0, len(packed), 0
+        while i < n and total < length:
+            b = packed[i]
+            i += 1
+            run = (b >> 2) + 1
+            if run == 64:
+                rest = shift = 0
+                while True:
+                    v = packed[i]
+                    i += 1
+                    rest |= (v & 0x7F) << shift
+                    shift += 7
+                    if not v & 0x80:
+                        break
+                run = 64 + rest
+            codes.append(b & 3)
+            lengths.append(min(run, length))
+            total += run
+        codes, lengths = np.array(codes, dtype=np.uint8), np.array(lengths, dtype=np.int64)
+    # Cut at length before expanding, so a bogus run cannot allocate more
+    ends = np.cumsum(lengths)
+    last = int(np.searchsorted(ends, length))
+    if last < len(lengths):
+        codes, lengths = codes[:last + 1], lengths[:last + 1].copy()
+        lengths[last] -= ends[last] - length
+    out = np.zeros(length, dtype=np.uint8)
+    cells = np.repeat(codes, lengths)
+    out[:cells.size] = cells
+    return out.tobytes()
+
+
+def server_pattern_payload(rows, cols, cells):
+    """JSON-ready chart for the editor's server_pattern argument; a fresh id
+    makes the editor apply it once."""
+    return {"id": uuid.uuid4().hex, "rows": rows, "cols": cols, "cells": encode_cells(cells)}
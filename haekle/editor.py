@@ -0,0 +1,115 @@
+"""The editor as a Streamlit component.
+
+frontend/ holds the editor's static files (index.html, CSS, scripts and
+workers). Streamlit serves them from its component server, so browsers cache
+them and a rerun only sends the component's arguments. jsPDF is loaded by the
+editor on the first PDF export from frontend/vendor/, falling back to the CDN.
+Vendoring it is a build step, run once per install (the app never downloads
+anything):
+
+    python -m haekle.editor [--integrity sha512-...]
+
+It downloads the pinned npm package and checks it against the sha512 that
+npm publishes for it (dist.integrity in the registry's metadata), or against
+--integrity when given, before anything is written.
+"""
+
+import argparse
+import base64
+import functools
+import hashlib
+import io
+import json
+import os
+import sys
+import tarfile
+import urllib.request
+from pathlib import Path
+
+FRONTEND_DIR = Path(__file__).with_name("frontend")
+JSPDF_VERSION = "2.5.1"   # Keep in step with JSPDF_SOURCES in editor.js
+# The npm package, so the licence comes with the script
+JSPDF_URL = f"https://registry.npmjs.org/jspdf/-/jspdf-{JSPDF_VERSION}.tgz"
+JSPDF_METADATA_URL = f"https://registry.npmjs.org/jspdf/{JSPDF_VERSION}"
+JSPDF_PATH = FRONTEND_DIR / "vendor" / "jspdf.umd.min.js"
+JSPDF_LICENSE_PATH = FRONTEND_DIR / "vendor" / "jspdf.LICENSE"
+
+
+@functools.lru_cache(maxsize=1)
+def _component():
+    import streamlit.components.v1 as components
+
+    return components.declare_component("haekle_editor", path=str(FRONTEND_DIR))
+
+
+def chart_editor(server_pattern=None, sync=None, relay=None, height=1200, key="editor"):
+    """Show the editor. server_pattern (a dict from
+    codecs.server_pattern_payload, or None) is applied by the editor once.
+    sync is the chart store's latest reply (see store.py). relay is the
+    WebSocket URL of the chart's room on a relay (see relay.py), or None to
+    edit alone. Returns the editor's latest sync message, or None until it
+    has sent one."""
+    return _component()(server_pattern=server_pattern, sync=sync, relay=relay, height=height, key=key, default=None)
+
+
+def _write_atomic(path, data):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _fetch(url):
+    with urllib.request.urlopen(url, timeout=60) as response:
+        return response.read()
+
+
+def published_integrity(metadata_url=JSPDF_METADATA_URL):
+    """The tarball's integrity string ("sha512-<base64>") from npm's metadata."""
+    integrity = json.loads(_fetch(metadata_url))["dist"]["integrity"]
+    if not integrity.startswith("sha512-"):
+        raise ValueError(f"No sha512 published for jsPDF {JSPDF_VERSION}: {integrity}")
+    return integrity
+
+
+def check_integrity(data, integrity):
+    """Raise ValueError unless data has the given "sha512-<base64>" digest."""
+    algorithm, _, expected = integrity.partition("-")
+    if algorithm != "sha512":
+        raise ValueError(f"Only sha512 integrity is supported, got {integrity}")
+    actual = base64.b64encode(hashlib.sha512(data).digest()).decode()
+    if actual != expected:
+        raise ValueError(f"jsPDF tarball is sha512-{actual}, expected {integrity}")
+
+
+def vendor_jspdf(path=JSPDF_PATH, url=JSPDF_URL, integrity=None, metadata_url=JSPDF_METADATA_URL):
+    """Download jsPDF and its licence (jspdf.LICENSE) next to the editor so
+    PDF export works offline. The tarball must match integrity, by default
+    the one npm publishes; nothing is written when it does not."""
+    path = Path(path)
+    integrity = integrity or published_integrity(metadata_url)
+    data = _fetch(url)
+    check_integrity(data, integrity)
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tar:
+        version = json.load(tar.extractfile("package/package.json"))["version"]
+        if version != JSPDF_VERSION:
+            raise ValueError(f"Expected jsPDF {JSPDF_VERSION}, got {version}")
+        script = tar.extractfile("package/dist/jspdf.umd.min.js").read()
+        licence = tar.extractfile("package/LICENSE").read()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Licence first: the script's presence is what marks the copy complete
+    _write_atomic(path.with_name("jspdf.LICENSE"), licence)
+    _write_atomic(path, script)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m haekle.editor",
+                                     description=f"Vendor jsPDF {JSPDF_VERSION} for the editor.")
+    parser.add_argument("--integrity", help="expected tarball digest, sha512-<base64> (default: npm's published one)")
+    args = parser.parse_args(argv)
+    print(f"jsPDF {JSPDF_VERSION} -> {vendor_jspdf(integrity=args.integrity)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+// Chart codecs shared with haekle/codecs.py and haekle/hgrid.py: base64
+// cells, run-length packing and .hgrid files. No DOM access, so the tests
+// can run them in node (tests/test_frontend_codecs.py).
+
+// Base64 keeps the saved grid at ~1.3 bytes per cell in localStorage
+function encodeCells(cells){
+  let bin = '';
+  for(let i=0; i<cells.length; i+=0x8000){
+    bin += String.fromCharCode.apply(null, cells.subarray(i, i + 0x8000));
+  }
+  return btoa(bin);
+}
+function decodeCells(str){
+  const bin = atob(str);
+  const out = new Uint8Array(bin.length);
+  for(let i=0; i<bin.length; i++) out[i] = bin.charCodeAt(i);
+  return out;
+}
+
+// Run-length packing for IndexedDB. Each run is one byte: the stitch code in
+// the low 2 bits and length-1 in the high 6 bits. Runs of 64+ cells use 63
+// in the high bits and are followed by a varint of length-64.
+function packRuns(cells){
+  const out = [];
+  for(let i=0; i<cells.length; ){
+    const code = cells[i];
+    let end = i + 1;
+    while(end < cells.length && cells[end] === code) end++;
+    const len = end - i;
+    if(len < 64){
+      out.push(((len - 1) << 2) | code);
+    } else {
+      out.push((63 << 2) | code);
+      let rest = len - 64;
+      while(rest >= 0x80){ out.push((rest & 0x7f) | 0x80); rest = Math.floor(rest / 128); }
+      out.push(rest);
+    }
+    i = end;
+  }
+  return Uint8Array.from(out);
+}
+function unpackRuns(packed, length){
+  const out = new Uint8Array(length);
+  let pos = 0;
+  for(let i=0; i<packed.length && pos<length; ){
+    const b = packed[i++];
+    const code = b & 3;
+    let len = (b >> 2) + 1;
+    if(len === 64){
+      let rest = 0, mul = 1, v;
+      do { v = packed[i++]; rest += (v & 0x7f) * mul; mul *= 128; } while(v & 0x80);
+      len = 64 + rest;
+    }
+    out.fill(code, pos, Math.min(length, pos + len));
+    pos += len;
+  }
+  return out;
+}
+
+// .hgrid chart files, shared with haekle/hgrid.py (the layout is documented
+// there): a 24-byte header, the stitch names as palette, then the cells 2-bit
+// packed per row, or run-length packed in chunks of HGRID_CHUNK_ROWS rows
+// behind an index of chunk offsets when that is smaller.
+const HGRID_MAGIC = 'HGRD';
+const HGRID_VERSION = 1;
+const HGRID_RAW = 0, HGRID_PACKED = 1, HGRID_RLE = 2;
+const HGRID_CHUNK_ROWS = 64;
+const HGRID_HEADER_BYTES = 24;
+
+function encodeHgrid(rows, cols, cells){
+  const chunks = [];
+  for(let r=0; r<rows; r+=HGRID_CHUNK_ROWS){
+    chunks.push(packRuns(cells.subarray(r * cols, Math.min(rows, r + HGRID_CHUNK_ROWS) * cols)));
+  }
+  const rowBytes = Math.ceil(cols / 4);
+  const indexBytes = 8 * (chunks.length + 1);
+  const rleBytes = chunks.reduce((n, c) => n + c.length, 0);
+  const rle = rleBytes + indexBytes < rows * rowBytes;
+
+  const names = STITCH_NAMES.map(name => new TextEncoder().encode(name || ''));
+  const paletteBytes = names.reduce((n, b) => n + 1 + b.length, 0);
+  const payloadOffset = HGRID_HEADER_BYTES + paletteBytes + (rle ? indexBytes : 0);
+  const out = new Uint8Array(payloadOffset + (rle ? rleBytes : rows * rowBytes));
+  const view = new DataView(out.buffer);
+  for(let i=0; i<4; i++) out[i] = HGRID_MAGIC.charCodeAt(i);
+  out[4] = HGRID_VERSION;
+  out[5] = rle ? HGRID_RLE : HGRID_PACKED;
+  out[6] = names.length;
+  view.setUint32(8, rows, true);
+  view.setUint32(12, cols, true);
+  view.setUint32(16, rle ? HGRID_CHUNK_ROWS : 0, true);
+  view.setUint32(20, payloadOffset, true);
+  let pos = HGRID_HEADER_BYTES;
+  for(const name of names){
+    out[pos++] = name.length;
+    out.set(name, pos);
+    pos += name.length;
+  }
+
+  if(rle){
+    // u64 offsets, written as two u32 halves
+    let offset = 0;
+    for(let k=0; k<=chunks.length; k++){
+      view.setUint32(pos + 8*k, offset % 0x100000000, true);
+      view.setUint32(pos + 8*k + 4, Math.floor(offset / 0x100000000), true);
+      if(k < chunks.length){
+        out.set(chunks[k], payloadOffset + offset);
+        offset += chunks[k].length;
+      }
+    }
+  } else {
+    for(let r=0; r<rows; r++){
+      const base = payloadOffset + r * rowBytes;
+      for(let c=0; c<cols; c++){
+        out[base + (c >> 2)] |= cells[r * cols + c] << ((c & 3) * 2);
+      }
+    }
+  }
+  return out;
+}
+
+function decodeHgrid(buffer){
+  const buf = new Uint8Array(buffer);
+  const view = new DataView(buf.buffer, buf.byteOffset, buf.byteLength);
+  if(buf.length < HGRID_HEADER_BYTES || String.fromCharCode(buf[0], buf[1], buf[2], buf[3]) !== HGRID_MAGIC){
+    throw new Error('Not a .hgrid file');
+  }
+  if(buf[4] !== HGRID_VERSION) throw new Error('Unsupported .hgrid version ' + buf[4]);
+  const encoding = buf[5];
+  const rows = view.getUint32(8, true), cols = view.getUint32(12, true);
+  const chunkRows = view.getUint32(16, true), payloadOffset = view.getUint32(20, true);
+  if(rows < 1 || cols < 1) throw new Error('Empty .hgrid chart');
+
+  // File codes -> our codes, by stitch name
+  const decoder = new TextDecoder();
+  const remap = new Uint8Array(buf[6]);
+  let pos = HGRID_HEADER_BYTES;
+  for(let k=0; k<buf[6]; k++){
+    const n = buf[pos++];
+    const name = decoder.decode(buf.subarray(pos, pos + n));
+    pos += n;
+    if(name && !(name in STITCH_CODES)) throw new Error('Unknown stitch ' + name);
+    remap[k] = name ? STITCH_CODES[name] : EMPTY;
+  }
+
+  const n = rows * cols;
+  const cells = new Uint8Array(n);
+  const rowBytes = Math.ceil(cols / 4);
+  if(encoding === HGRID_RAW || encoding === HGRID_PACKED){
+    const size = encoding === HGRID_RAW ? n : rows * rowBytes;
+    if(payloadOffset + size > buf.length) throw new Error('Truncated .hgrid file');
+    if(encoding === HGRID_RAW){
+      cells.set(buf.subarray(payloadOffset, payloadOffset + n));
+    } else {
+      for(let r=0; r<rows; r++){
+        const base = payloadOffset + r * rowBytes;
+        for(let c=0; c<cols; c++){
+          cells[r * cols + c] = (buf[base + (c >> 2)] >> ((c & 3) * 2)) & 3;
+        }
+      }
+    }
+  } else if(encoding === HGRID_RLE){
+    if(!chunkRows){
+      cells.set(unpackRuns(buf.subarray(payloadOffset), n));
+    } else {
+      const chunkCount = Math.ceil(rows / chunkRows);
+      const offsetAt = (k) => view.getUint32(pos + 8*k, true) + view.getUint32(pos + 8*k + 4, true) * 0x100000000;
+      for(let k=0; k<chunkCount; k++){
+        const start = payloadOffset + offsetAt(k), end = payloadOffset + offsetAt(k + 1);
+        if(end > buf.length) throw new Error('Truncated .hgrid file');
+        const chunkCells = (Math.min(rows, (k + 1) * chunkRows) - k * chunkRows) * cols;
+        cells.set(unpackRuns(buf.subarray(start, end), chunkCells), k * chunkRows * cols);
+      }
+    }
+  } else {
+    throw new Error('Unknown .hgrid encoding ' + encoding);
+  }
+  // As in haekle/hgrid.py: a code the palette does not name is an error
+  for(let i=0; i<n; i++){
+    if(cells[i] >= remap.length) throw new Error('.hgrid cell code outside the palette');
+    cells[i] = remap[cells[i]];
+  }
+  return { rows, cols, cells };
+}
@@ -0,0 +1,2020 @@
+// --- EDITOR STATE ---
+let history = [], redoStack = [];
+
+// Workers load the same asset version as this script (index.html's ?v=)
+const ASSET_QUERY = document.currentScript ? new URL(document.currentScript.src).search : '';
+
+let isPanLocked = false;
+let scale = 1.0;
+const minScale = 0.2, maxScale = 4.0;
+
+const canvas = document.getElementById('c');
+const ctx = canvas ? canvas.getContext('2d') : null;
+const vp = document.getElementById('vp');
+const scrollSpacer = document.getElementById('scrollSpacer');
+const VIEWPORT_BG = "#34495e";
+
+// Validate canvas is available
+if(!canvas || !ctx){
+  console.error('Canvas element not found or context not available');
+  const errorDiv = document.createElement('div');
+  errorDiv.style.cssText = 'padding:20px;color:white;text-align:center;';
+  errorDiv.textContent = 'Fejl: Canvas kunne ikke indlæses. Prøv at genindlæse siden.';
+  document.body.appendChild(errorDiv);
+  throw new Error('Canvas not available');
+}
+
+// Pointer tracking
+const pointers = new Map();
+let drawing = false;
+let lastCell = { r: -1, c: -1 };
+
+// Performance: debounced draw and save
+let drawPending = false;
+let fullRedrawPending = false;
+const dirtyCells = new Set();
+const DIRTY_FULL_REDRAW_LIMIT = 2000; // Above this many changed cells one full redraw is cheaper
+let autoSavePending = false;
+const LARGE_GRID_CELLS = 4000000; // Ask before resizing beyond 2000×2000
+const MAX_GRID_SIDE = 65535;      // Rows and cols are u16 in the relay protocol
+const MAX_GRID_CELLS = 1 << 26;   // Largest chart, also for the chart store (grid.py)
+const AUTO_SAVE_DEBOUNCE_MS = 500; // Delay before saving to reduce localStorage writes
+const PERSIST_IDLE_TIMEOUT_MS = 2000; // Longest wait for idle time before an IndexedDB write
+const HISTORY_BYTE_BUDGET = 8 * 1024 * 1024;       // Undo log kept in memory
+const SAVED_HISTORY_BYTE_BUDGET = 512 * 1024;      // Newest part of it written to localStorage
+const IDB_HISTORY_BYTE_BUDGET = 2 * 1024 * 1024;   // ... or to IndexedDB
+
+// Older versions saved nested arrays of 'fill'/'X'/'O'/null
+function cellsFromLegacy(nested, rows, cols){
+  const out = createGrid(rows, cols);
+  for(let r=0; r<rows; r++){
+    const row = nested[r] || [];
+    for(let c=0; c<cols; c++){
+      out[r * cols + c] = STITCH_CODES[row[c]] || EMPTY;
+    }
+  }
+  return out;
+}
+
+function loadSavedCells(saved, rows, cols){
+  const cells = saved.charAt(0) === '['
+    ? cellsFromLegacy(JSON.parse(saved), rows, cols)
+    : decodeCells(saved);
+  if(cells.length !== rows * cols) throw new Error('Saved grid does not match its size');
+  return cells;
+}
+
+// --- PANEL / HELP ---
+function togglePanel(){
+  const panel = document.getElementById('panel');
+  const bd = document.getElementById('panelBackdrop');
+  const isOpen = panel.style.display === 'block';
+  panel.style.display = isOpen ? 'none' : 'block';
+  bd.style.display = isOpen ? 'none' : 'block';
+  measureToolbarHeight();
+}
+function closePanelFromBackdrop(e){
+  if(e.target && e.target.id === 'panelBackdrop') togglePanel();
+}
+
+function toggleHelp(){
+  const bd = document.getElementById('helpBackdrop');
+  const isOpen = bd.style.display === 'flex';
+  bd.style.display = isOpen ? 'none' : 'flex';
+}
+function closeHelpFromBackdrop(e){
+  if(e.target && e.target.id === 'helpBackdrop') toggleHelp();
+}
+
+function clamp(v, a, b){ return Math.max(a, Math.min(b, v)); }
+
+function setScale(newScale){
+  scale = clamp(newScale, minScale, maxScale);
+  invalidateGeometry();
+  updateScrollSpacer();
+  requestFullDraw();
+  // Pinch-zoom calls this on every pointermove; the write is batched
+  schedulePersist('settings');
+}
+
+function measureToolbarHeight(){
+  const tb = document.getElementById('toolbar');
+  const h = tb.getBoundingClientRect().height;
+  document.documentElement.style.setProperty('--toolbar-h', `${Math.ceil(h)}px`);
+  invalidateGeometry();
+}
+window.addEventListener('resize', measureToolbarHeight);
+
+// --- PERSISTENCE ---
+// The grid (run-length packed), the newest undo history and UI settings are
+// kept in IndexedDB. Edits only mark a key dirty; all dirty keys are written
+// together in one transaction when the browser is idle. When IndexedDB is
+// unavailable the old localStorage format is used, and existing localStorage
+// data is moved to IndexedDB on first load.
+const IDB_NAME = 'haekleGrid', IDB_STORE = 'state';
+const LEGACY_KEYS = ['haekleGridData', 'haekleGridRows', 'haekleGridCols', 'haekleGridScale', 'haekleGridHistory', 'haekleGridServerPattern'];
+let dbPromise = null;
+let storeReady = false;       // Nothing is saved before the saved state is restored
+let useLocalStorage = false;
+const dirtyKeys = new Set();
+let persistScheduled = false;
+
+function openStore(){
+  if(!dbPromise){
+    dbPromise = new Promise((resolve) => {
+      try {
+        const req = indexedDB.open(IDB_NAME, 1);
+        req.onupgradeneeded = () => req.result.createObjectStore(IDB_STORE);
+        req.onsuccess = () => resolve(req.result);
+        req.onerror = () => {
+          console.warn('Could not open IndexedDB:', req.error);
+          resolve(null);
+        };
+      } catch(e){
+        console.warn('IndexedDB not available:', e);
+        resolve(null);
+      }
+    });
+  }
+  return dbPromise;
+}
+
+function idbDone(tx){
+  return new Promise((resolve, reject) => {
+    tx.oncomplete = () => resolve();
+    tx.onerror = () => reject(tx.error);
+    tx.onabort = () => reject(tx.error);
+  });
+}
+
+async function idbGetMany(keys){
+  const db = await openStore();
+  const tx = db.transaction(IDB_STORE, 'readonly');
+  const st = tx.objectStore(IDB_STORE);
+  const out = {};
+  for(const k of keys){
+    const req = st.get(k);
+    req.onsuccess = () => { out[k] = req.result; };
+  }
+  await idbDone(tx);
+  return out;
+}
+
+// Value written for each persisted key, built from the state at flush time
+function persistValue(key){
+  if(key === 'grid') return { rows: ROWS, cols: COLS, cells: packRuns(gridData) };
+  if(key === 'history') return newestHistory(IDB_HISTORY_BYTE_BUDGET);
+  if(key === 'settings'){
+    return {
+      scale,
+      pdfPreset: document.getElementById('pdfPreset').value,
+      importMethod: document.getElementById('importMethod').value,
+      serverPatternId,
+    };
+  }
+  return null;
+}
+
+function schedulePersist(...keys){
+  if(!storeReady) return;
+  if(useLocalStorage){
+    requestLocalSave();
+    return;
+  }
+  keys.forEach(k => dirtyKeys.add(k));
+  if(persistScheduled) return;
+  persistScheduled = true;
+  const run = () => {
+    persistScheduled = false;
+    flushPersist();
+  };
+  if(window.requestIdleCallback) requestIdleCallback(run, { timeout: PERSIST_IDLE_TIMEOUT_MS });
+  else setTimeout(run, AUTO_SAVE_DEBOUNCE_MS);
+}
+
+async function flushPersist(){
+  if(!dirtyKeys.size) return true;
+  const keys = Array.from(dirtyKeys);
+  dirtyKeys.clear();
+  try {
+    const db = await openStore();
+    const tx = db.transaction(IDB_STORE, 'readwrite');
+    const st = tx.objectStore(IDB_STORE);
+    for(const k of keys) st.put(persistValue(k), k);
+    await idbDone(tx);
+    return true;
+  } catch(e){
+    console.error('Save error:', e);
+    if(e && e.name === 'QuotaExceededError'){
+      alert('Kunne ikke gemme data - hukommelsen er fuld. Eksporter dit mønster nu!');
+    }
+    return false;
+  }
+}
+
+// Flush right away when the tab is hidden, since idle time may never come
+document.addEventListener('visibilitychange', () => {
+  if(document.visibilityState !== 'hidden' || !storeReady) return;
+  if(useLocalStorage) autoSave();
+  else flushPersist();
+});
+
+function init(){
+  // Start with an empty grid so the editor is usable at once; the saved
+  // chart is restored asynchronously and replaces it
+  gridData = createGrid(ROWS, COLS);
+  updateCanvas();
+  setScale(1.0);
+  measureToolbarHeight();
+  updateModeStyle();
+
+  restoreSaved()
+    .catch(e => console.error('Initialization error:', e))
+    .finally(() => {
+      storeReady = true;
+      handleSyncReply(syncReply);
+      applyServerPattern();
+      collabConnect(relayUrl);
+    });
+  Streamlit.ready();
+}
+
+async function restoreSaved(){
+  const db = await openStore();
+  if(!db){
+    useLocalStorage = true;
+    applySaved(readLocalStorage());
+    return;
+  }
+
+  const saved = await idbGetMany(['grid', 'history', 'settings']);
+  if(saved.grid){
+    const { rows, cols } = saved.grid;
+    applySaved({
+      rows, cols,
+      cells: unpackRuns(saved.grid.cells, rows * cols),
+      history: Array.isArray(saved.history) ? saved.history : [],
+      settings: saved.settings,
+    });
+    return;
+  }
+
+  // First run with IndexedDB: move the localStorage data over
+  const legacy = readLocalStorage();
+  applySaved(legacy);
+  if(legacy.cells){
+    storeReady = true;
+    ['grid', 'history', 'settings'].forEach(k => dirtyKeys.add(k));
+    if(await flushPersist()) LEGACY_KEYS.forEach(k => localStorage.removeItem(k));
+  }
+}
+
+// Saved state as written by autoSave(); cells is null when nothing is saved
+function readLocalStorage(){
+  const state = { cells: null, history: [], settings: {} };
+  try {
+    const saved = localStorage.getItem('haekleGridData');
+    const sRows = localStorage.getItem('haekleGridRows');
+    const sCols = localStorage.getItem('haekleGridCols');
+    const sScale = localStorage.getItem('haekleGridScale');
+    const sHistory = localStorage.getItem('haekleGridHistory');
+    if(sScale) state.settings.scale = parseFloat(sScale);
+    state.settings.serverPatternId = localStorage.getItem('haekleGridServerPattern');
+
+    if(saved && sRows && sCols){
+      state.rows = parseInt(sRows, 10);
+      state.cols = parseInt(sCols, 10);
+      state.cells = loadSavedCells(saved, state.rows, state.cols);
+
+      // Restore undo history
+      if(sHistory){
+        try {
+          state.history = decodeHistory(JSON.parse(sHistory));
+        } catch(e){
+          console.warn('Could not restore history:', e);
+        }
+      }
+    }
+  } catch(e){
+    console.error('Error parsing saved data:', e);
+    state.cells = null;
+  }
+  return state;
+}
+
+function applySaved(state){
+  const settings = state.settings || {};
+  if(settings.pdfPreset) document.getElementById('pdfPreset').value = settings.pdfPreset;
+  if(IMPORT_METHODS.includes(settings.importMethod)) document.getElementById('importMethod').value = settings.importMethod;
+  if(state.cells && state.cells.length === state.rows * state.cols){
+    history = state.history;
+    historyBytes = history.reduce((sum, op) => sum + opBytes(op), 0);
+    redoStack = [];
+    setGridSize(state.rows, state.cols, state.cells);
+  }
+  if(settings.scale) setScale(settings.scale);
+  if(settings.serverPatternId) serverPatternId = settings.serverPatternId;
+}
+
+// localStorage fallback (text only, so cells and history are base64 encoded)
+function requestLocalSave(){
+  if(autoSavePending) return;
+  autoSavePending = true;
+  setTimeout(() => {
+    autoSave();
+    autoSavePending = false;
+  }, AUTO_SAVE_DEBOUNCE_MS);
+}
+
+function autoSave(){
+  try {
+    localStorage.setItem('haekleGridData', encodeCells(gridData));
+    localStorage.setItem('haekleGridRows', ROWS);
+    localStorage.setItem('haekleGridCols', COLS);
+    localStorage.setItem('haekleGridScale', String(scale));
+    if(serverPatternId) localStorage.setItem('haekleGridServerPattern', serverPatternId);
+
+    // Save the newest undo history (limited by SAVED_HISTORY_BYTE_BUDGET)
+    localStorage.setItem('haekleGridHistory', JSON.stringify(encodeHistory()));
+  } catch(e){
+    if(e.name === 'QuotaExceededError'){
+      console.warn('Storage quota exceeded. Clearing old history...');
+      // Try saving without history
+      try {
+        localStorage.removeItem('haekleGridHistory');
+        localStorage.setItem('haekleGridData', encodeCells(gridData));
+        localStorage.setItem('haekleGridRows', ROWS);
+        localStorage.setItem('haekleGridCols', COLS);
+      } catch(e2){
+        console.error('Could not save data:', e2);
+        alert('Kunne ikke gemme data - hukommelsen er fuld. Eksporter dit mønster nu!');
+      }
+    } else {
+      console.error('Save error:', e);
+    }
+  }
+}
+
+// --- RESIZE ---
+function resizeGrid(){
+  const nR = clamp(parseInt(document.getElementById('rows').value || "1", 10), 1, MAX_GRID_SIDE);
+  const nC = clamp(parseInt(document.getElementById('cols').value || "1", 10), 1, MAX_GRID_SIDE);
+  if(nR * nC > MAX_GRID_CELLS){
+    alert(`Griddet kan højst have ${MAX_GRID_CELLS} celler (${nR}×${nC} = ${nR*nC}).`);
+    return;
+  }
+
+  // Warn about very large grids
+  if(nR * nC > LARGE_GRID_CELLS){
+    if(!confirm(`Dette er et meget stort grid (${nR}×${nC} = ${nR*nC} celler). Det kan være langsomt. Fortsæt?`)){
+      return;
+    }
+  }
+
+  commitStroke();
+  recordResize(nR, nC);
+  setGridSize(nR, nC, resizeCells(gridData, ROWS, COLS, nR, nC));
+  requestAutoSave();
+}
+
+// --- VIEWPORT ---
+// The editor canvas covers only the visible part of #vp. Chart coordinates
+// (unscaled px, grid starting at OFFSET) map to the screen as
+//   screen = chart * scale - scroll
+// and both draw() and getCellFromClient() go through that mapping.
+function chartWidth(){ return (COLS * SIZE) + OFFSET; }
+function chartHeight(){ return (ROWS * SIZE) + OFFSET; }
+
+function updateScrollSpacer(){
+  scrollSpacer.style.width = `${Math.ceil(chartWidth() * scale)}px`;
+  scrollSpacer.style.height = `${Math.ceil(chartHeight() * scale)}px`;
+}
+
+function resizeViewportCanvas(){
+  const dpr = window.devicePixelRatio || 1;
+  const w = vp.clientWidth, h = vp.clientHeight;
+  canvas.style.width = `${w}px`;
+  canvas.style.height = `${h}px`;
+  canvas.width = Math.max(1, Math.round(w * dpr));
+  canvas.height = Math.max(1, Math.round(h * dpr));
+  invalidateGeometry();
+  draw();
+}
+
+function applyViewTransform(){
+  const dpr = canvas.width / Math.max(1, vp.clientWidth);
+  const k = scale * dpr;
+  ctx.setTransform(k, 0, 0, k, -vp.scrollLeft * dpr, -vp.scrollTop * dpr);
+}
+
+// Visible area in chart coordinates and the cell range it covers
+function visibleRegion(){
+  const x0 = vp.scrollLeft / scale, y0 = vp.scrollTop / scale;
+  const x1 = x0 + vp.clientWidth / scale, y1 = y0 + vp.clientHeight / scale;
+  return {
+    x0, y0, x1, y1,
+    c0: clamp(Math.floor((x0 - OFFSET) / SIZE), 0, COLS),
+    c1: clamp(Math.ceil((x1 - OFFSET) / SIZE), 0, COLS),
+    r0: clamp(Math.floor((y0 - OFFSET) / SIZE), 0, ROWS),
+    r1: clamp(Math.ceil((y1 - OFFSET) / SIZE), 0, ROWS),
+  };
+}
+
+function updateCanvas(){
+  invalidateGridLayer();
+  updateScrollSpacer();
+  resizeViewportCanvas();
+}
+
+vp.addEventListener('scroll', () => {
+  invalidateGeometry();
+  requestFullDraw();
+}, { passive: true });
+if(window.ResizeObserver){
+  new ResizeObserver(() => resizeViewportCanvas()).observe(vp);
+} else {
+  window.addEventListener('resize', resizeViewportCanvas);
+}
+
+// The editor's pixel ratio changes with every zoom step; rounding it up to a
+// power of two keeps the number of atlases small while glyphs stay sharp
+function editorGlyphRatio(){
+  const dpr = window.devicePixelRatio || 1;
+  return Math.pow(2, Math.ceil(Math.log2(clamp(scale * dpr, 0.25, 8))));
+}
+
+// --- LEVEL OF DETAIL ---
+// Chosen from the on-screen cell size (SIZE*scale in CSS px). Below each
+// threshold the editor drops detail that would be invisible anyway.
+const LOD_MINOR_LINES_MIN_PX = 10; // thinner: only every 5th/10th grid line
+const LOD_GLYPHS_MIN_PX = 12;      // smaller: X/O become solid tints
+const LOD_BITMAP_BELOW_PX = 7;     // smaller: cells drawn as a 1px-per-cell bitmap
+
+function detailLevel(){
+  const cellPx = SIZE * scale;
+  return {
+    minorLines: cellPx >= LOD_MINOR_LINES_MIN_PX,
+    glyphs: cellPx >= LOD_GLYPHS_MIN_PX,
+    bitmap: cellPx < LOD_BITMAP_BELOW_PX,
+  };
+}
+
+// Visible cells become one pixel each on a small canvas that is scaled up
+// with smoothing off, so the cost is one drawImage regardless of zoom.
+let lodCanvas = null, lodImage = null;
+function drawCellsBitmap(tCtx, s, ox, oy, r0, r1, c0, c1){
+  const w = c1 - c0, h = r1 - r0;
+  if(w <= 0 || h <= 0) return;
+  if(!lodCanvas) lodCanvas = createCanvas(w, h);
+  if(lodCanvas.width !== w || lodCanvas.height !== h){
+    lodCanvas.width = w;
+    lodCanvas.height = h;
+    lodImage = null;
+  }
+  const lCtx = lodCanvas.getContext('2d');
+  if(!lodImage) lodImage = lCtx.createImageData(w, h);
+  const px = new Uint32Array(lodImage.data.buffer);
+  for(let r=r0;r<r1;r++){
+    const row = gridRow(r);
+    const base = (r - r0) * w - c0;
+    for(let c=c0;c<c1;c++) px[base + c] = STITCH_RGBA[row[c]];
+  }
+  lCtx.putImageData(lodImage, 0, 0);
+  tCtx.imageSmoothingEnabled = false;
+  tCtx.drawImage(lodCanvas, 0, 0, w, h, c0*s + ox, r0*s + oy, w*s, h*s);
+  tCtx.imageSmoothingEnabled = true;
+}
+
+// Editor view: only the rows and columns inside the viewport are drawn
+function draw(){
+  ctx.setTransform(1, 0, 0, 1, 0, 0);
+  ctx.fillStyle = VIEWPORT_BG;
+  ctx.fillRect(0, 0, canvas.width, canvas.height);
+
+  applyViewTransform();
+  const view = visibleRegion();
+  ctx.fillStyle = "white";
+  ctx.fillRect(0, 0, chartWidth(), chartHeight());
+  const layer = getGridLayer(SIZE);
+  const lod = detailLevel();
+  if(lod.bitmap){
+    // The bitmap covers whole cells, so the lines go on top of it
+    drawCellsBitmap(ctx, SIZE, OFFSET, OFFSET, view.r0, view.r1, view.c0, view.c1);
+    strokeGridPaths(ctx, layer.paths, OFFSET, OFFSET, false);
+  } else {
+    strokeGridPaths(ctx, layer.paths, OFFSET, OFFSET, lod.minorLines);
+    drawCells(ctx, SIZE, OFFSET, OFFSET, view.r0, view.r1, view.c0, view.c1, editorGlyphRatio(), lod.glyphs);
+  }
+  drawNumbering(ctx, layer, OFFSET, OFFSET, view);
+
+  dirtyCells.clear();
+  fullRedrawPending = false;
+}
+
+// Repaint one cell rectangle. The clip reaches 1px past the cell so the
+// border lines and the neighbours' fills that overlap it are redrawn too.
+// Expects the view transform to be set.
+function repaintCell(r, c, lod){
+  const s = SIZE, x = c*s + OFFSET, y = r*s + OFFSET;
+  const r0 = Math.max(0, r-1), r1 = Math.min(ROWS, r+2);
+  const c0 = Math.max(0, c-1), c1 = Math.min(COLS, c+2);
+  ctx.save();
+  ctx.beginPath();
+  ctx.rect(x-1, y-1, s+2, s+2);
+  ctx.clip();
+  ctx.fillStyle = "white";
+  ctx.fillRect(x-1, y-1, s+2, s+2);
+  strokeGridPaths(ctx, buildGridPaths(s, r0, r1, c0, c1), OFFSET, OFFSET, lod.minorLines);
+  drawCells(ctx, s, OFFSET, OFFSET, r0, r1, c0, c1, editorGlyphRatio(), lod.glyphs);
+  ctx.restore();
+}
+
+// Changed cells are queued and repainted on the next animation frame
+function markDirty(i){
+  if(fullRedrawPending) return;
+  dirtyCells.add(i);
+  if(dirtyCells.size > DIRTY_FULL_REDRAW_LIMIT){
+    dirtyCells.clear();
+    fullRedrawPending = true;
+  }
+  requestDraw();
+}
+function requestFullDraw(){
+  fullRedrawPending = true;
+  dirtyCells.clear();
+  requestDraw();
+}
+
+function flushDraw(){
+  const lod = detailLevel();
+  // In bitmap mode a full redraw is a single drawImage anyway
+  if(fullRedrawPending || lod.bitmap){ draw(); return; }
+  applyViewTransform();
+  const view = visibleRegion();
+  for(const i of dirtyCells){
+    const r = Math.floor(i / COLS), c = i % COLS;
+    if(r < view.r0 - 1 || r > view.r1 || c < view.c0 - 1 || c > view.c1) continue;
+    repaintCell(r, c, lod);
+  }
+  dirtyCells.clear();
+}
+
+// Debounced draw for performance during fast drawing
+function requestDraw(){
+  if(drawPending) return;
+  drawPending = true;
+  requestAnimationFrame(() => {
+    // Pointer samples queued since the last frame are applied first, so
+    // they are painted in this same frame. An error must not leave
+    // drawPending set, or nothing would be drawn again.
+    try {
+      flushInput();
+      flushDraw();
+    } finally {
+      drawPending = false;
+    }
+  });
+}
+
+// Saves are queued and written at idle time (see PERSISTENCE)
+function requestAutoSave(){
+  schedulePersist('grid', 'history');
+  requestSync();
+}
+
+// --- HISTORY (operation log) ---
+// Each entry records only what changed, so undo/redo cost O(changed cells):
+//   { type:'cells', idx:Uint32Array, before:Uint8Array, after:Uint8Array }
+//   { type:'resize', rows, cols, nRows, nCols, cells }  (cells = grid before the resize)
+// The log is capped by size in bytes instead of by number of entries.
+let historyBytes = 0;
+let pendingOp = null;
+
+function opBytes(op){
+  return op.type === 'resize'
+    ? op.cells.byteLength + (op.after ? op.after.byteLength : 0)
+    : op.idx.byteLength + op.before.byteLength + op.after.byteLength;
+}
+
+function pushHistory(op){
+  history.push(op);
+  historyBytes += opBytes(op);
+  redoStack = [];
+  // Always keep the newest entry, even if it alone is over budget
+  while(historyBytes > HISTORY_BYTE_BUDGET && history.length > 1){
+    historyBytes -= opBytes(history.shift());
+  }
+}
+
+// Strokes: beginStroke() at pointerdown, writeCell() per change, commitStroke() at pointerup
+function beginStroke(){
+  commitStroke();
+  pendingOp = { seen: new Set(), idx: [], before: [] };
+}
+function writeCell(i, code){
+  const prev = gridData[i];
+  if(prev === code) return false;
+  if(pendingOp && !pendingOp.seen.has(i)){
+    pendingOp.seen.add(i);
+    pendingOp.idx.push(i);
+    pendingOp.before.push(prev);
+  }
+  gridData[i] = code;
+  markDirty(i);
+  collabCell(i);
+  return true;
+}
+function commitStroke(){
+  const op = pendingOp;
+  pendingOp = null;
+  if(!op) return;
+  // Cells toggled back to their old value during the stroke are left out
+  const idx = [], before = [], after = [];
+  for(let k=0; k<op.idx.length; k++){
+    const i = op.idx[k];
+    if(gridData[i] === op.before[k]) continue;
+    idx.push(i); before.push(op.before[k]); after.push(gridData[i]);
+  }
+  if(!idx.length) return;
+  pushHistory({ type: 'cells', idx: Uint32Array.from(idx), before: Uint8Array.from(before), after: Uint8Array.from(after) });
+}
+
+// Bulk edits (photo import) diff against a copy of the grid taken beforehand
+function commitChangesSince(oldCells){
+  let n = 0;
+  for(let i=0; i<gridData.length; i++) if(gridData[i] !== oldCells[i]) n++;
+  if(!n) return;
+  const idx = new Uint32Array(n), before = new Uint8Array(n), after = new Uint8Array(n);
+  for(let i=0, k=0; i<gridData.length; i++){
+    if(gridData[i] === oldCells[i]) continue;
+    idx[k] = i; before[k] = oldCells[i]; after[k] = gridData[i]; k++;
+  }
+  pushHistory({ type: 'cells', idx, before, after });
+}
+
+// after: the new cells when they are not just the old ones cropped/padded
+function recordResize(nRows, nCols, after=null){
+  const op = { type: 'resize', rows: ROWS, cols: COLS, nRows, nCols, cells: gridData };
+  if(after) op.after = after.slice();
+  pushHistory(op);
+}
+
+function setGridSize(nRows, nCols, cells){
+  ROWS = nRows; COLS = nCols;
+  gridData = cells;
+  document.getElementById('rows').value = ROWS;
+  document.getElementById('cols').value = COLS;
+  updateCanvas();
+}
+
+function applyOp(op, forward){
+  if(op.type === 'resize'){
+    if(forward) setGridSize(op.nRows, op.nCols, op.after ? op.after.slice() : resizeCells(op.cells, op.rows, op.cols, op.nRows, op.nCols));
+    else setGridSize(op.rows, op.cols, op.cells.slice());
+    return;
+  }
+  const values = forward ? op.after : op.before;
+  for(let k=0; k<op.idx.length; k++){
+    gridData[op.idx[k]] = values[k];
+    markDirty(op.idx[k]);
+    collabCell(op.idx[k]);
+  }
+}
+
+// A line/rectangle drag is one edit until pointerup; undo and redo wait for it
+function undo(){
+  if(shapeStart) return;
+  commitStroke();
+  if(history.length){
+    const op = history.pop();
+    historyBytes -= opBytes(op);
+    applyOp(op, false);
+    redoStack.push(op);
+    requestAutoSave();
+  }
+}
+function redo(){
+  if(shapeStart) return;
+  if(redoStack.length){
+    const op = redoStack.pop();
+    applyOp(op, true);
+    history.push(op);
+    historyBytes += opBytes(op);
+    requestAutoSave();
+  }
+}
+
+// The newest entries that fit in budget bytes, oldest first
+function newestHistory(budget){
+  let bytes = 0, h = history.length;
+  while(h > 0 && bytes + opBytes(history[h-1]) <= budget){
+    h--;
+    bytes += opBytes(history[h]);
+  }
+  return history.slice(h);
+}
+
+// Text form of the newest entries that fit in SAVED_HISTORY_BYTE_BUDGET
+function encodeHistory(){
+  const out = [];
+  for(const op of newestHistory(SAVED_HISTORY_BYTE_BUDGET)){
+    if(op.type === 'resize'){
+      const e = { type: 'resize', rows: op.rows, cols: op.cols, nRows: op.nRows, nCols: op.nCols, cells: encodeCells(op.cells) };
+      if(op.after) e.after = encodeCells(op.after);
+      out.push(e);
+    } else {
+      out.push({
+        type: 'cells',
+        idx: encodeCells(new Uint8Array(op.idx.buffer, op.idx.byteOffset, op.idx.byteLength)),
+        before: encodeCells(op.before),
+        after: encodeCells(op.after),
+      });
+    }
+  }
+  return out;
+}
+function decodeHistory(list){
+  if(!Array.isArray(list)) return [];
+  const ops = [];
+  // Entries from older snapshot formats have no type and are dropped
+  for(const h of list){
+    if(!h) continue;
+    if(h.type === 'resize'){
+      const op = { type: 'resize', rows: h.rows, cols: h.cols, nRows: h.nRows, nCols: h.nCols, cells: decodeCells(h.cells) };
+      if(h.after) op.after = decodeCells(h.after);
+      ops.push(op);
+    } else if(h.type === 'cells'){
+      ops.push({ type: 'cells', idx: new Uint32Array(decodeCells(h.idx).buffer), before: decodeCells(h.before), after: decodeCells(h.after) });
+    }
+  }
+  return ops;
+}
+
+// --- HIT TEST ---
+// getBoundingClientRect() and scroll reads can force a layout, so the
+// canvas position is read once and kept until a scroll, resize or zoom
+// (and at every pointerdown)
+let canvasGeometry = null;
+
+function invalidateGeometry(){
+  canvasGeometry = null;
+}
+
+function getCanvasGeometry(){
+  if(!canvasGeometry){
+    const rect = canvas.getBoundingClientRect();
+    canvasGeometry = { left: rect.left, top: rect.top, scrollLeft: vp.scrollLeft, scrollTop: vp.scrollTop };
+  }
+  return canvasGeometry;
+}
+
+function getCellFromClient(clientX, clientY){
+  const g = getCanvasGeometry();
+  const x = (clientX - g.left + g.scrollLeft) / scale;
+  const y = (clientY - g.top + g.scrollTop) / scale;
+  const c = Math.floor((x - OFFSET) / SIZE);
+  const r = Math.floor((y - OFFSET) / SIZE);
+  return { r, c };
+}
+
+// The code the selected stitch writes (the eraser writes EMPTY)
+function modeCode(){
+  const m = document.getElementById('mode').value;
+  return (m === 'erase') ? EMPTY : STITCH_CODES[m];
+}
+
+function applyCell(r, c){
+  if(r<0 || r>=ROWS || c<0 || c>=COLS) return;
+  const next = modeCode();
+  const i = cellIndex(r, c);
+  writeCell(i, (gridData[i] === next) ? EMPTY : next);
+}
+
+function applyCellIfNew(r, c){
+  if(r===lastCell.r && c===lastCell.c) return;
+  lastCell = { r, c };
+  applyCell(r, c);
+}
+
+// --- TOOLS: BUCKET, LINE, RECTANGLE ---
+// Each use is one history entry, one save and one redraw of the cells it
+// changed. Lines and rectangles follow the pointer as a stroke: every move
+// only writes the cells where the new shape differs from the previous
+// preview, and pointerup commits what is left. The preview stays local; the
+// relay gets the committed shape at pointerup.
+let shapeStart = null;   // { r, c } where a line/rectangle drag began
+
+function currentTool(){
+  return document.getElementById('tool').value;
+}
+
+// Bresenham: visit(r, c) for every cell on the line from (r0,c0) to (r1,c1)
+function lineCells(r0, c0, r1, c1, visit){
+  const dr = Math.abs(r1 - r0), dc = Math.abs(c1 - c0);
+  const sr = r0 < r1 ? 1 : -1, sc = c0 < c1 ? 1 : -1;
+  let err = dc - dr;
+  for(;;){
+    visit(r0, c0);
+    if(r0 === r1 && c0 === c1) return;
+    const e2 = 2 * err;
+    if(e2 > -dr){ err -= dr; c0 += sc; }
+    if(e2 < dc){ err += dc; r0 += sr; }
+  }
+}
+
+function rectCells(r0, c0, r1, c1, filled, visit){
+  const top = Math.min(r0, r1), bottom = Math.max(r0, r1);
+  const left = Math.min(c0, c1), right = Math.max(c0, c1);
+  for(let r=top; r<=bottom; r++){
+    if(filled || r === top || r === bottom){
+      for(let c=left; c<=right; c++) visit(r, c);
+    } else {
+      visit(r, left);
+      if(right !== left) visit(r, right);
+    }
+  }
+}
+
+function beginShape(r, c){
+  beginStroke();
+  shapeStart = { r, c };
+  lastCell = { r:-1, c:-1 };
+  previewShape(r, c);
+}
+
+function previewShape(r, c){
+  r = clamp(r, 0, ROWS - 1);
+  c = clamp(c, 0, COLS - 1);
+  if(r === lastCell.r && c === lastCell.c) return;
+  const op = pendingOp;
+  if(!op) return;
+  lastCell = { r, c };
+  const shape = new Set();
+  const visit = (r, c) => shape.add(cellIndex(r, c));
+  const tool = currentTool();
+  if(tool === 'line') lineCells(shapeStart.r, shapeStart.c, r, c, visit);
+  else rectCells(shapeStart.r, shapeStart.c, r, c, tool === 'rectFill', visit);
+  // writeCell skips cells that already hold the value, so only cells that
+  // left or joined the shape are written and repainted
+  for(let k=0; k<op.idx.length; k++){
+    if(!shape.has(op.idx[k])) writeCell(op.idx[k], op.before[k]);
+  }
+  const code = modeCode();
+  for(const i of shape) writeCell(i, code);
+}
+
+function endShape(){
+  shapeStart = null;
+  const op = pendingOp;
+  if(op){
+    for(let k=0; k<op.idx.length; k++){
+      if(gridData[op.idx[k]] !== op.before[k]) collabCell(op.idx[k]);
+    }
+  }
+  commitStroke();
+  requestAutoSave();
+}
+
+// Scanline flood fill of the 4-connected region of (r,c)'s code. Works on
+// whole runs of a row at a time and only queues one seed per run above and
+// below, so the cost is in proportion to the region. Returns the indexes it
+// wrote.
+function floodFill(r, c, code){
+  const target = gridData[cellIndex(r, c)];
+  const idx = [];
+  if(target === code) return idx;
+  const stack = [c, r];
+  while(stack.length){
+    const y = stack.pop();
+    let x = stack.pop();
+    let i = y * COLS + x;
+    if(gridData[i] !== target) continue;
+    while(x > 0 && gridData[i-1] === target){ x--; i--; }
+    let up = false, down = false;
+    for(; x < COLS && gridData[i] === target; x++, i++){
+      gridData[i] = code;
+      idx.push(i);
+      if(y > 0){
+        const open = gridData[i-COLS] === target;
+        if(open && !up) stack.push(x, y - 1);
+        up = open;
+      }
+      if(y < ROWS - 1){
+        const open = gridData[i+COLS] === target;
+        if(open && !down) stack.push(x, y + 1);
+        down = open;
+      }
+    }
+  }
+  return idx;
+}
+
+function fillRegion(r, c){
+  commitStroke();
+  const target = gridData[cellIndex(r, c)];
+  const idx = floodFill(r, c, modeCode());
+  if(!idx.length) return;
+  for(const i of idx){
+    markDirty(i);
+    collabCell(i);
+  }
+  const after = new Uint8Array(idx.length).fill(gridData[idx[0]]);
+  pushHistory({ type: 'cells', idx: Uint32Array.from(idx), before: new Uint8Array(idx.length).fill(target), after });
+  requestAutoSave();
+}
+
+// --- PAN / ZOOM ---
+function togglePan(){
+  isPanLocked = !isPanLocked;
+  document.getElementById('panBtn').classList.toggle('active-tool', isPanLocked);
+}
+
+function updateModeStyle(){
+  const mode = document.getElementById('mode');
+  // Add visual feedback when drawing mode is selected
+  if(mode.value !== 'erase'){
+    mode.classList.add('drawing-mode');
+  } else {
+    mode.classList.remove('drawing-mode');
+  }
+}
+
+function zoomAtCenter(mult){
+  const beforeScale = scale;
+  const newScale = clamp(scale * mult, minScale, maxScale);
+
+  const halfW = vp.clientWidth/2;
+  const halfH = vp.clientHeight/2;
+
+  const canvasX = (vp.scrollLeft + halfW) / beforeScale;
+  const canvasY = (vp.scrollTop + halfH) / beforeScale;
+
+  setScale(newScale);
+
+  vp.scrollLeft = canvasX * newScale - halfW;
+  vp.scrollTop  = canvasY * newScale - halfH;
+}
+
+// --- POINTER: DRAW + TWO-FINGER PAN + PINCH ---
+// While drawing, pointermove only queues its samples: all coalesced events
+// (the browser may deliver several per frame on 120 Hz screens) and, for
+// line/rectangle previews, the newest predicted one. The next animation
+// frame applies the queue in one go and paints it (see requestDraw). Freehand
+// strokes join consecutive samples with Bresenham lines, so fast drags do
+// not skip cells.
+let inputPoints = [];      // clientX, clientY pairs not applied yet
+let inputPredicted = null; // { x, y } where the pointer is expected next
+
+function flushInput(){
+  if(!drawing || (!inputPoints.length && !inputPredicted)) return;
+  const pts = inputPoints, predicted = inputPredicted;
+  inputPoints = [];
+  inputPredicted = null;
+  if(shapeStart){
+    // Only the newest position matters for a preview
+    const n = pts.length;
+    const p = predicted || { x: pts[n-2], y: pts[n-1] };
+    const cell = getCellFromClient(p.x, p.y);
+    previewShape(cell.r, cell.c);
+    return;
+  }
+  for(let k=0; k<pts.length; k+=2){
+    const cell = getCellFromClient(pts[k], pts[k+1]);
+    strokeTo(cell.r, cell.c);
+  }
+  requestAutoSave();
+}
+
+// Freehand: every cell from the last one to (r,c), except the last one.
+// Positions outside the grid are followed too, so leaving and re-entering
+// the grid does not draw a line across it.
+function strokeTo(r, c){
+  const from = lastCell;
+  if(r === from.r && c === from.c) return;
+  lastCell = { r, c };
+  lineCells(from.r, from.c, r, c, (y, x) => {
+    if(y !== from.r || x !== from.c) applyCell(y, x);
+  });
+}
+
+let pinchStartDist = 0;
+let pinchStartScale = 1;
+let lastPanMid = null;
+let lastSinglePointerPos = null;
+
+function distance(a,b){
+  const dx = a.x - b.x;
+  const dy = a.y - b.y;
+  return Math.sqrt(dx*dx + dy*dy);
+}
+function midpoint(a,b){
+  return { x:(a.x+b.x)/2, y:(a.y+b.y)/2 };
+}
+
+canvas.addEventListener('pointerdown', (e) => {
+  try {
+    canvas.setPointerCapture(e.pointerId);
+  } catch(err){
+    // Pointer capture not supported or failed - continue anyway
+    console.warn('Pointer capture not available:', err);
+  }
+  pointers.set(e.pointerId, { x: e.clientX, y: e.clientY });
+
+  if(pointers.size === 2){
+    const pts = Array.from(pointers.values());
+    pinchStartDist = distance(pts[0], pts[1]);
+    pinchStartScale = scale;
+    lastPanMid = midpoint(pts[0], pts[1]);
+    flushInput();
+    drawing = false;
+    if(shapeStart) endShape();
+    else commitStroke();
+    lastCell = { r:-1, c:-1 };
+    if(storeReady) handleSyncReply(syncReply);
+    return;
+  }
+
+  const shouldPan = isPanLocked || spaceDown;
+  if(shouldPan){
+    drawing = false;
+    lastSinglePointerPos = { x: e.clientX, y: e.clientY };
+    return;
+  }
+
+  invalidateGeometry();
+  const cell = getCellFromClient(e.clientX, e.clientY);
+  // Strokes wait until the saved chart has been restored
+  if(storeReady && cell.r>=0 && cell.c>=0 && cell.r<ROWS && cell.c<COLS){
+    const tool = currentTool();
+    if(tool === 'bucket'){
+      fillRegion(cell.r, cell.c);
+      return;
+    }
+    drawing = true;
+    if(tool !== 'pen'){
+      beginShape(cell.r, cell.c);
+      return;
+    }
+    beginStroke();
+    lastCell = { r:-1, c:-1 };
+    applyCellIfNew(cell.r, cell.c);
+    requestDraw(); 
+    requestAutoSave();
+  }
+});
+
+canvas.addEventListener('pointermove', (e) => {
+  if(!pointers.has(e.pointerId)) return;
+  pointers.set(e.pointerId, { x: e.clientX, y: e.clientY });
+
+  if(pointers.size === 2){
+    const pts = Array.from(pointers.values());
+    const d = distance(pts[0], pts[1]);
+    const mid = midpoint(pts[0], pts[1]);
+
+    if(pinchStartDist > 0){
+      const factor = d / pinchStartDist;
+      const newScale = clamp(pinchStartScale * factor, minScale, maxScale);
+      const prevScale = scale;
+
+      const vpRect = vp.getBoundingClientRect();
+      const mx = (mid.x - vpRect.left) + vp.scrollLeft;
+      const my = (mid.y - vpRect.top) + vp.scrollTop;
+
+      const canvasX = mx / prevScale;
+      const canvasY = my / prevScale;
+
+      setScale(newScale);
+
+      vp.scrollLeft = canvasX * newScale - (mid.x - vpRect.left);
+      vp.scrollTop  = canvasY * newScale - (mid.y - vpRect.top);
+    }
+
+    if(lastPanMid){
+      const dx = mid.x - lastPanMid.x;
+      const dy = mid.y - lastPanMid.y;
+      vp.scrollLeft -= dx;
+      vp.scrollTop  -= dy;
+    }
+    lastPanMid = mid;
+    return;
+  }
+
+  if(isPanLocked || spaceDown){
+    const prev = lastSinglePointerPos;
+    const cur = { x: e.clientX, y: e.clientY };
+    if(prev){
+      vp.scrollLeft -= (cur.x - prev.x);
+      vp.scrollTop  -= (cur.y - prev.y);
+    }
+    lastSinglePointerPos = cur;
+    return;
+  }
+
+  if(drawing){
+    const samples = e.getCoalescedEvents ? e.getCoalescedEvents() : [];
+    if(!samples.length) samples.push(e);
+    for(const p of samples) inputPoints.push(p.clientX, p.clientY);
+    if(shapeStart && e.getPredictedEvents){
+      const predicted = e.getPredictedEvents();
+      const p = predicted[predicted.length - 1];
+      inputPredicted = p ? { x: p.clientX, y: p.clientY } : null;
+    }
+    requestDraw();
+  }
+});
+
+function endPointer(e){
+  pointers.delete(e.pointerId);
+  if(pointers.size < 2){
+    pinchStartDist = 0;
+    pinchStartScale = scale;
+    lastPanMid = null;
+  }
+  if(pointers.size === 0){
+    if(drawing){
+      // The real end point replaces a predicted one
+      if(e.type === 'pointerup') inputPoints.push(e.clientX, e.clientY);
+      inputPredicted = null;
+      flushInput();
+    }
+    if(shapeStart) endShape();
+    else if(drawing) commitStroke();
+    drawing = false;
+    lastCell = { r:-1, c:-1 };
+    lastSinglePointerPos = null;
+    // A reply that arrived during the stroke
+    if(storeReady) handleSyncReply(syncReply);
+  }
+}
+canvas.addEventListener('pointerup', endPointer);
+canvas.addEventListener('pointercancel', endPointer);
+
+// --- KEYBOARD (desktop) ---
+let spaceDown = false;
+window.addEventListener('keydown', (e) => {
+  const key = e.key.toLowerCase();
+  if(key === ' '){ spaceDown = true; e.preventDefault(); }
+  const isMod = e.ctrlKey || e.metaKey;
+  if(isMod && key === 'z'){ e.preventDefault(); undo(); }
+  if(isMod && (key === 'y' || (key === 'z' && e.shiftKey))){ e.preventDefault(); redo(); }
+  if(key === '+' || key === '='){ e.preventDefault(); zoomAtCenter(1.15); }
+  if(key === '-' || key === '_'){ e.preventDefault(); zoomAtCenter(1/1.15); }
+});
+window.addEventListener('keyup', (e) => { if(e.key === ' ') spaceDown = false; });
+
+// --- EXPORT WORKER ---
+// Raster exports run in export-worker.js (render-core.js in a worker),
+// on its own copy of the grid, so encoding never blocks the editor. Without
+// Worker/OffscreenCanvas the same runExportJob runs here instead.
+let exportWorker = null;   // null = not started yet, false = unavailable
+let exportJobId = 0;
+let activeExport = null;
+
+function getExportWorker(){
+  if(exportWorker !== null) return exportWorker || null;
+  try {
+    if(!window.Worker || !window.OffscreenCanvas) throw new Error('Worker/OffscreenCanvas not supported');
+    exportWorker = new Worker('export-worker.js' + ASSET_QUERY);
+    exportWorker.onmessage = (e) => {
+      if(activeExport && e.data.id === activeExport.id) activeExport.handle(e.data);
+    };
+    exportWorker.onerror = (e) => {
+      // A worker that fails to start is not retried; later exports run locally
+      console.warn('Export worker error:', e);
+      exportWorker.terminate();
+      exportWorker = false;
+      if(activeExport) activeExport.handle({ type: 'error', message: e.message || 'Export worker failed' });
+    };
+  } catch(e){
+    console.warn('Export worker not available, exporting on the main thread:', e);
+    exportWorker = false;
+  }
+  return exportWorker || null;
+}
+
+// Runs an export job; onMessage gets the 'page'/'png' messages. Resolves to
+// true when done and false when cancelled.
+function runExport(job, onMessage){
+  const id = ++exportJobId;
+  const worker = getExportWorker();
+  return new Promise((resolve, reject) => {
+    const state = { id, worker, cancelled: false };
+    state.handle = (msg) => {
+      if(activeExport !== state) return;
+      if(msg.type === 'done' || msg.type === 'cancelled'){
+        activeExport = null;
+        resolve(msg.type === 'done');
+      } else if(msg.type === 'error'){
+        activeExport = null;
+        reject(new Error(msg.message));
+      } else {
+        onMessage(msg);
+      }
+    };
+    activeExport = state;
+
+    if(worker){
+      const cells = gridData.slice().buffer;
+      worker.postMessage(Object.assign({ type: 'export', id, rows: ROWS, cols: COLS, size: SIZE, offset: OFFSET, cells }, job), [cells]);
+    } else {
+      runExportJob(job, state.handle, () => state.cancelled)
+        .catch(err => state.handle({ type: 'error', message: String((err && err.message) || err) }));
+    }
+  });
+}
+
+function cancelExport(){
+  if(!activeExport) return;
+  activeExport.cancelled = true;
+  if(activeExport.worker) activeExport.worker.postMessage({ type: 'cancel', id: activeExport.id });
+}
+
+// --- EXPORT PNG ---
+async function exportPNG(){
+  if(activeExport) return;
+  try {
+    let blob = null;
+    await runExport({ kind: 'png' }, (msg) => { blob = msg.blob; });
+    if(!blob) return;
+    const url = URL.createObjectURL(blob);
+    const a = document.createElement('a');
+    a.download = "haekle-design.png";
+    a.href = url;
+    a.click();
+    setTimeout(() => URL.revokeObjectURL(url), 10000);
+  } catch(e){
+    console.error('PNG export error:', e);
+    alert('Kunne ikke eksportere PNG. Prøv med en mindre grid-størrelse.');
+  }
+}
+
+// --- .HGRID FIL ---
+function exportHgrid(){
+  commitStroke();
+  const blob = new Blob([encodeHgrid(ROWS, COLS, gridData)], { type: 'application/octet-stream' });
+  const url = URL.createObjectURL(blob);
+  const a = document.createElement('a');
+  a.download = "haekle-design.hgrid";
+  a.href = url;
+  a.click();
+  setTimeout(() => URL.revokeObjectURL(url), 10000);
+}
+
+document.getElementById('hgridInput').onchange = async function(e){
+  const file = e.target.files && e.target.files[0];
+  e.target.value = "";
+  if(!file) return;
+  let chart;
+  try {
+    chart = decodeHgrid(await file.arrayBuffer());
+  } catch(err){
+    console.error('.hgrid load error:', err);
+    alert('Kunne ikke åbne filen. Vælg en .hgrid-fil gemt fra griddet.');
+    return;
+  }
+  if(chart.rows > MAX_GRID_SIDE || chart.cols > MAX_GRID_SIDE || chart.rows * chart.cols > MAX_GRID_CELLS){
+    alert(`Griddet kan højst have ${MAX_GRID_CELLS} celler (${chart.rows}×${chart.cols} = ${chart.rows*chart.cols}).`);
+    return;
+  }
+  if(chart.rows * chart.cols > LARGE_GRID_CELLS){
+    if(!confirm(`Dette er et meget stort grid (${chart.rows}×${chart.cols} = ${chart.rows*chart.cols} celler). Det kan være langsomt. Fortsæt?`)){
+      return;
+    }
+  }
+  replaceGrid(chart.rows, chart.cols, chart.cells);
+
+  const panel = document.getElementById('panel');
+  if(panel.style.display === 'block') togglePanel();
+};
+
+// --- PDF EXPORT (A4 + KVALITETSPRESETS) ---
+function getPdfSettings(){
+  const preset = document.getElementById('pdfPreset').value;
+  if(preset === 'print')  return { exportScale: 1.65, jpegQuality: 0.82, render: "SLOW" };
+  if(preset === 'small')  return { exportScale: 1.20, jpegQuality: 0.65, render: "FAST" };
+  if(preset === 'vector') return { vector: true };
+  return                  { exportScale: 1.45, jpegQuality: 0.78, render: "SLOW" }; // normal
+}
+
+// Vector version of drawPageOnContext: the same page layout written as PDF
+// lines, rectangles and text. (x0, y0) is the page origin in mm and k the mm
+// per chart px. Runs of filled cells in a row become a single rectangle.
+function drawPageVector(pdf, s, off, r0, r1, x0, y0, k){
+  const ox = off + EXPORT_MARGIN;
+  const top = off + EXPORT_MARGIN;
+  const X = (x) => x0 + (ox + x) * k;
+  const Y = (r) => y0 + top + (r - r0) * s * k;
+  const ptPerPx = k * 72 / 25.4;
+
+  for(const st of LINE_STYLES){
+    pdf.setDrawColor(st.gray);
+    pdf.setLineWidth(st.width * k);
+    for(let i=0;i<=COLS;i++){
+      if(lineWeight(i) === st.key) pdf.line(X(i*s), Y(r0), X(i*s), Y(r1));
+    }
+    for(let j=r0;j<=r1;j++){
+      if(lineWeight(j) === st.key) pdf.line(X(0), Y(j), X(COLS*s), Y(j));
+    }
+  }
+
+  const layer = getGridLayer(s);
+  pdf.setTextColor(0);
+  pdf.setFont("helvetica", "bold");
+  pdf.setFontSize(12 * ptPerPx);
+  for(const l of layer.colLabels){
+    pdf.text(l.text, X(l.x), y0 + (top - 12) * k, { align: "center" });
+  }
+  for(const l of layer.rowLabels){
+    if(l.y < r0*s || l.y > r1*s) continue;
+    pdf.text(l.text, x0 + (ox - 10) * k, Y(r0) + (l.y - r0*s) * k, { align: "right" });
+  }
+
+  pdf.setFillColor(0);
+  pdf.setFontSize(s * 0.7 * ptPerPx);
+  for(let r=r0;r<r1;r++){
+    const row = gridRow(r);
+    const y = Y(r);
+    for(let c=0;c<COLS;c++){
+      const code = row[c];
+      if(code === EMPTY) continue;
+      if(code === FILL){
+        let end = c + 1;
+        while(end < COLS && row[end] === FILL) end++;
+        pdf.rect(X(c*s + 1), y + k, ((end - c)*s - 1) * k, (s - 1) * k, "F");
+        c = end - 1;
+      } else {
+        pdf.text(STITCH_NAMES[code], X(c*s + s/2), y + (s/1.3) * k, { align: "center" });
+      }
+    }
+  }
+}
+
+// jsPDF is only loaded on the first PDF export: the vendored copy next to
+// this page, or the CDN when the vendored file is missing
+const JSPDF_SOURCES = [
+  'vendor/jspdf.umd.min.js?v=2.5.1',
+  'https://cdnjs.cloudflare.com/ajax/libs/jspdf/2.5.1/jspdf.umd.min.js',
+];
+let jsPDFLoad = null;
+
+function loadScript(src){
+  return new Promise((resolve, reject) => {
+    const el = document.createElement('script');
+    el.src = src;
+    el.onload = resolve;
+    el.onerror = () => { el.remove(); reject(new Error('Could not load ' + src)); };
+    document.head.appendChild(el);
+  });
+}
+
+function loadJsPDF(){
+  if(!jsPDFLoad){
+    jsPDFLoad = JSPDF_SOURCES.reduce((p, src) => p.catch(() => loadScript(src)), Promise.reject())
+      .then(() => {
+        if(!window.jspdf || !window.jspdf.jsPDF) throw new Error('jsPDF missing after load');
+        return window.jspdf.jsPDF;
+      });
+    // A failed load is retried on the next export
+    jsPDFLoad.catch(() => { jsPDFLoad = null; });
+  }
+  return jsPDFLoad;
+}
+
+let pdfLibLoading = false;
+
+async function exportPDF() {
+  // Clicking the button again while exporting cancels the export
+  if(activeExport){
+    cancelExport();
+    return;
+  }
+  if(pdfLibLoading) return;
+
+  let jsPDF;
+  pdfLibLoading = true;
+  try {
+    jsPDF = await loadJsPDF();
+  } catch(e){
+    console.error('jsPDF load error:', e);
+    alert('PDF-biblioteket kunne ikke hentes. Tjek forbindelsen og prøv igen.');
+    return;
+  } finally {
+    pdfLibLoading = false;
+  }
+
+  // Show loading indicator
+  const pdfBtn = document.querySelector('button[onclick="exportPDF()"]');
+  const originalText = pdfBtn.innerHTML;
+  const originalTitle = pdfBtn.title;
+  pdfBtn.innerHTML = '⏳ Eksporterer...';
+  pdfBtn.title = 'Stop eksport';
+  const restoreButton = () => {
+    pdfBtn.innerHTML = originalText;
+    pdfBtn.title = originalTitle;
+    pdfBtn.disabled = false;
+  };
+
+  try {
+    const { exportScale, jpegQuality, render, vector } = getPdfSettings();
+    const marginMm = 8;
+
+    const pdf = new jsPDF({ orientation: "p", unit: "mm", format: "a4", compress: true });
+
+    const pageW = 210, pageH = 297;
+    const usableW = pageW - marginMm * 2;
+    const usableH = pageH - marginMm * 2;
+
+    // The chart is scaled to the page width; rows are split across pages
+    const chartW = (COLS * SIZE) + OFFSET + 2*EXPORT_MARGIN;
+    const mmPerPx = usableW / chartW;
+    const rowsPerPage = Math.max(1, Math.floor((usableH / mmPerPx - pageChartHeight(SIZE, OFFSET, 0)) / SIZE));
+
+    const totalPages = Math.ceil(ROWS / rowsPerPage);
+
+    if(vector){
+      // Vector pages are cheap to build and stay on the main thread
+      pdfBtn.disabled = true;
+      for (let page = 0; page < totalPages; page++) {
+        const r0 = page * rowsPerPage;
+        const r1 = Math.min(ROWS, r0 + rowsPerPage);
+        if (page > 0) pdf.addPage();
+        drawPageVector(pdf, SIZE, OFFSET, r0, r1, marginMm, marginMm, mmPerPx);
+      }
+    } else {
+      // Raster pages are rendered and JPEG-encoded by the export worker
+      const finished = await runExport({ kind: 'pdf', exportScale, jpegQuality, rowsPerPage }, (msg) => {
+        if (msg.page > 0) pdf.addPage();
+        const pxPerMm = msg.width / usableW;
+        pdf.addImage(new Uint8Array(msg.data), "JPEG", marginMm, marginMm, usableW, msg.height / pxPerMm, undefined, render);
+        pdfBtn.innerHTML = `⏳ Side ${msg.page+1}/${msg.total} ✖`;
+      });
+      if(!finished){
+        restoreButton();
+        return;
+      }
+    }
+
+    pdf.save("haekle-moenster.pdf");
+    pdfBtn.innerHTML = '✅ Gemt!';
+    pdfBtn.disabled = true;
+    setTimeout(restoreButton, 2000);
+  } catch(e){
+    console.error('PDF export error:', e);
+    alert('Kunne ikke eksportere PDF. Prøv med "Lille fil" kvalitet eller en mindre grid-størrelse.');
+    restoreButton();
+  }
+}
+
+// Replaces the whole chart as one history entry
+function replaceGrid(rows, cols, cells){
+  commitStroke();
+  if(rows !== ROWS || cols !== COLS){
+    // New size and new cells are one history entry
+    recordResize(rows, cols, cells);
+    setGridSize(rows, cols, cells);
+  } else {
+    const oldCells = gridData.slice();
+    for(let i=0; i<cells.length; i++){
+      if(gridData[i] !== cells[i]){
+        gridData[i] = cells[i];
+        markDirty(i);
+        collabCell(i);
+      }
+    }
+    commitChangesSince(oldCells);
+  }
+  requestAutoSave();
+}
+
+// --- STREAMLIT ---
+// A chart converted by the Streamlit app arrives as the server_pattern
+// argument. It can arrive again on later reruns, so its id is saved with the
+// settings and each chart is applied only once.
+//
+// The chart is also kept in the app's chart store (haekle/store.py has the
+// protocol). After edits settle the editor sends the cells that changed
+// since the version the store last confirmed, as the component value, and
+// the store's reply comes back as the sync argument. Only one message is in
+// flight, so an edit costs bytes in proportion to its cells, not the chart.
+let serverPatternId = null;
+let serverPattern = null;
+const SYNC_DEBOUNCE_MS = 1500;
+const SYNC_RETRY_MS = 10000;      // Send again when a reply never came
+const SYNC_SNAPSHOT_CHECK = 4096; // From this many changed cells, send a snapshot if it is smaller
+let syncChart = null;     // Chart id in the store; null outside the app
+let syncVersion = 0;      // Store version syncBase is at
+let syncBase = null;      // { rows, cols, cells } at syncVersion; null = only a snapshot will do
+let syncSeq = 0;
+let syncInFlight = null;  // { seq, rows, cols, cells, sentAt }
+let syncNeedsAck = false; // Tell the app about an adopted snapshot or server pattern
+let syncTimer = null;
+let syncReply = null, lastSyncReply = null;
+
+function applyServerPattern(){
+  const p = serverPattern;
+  if(!p || p.id === serverPatternId) return;
+  const cells = decodeCells(p.cells);
+  if(cells.length !== p.rows * p.cols) return;
+  serverPatternId = p.id;
+  syncNeedsAck = true;
+  replaceGrid(p.rows, p.cols, cells);
+  schedulePersist('settings');
+}
+
+function requestSync(){
+  if(!syncChart) return;
+  clearTimeout(syncTimer);
+  syncTimer = setTimeout(sendSync, SYNC_DEBOUNCE_MS);
+}
+
+// Indexes of the cells that differ from syncBase, or null when the size changed
+function syncChanges(){
+  if(!syncBase || syncBase.rows !== ROWS || syncBase.cols !== COLS) return null;
+  const base = syncBase.cells, idx = [];
+  for(let i=0; i<gridData.length; i++){
+    if(gridData[i] !== base[i]) idx.push(i);
+  }
+  return idx;
+}
+
+function sendSync(){
+  clearTimeout(syncTimer);
+  syncTimer = null;
+  if(!syncChart || !storeReady) return;
+  if(syncInFlight){
+    // The reply schedules the next send; retry only when it seems lost
+    const wait = syncInFlight.sentAt + SYNC_RETRY_MS - performance.now();
+    if(wait > 0){ syncTimer = setTimeout(sendSync, wait); return; }
+  }
+  // Only gridData is compared with syncBase, so a stroke in progress is
+  // sent as it is and stays open (one undo step)
+
+  const msg = { seq: syncSeq + 1, base: syncVersion, serverPatternId };
+  const idx = syncChanges();
+  let packed = null;
+  if(!idx || (idx.length >= SYNC_SNAPSHOT_CHECK && (packed = packRuns(gridData)).length < idx.length * 5)){
+    packed = packed || packRuns(gridData);
+    Object.assign(msg, { kind: 'snapshot', rows: ROWS, cols: COLS, cells: encodeCells(packed) });
+  } else if(idx.length){
+    const idxBytes = new Uint8Array(idx.length * 4);
+    const view = new DataView(idxBytes.buffer);
+    const codes = new Uint8Array(idx.length);
+    idx.forEach((cell, k) => { view.setUint32(4*k, cell, true); codes[k] = gridData[cell]; });
+    Object.assign(msg, { kind: 'delta', idx: encodeCells(idxBytes), codes: encodeCells(codes) });
+  } else if(syncNeedsAck){
+    msg.kind = 'ack';
+  } else {
+    return;
+  }
+  syncSeq = msg.seq;
+  syncNeedsAck = false;
+  syncInFlight = { seq: msg.seq, rows: ROWS, cols: COLS, cells: gridData.slice(), sentAt: performance.now() };
+  Streamlit.setComponentValue(msg);
+}
+
+function handleSyncReply(reply){
+  if(!reply || !reply.chart) return;
+  // A snapshot would end the stroke in progress; the reply is handled
+  // when the pointer is released (endPointer)
+  if(pendingOp) return;
+  // Arguments are sent again on every rerun; each reply is handled once
+  const key = `${reply.chart}:${reply.version}:${reply.ack}`;
+  if(key === lastSyncReply) return;
+  lastSyncReply = key;
+
+  if(reply.chart !== syncChart){
+    // First reply on this page, or the app switched charts
+    syncChart = reply.chart;
+    syncVersion = 0;
+    syncBase = null;
+    syncInFlight = null;
+  }
+  const acked = syncInFlight && reply.ack === syncInFlight.seq;
+  if(acked && !reply.snapshot && reply.version > 0){
+    syncBase = { rows: syncInFlight.rows, cols: syncInFlight.cols, cells: syncInFlight.cells };
+  } else if(reply.snapshot){
+    adoptSnapshot(reply.snapshot);
+  } else {
+    // The store has no chart yet: upload ours
+    syncBase = null;
+  }
+  if(acked) syncInFlight = null;
+  syncVersion = reply.version;
+  requestSync();
+}
+
+// The stored chart replaces ours. Cells changed here since the last
+// confirmed version are kept on top of it (last writer wins), and so are
+// cells another editor wrote through the relay: the store may not have them
+// yet, and their author sends them. Like remote ops, adopting is not an
+// undo step and is not sent to the relay, where it would replay old cells
+// with new stamps (a size change is still recorded, so undo stays in range).
+function adoptSnapshot(snap){
+  const cells = unpackRuns(decodeCells(snap.cells), snap.rows * snap.cols);
+  const merged = cells.slice();
+  const sameSize = snap.rows === ROWS && snap.cols === COLS;
+  const local = syncChanges();
+  if(local && sameSize){
+    for(const i of local) merged[i] = gridData[i];
+  }
+  if(sameSize){
+    for(const [key, stamp] of collabStamps){
+      const r = Math.floor(key / 65536), c = key % 65536;
+      if(stamp % 65536 === collabClient || collabOutbox.has(key) || r >= ROWS || c >= COLS) continue;
+      const i = r * COLS + c;
+      merged[i] = cells[i] = gridData[i];
+    }
+  }
+  syncBase = { rows: snap.rows, cols: snap.cols, cells };
+  syncNeedsAck = true;
+  if(!sameSize){
+    commitStroke();
+    recordResize(snap.rows, snap.cols, merged);
+    setGridSize(snap.rows, snap.cols, merged);
+    schedulePersist('grid', 'history');
+    return;
+  }
+  let changed = false;
+  for(let i=0; i<merged.length; i++){
+    if(gridData[i] === merged[i]) continue;
+    gridData[i] = merged[i];
+    markDirty(i);
+    changed = true;
+  }
+  if(changed) schedulePersist('grid');
+}
+
+Streamlit.onRender((args) => {
+  if(args.height) Streamlit.setFrameHeight(args.height);
+  serverPattern = args.server_pattern || null;
+  syncReply = args.sync || null;
+  relayUrl = args.relay || null;
+  if(storeReady){
+    handleSyncReply(syncReply);
+    applyServerPattern();
+    collabConnect(relayUrl);
+  }
+});
+
+// --- CO-EDITING ---
+// With a relay (haekle/relay.py has the protocol) every cell change is sent
+// to the others on the same chart, and theirs are applied here. Changes are
+// collected per animation frame, so a fast drag sends one batch per frame.
+// Each cell keeps the stamp (Lamport clock, client id) of the op that wrote
+// it and takes a remote op only when its stamp is newer, so everyone ends
+// with the same cells. Remote ops only repaint the cells they touch and are
+// not undo steps here. Their author sends them to the chart store, so here
+// they go into the sync base instead of the next delta: otherwise every
+// editor in the room would upload them. Resizes are not shared.
+const COLLAB_OPS = 1;
+const COLLAB_OP_BYTES = 11;          // row u16, col u16, clock u32, client u16, code u8
+const COLLAB_MAX_BATCH_OPS = 65536;  // Well under the relay's message limit
+const COLLAB_RECONNECT_MS = 3000;
+let relayUrl = null;                 // From the relay argument
+let collabUrl = null;                // The room we are connected (or connecting) to
+let collabSocket = null;
+let collabClient = null;             // Our id in the room, from the welcome message
+let collabClock = 0;
+const collabStamps = new Map();      // row*65536+col -> clock*65536+client
+const collabOutbox = new Map();      // row*65536+col -> code, sent on the next frame
+let collabFlushPending = false;
+
+function collabCell(i){
+  // A line/rectangle preview is sent when it is committed (endShape)
+  if(!collabUrl || shapeStart) return;
+  collabOutbox.set(Math.floor(i / COLS) * 65536 + i % COLS, gridData[i]);
+  if(collabFlushPending) return;
+  collabFlushPending = true;
+  requestAnimationFrame(collabFlush);
+}
+
+function collabFlush(){
+  collabFlushPending = false;
+  // Kept until the relay has welcomed us
+  if(!collabOutbox.size || !collabSocket || collabSocket.readyState !== WebSocket.OPEN || !collabClient) return;
+  const clock = ++collabClock;
+  const stamp = clock * 65536 + collabClient;
+  const entries = Array.from(collabOutbox);
+  collabOutbox.clear();
+  // Big fills go out in several messages with the same clock
+  for(let start=0; start<entries.length; start+=COLLAB_MAX_BATCH_OPS){
+    const batch = entries.slice(start, start + COLLAB_MAX_BATCH_OPS);
+    const buf = new ArrayBuffer(1 + batch.length * COLLAB_OP_BYTES);
+    const view = new DataView(buf);
+    view.setUint8(0, COLLAB_OPS);
+    let o = 1;
+    for(const [key, code] of batch){
+      view.setUint16(o, Math.floor(key / 65536), true);
+      view.setUint16(o + 2, key % 65536, true);
+      view.setUint32(o + 4, clock, true);
+      view.setUint16(o + 8, collabClient, true);
+      view.setUint8(o + 10, code);
+      o += COLLAB_OP_BYTES;
+      collabStamps.set(key, stamp);
+    }
+    collabSocket.send(buf);
+  }
+}
+
+function applyRemoteOps(buf){
+  const view = new DataView(buf);
+  if(!buf.byteLength || view.getUint8(0) !== COLLAB_OPS || (buf.byteLength - 1) % COLLAB_OP_BYTES) return;
+  let changed = false;
+  for(let o=1; o<buf.byteLength; o+=COLLAB_OP_BYTES){
+    const r = view.getUint16(o, true), c = view.getUint16(o + 2, true);
+    const clock = view.getUint32(o + 4, true);
+    const key = r * 65536 + c;
+    if(clock > collabClock) collabClock = clock;
+    // Our unsent change gets a newer clock when it goes out
+    if(collabOutbox.has(key)) continue;
+    const stamp = clock * 65536 + view.getUint16(o + 8, true);
+    if(stamp <= (collabStamps.get(key) || 0)) continue;
+    collabStamps.set(key, stamp);
+    if(r >= ROWS || c >= COLS) continue;
+    const i = r * COLS + c, code = view.getUint8(o + 10);
+    if(gridData[i] === code) continue;
+    gridData[i] = code;
+    markDirty(i);
+    changed = true;
+    for(const s of [syncBase, syncInFlight]){
+      if(s && s.rows === ROWS && s.cols === COLS) s.cells[i] = code;
+    }
+  }
+  if(changed) schedulePersist('grid');
+}
+
+function collabConnect(url){
+  if(url === collabUrl) return;
+  if(collabSocket) collabSocket.close();
+  collabUrl = url;
+  collabSocket = null;
+  collabClient = null;
+  if(!url || typeof WebSocket === 'undefined') return;
+  const ws = new WebSocket(url);
+  ws.binaryType = 'arraybuffer';
+  ws.onmessage = (e) => {
+    if(typeof e.data !== 'string'){ applyRemoteOps(e.data); return; }
+    const msg = JSON.parse(e.data);
+    if(msg.type !== 'welcome') return;
+    collabClient = msg.client;
+    collabClock = Math.max(collabClock, msg.clock);
+    // The room's cells follow; stamps from an earlier room no longer count
+    collabStamps.clear();
+    collabFlush();
+  };
+  ws.onclose = () => {
+    if(collabSocket !== ws) return;
+    collabSocket = null;
+    collabClient = null;
+    setTimeout(() => {
+      if(collabUrl !== url || collabSocket) return;
+      collabUrl = null;
+      collabConnect(url);
+    }, COLLAB_RECONNECT_MS);
+  };
+  collabSocket = ws;
+}
+
+// --- IMPORT FOTO ---
+// A chosen photo is decoded once into a luma pyramid, kept in the import
+// worker (or here, without Worker/OffscreenCanvas/createImageBitmap). The
+// preview dialog then only asks for the last downsample + threshold pass
+// when a control changes, and Anvend applies it as one history entry.
+let importWorker = null;   // null = not started yet, false = unavailable
+let importJobId = 0;
+const pendingImports = new Map();
+let importSource = null;   // { width, height, levels } once a photo is loaded; levels only without worker
+let previewBusy = false, previewQueued = false;
+
+function getImportWorker(){
+  if(importWorker !== null) return importWorker || null;
+  try {
+    if(!window.Worker || !window.OffscreenCanvas || !window.createImageBitmap){
+      throw new Error('Worker/OffscreenCanvas/createImageBitmap not supported');
+    }
+    importWorker = new Worker('import-worker.js' + ASSET_QUERY);
+    importWorker.onmessage = (e) => {
+      const job = pendingImports.get(e.data.id);
+      if(!job) return;
+      pendingImports.delete(e.data.id);
+      if(e.data.type === 'error') job.reject(new Error(e.data.message));
+      else job.resolve(e.data);
+    };
+    importWorker.onerror = (e) => {
+      console.warn('Import worker error:', e);
+      importWorker.terminate();
+      importWorker = false;
+      pendingImports.forEach(job => job.reject(new Error(e.message || 'Import worker failed')));
+      pendingImports.clear();
+    };
+  } catch(e){
+    console.warn('Import worker not available, converting on the main thread:', e);
+    importWorker = false;
+  }
+  return importWorker || null;
+}
+
+function postImport(msg, transfer=[]){
+  const id = ++importJobId;
+  return new Promise((resolve, reject) => {
+    pendingImports.set(id, { resolve, reject });
+    importWorker.postMessage(Object.assign({ id }, msg), transfer);
+  });
+}
+
+function loadImageElement(file){
+  return new Promise((resolve, reject) => {
+    const url = URL.createObjectURL(file);
+    const img = new Image();
+    img.onload = () => { URL.revokeObjectURL(url); resolve(img); };
+    img.onerror = () => { URL.revokeObjectURL(url); reject(new Error('Image decode failed')); };
+    img.src = url;
+  });
+}
+
+async function loadPhoto(file){
+  const worker = getImportWorker();
+  if(worker){
+    const bitmap = await createImageBitmap(file);
+    const msg = await postImport({ type: 'load', bitmap }, [bitmap]);
+    importSource = { width: msg.width, height: msg.height, levels: null };
+    return;
+  }
+  const bitmap = window.createImageBitmap ? await createImageBitmap(file) : await loadImageElement(file);
+  const levels = pyramidFromBitmap(bitmap);
+  if(bitmap.close) bitmap.close();
+  importSource = { width: levels[0].w, height: levels[0].h, levels };
+}
+
+// Resolves to rows×cols stitch codes for the loaded photo
+async function convertPhoto(rows, cols, opts){
+  if(importSource.levels) return convertLuma(importSource.levels, rows, cols, opts);
+  const msg = await postImport({ type: 'convert', rows, cols, opts });
+  return new Uint8Array(msg.cells);
+}
+
+function releasePhoto(){
+  importSource = null;
+  if(importWorker) importWorker.postMessage({ type: 'clear' });
+}
+
+function importSettings(){
+  const cols = parseInt(document.getElementById('importCols').value, 10);
+  const rows = document.getElementById('importFitRows').checked
+    ? Math.max(1, Math.round(cols * importSource.height / importSource.width))
+    : ROWS;
+  return {
+    rows, cols,
+    opts: {
+      method: document.getElementById('importMethod').value,
+      threshold: parseInt(document.getElementById('importThreshold').value, 10),
+      contrast: parseInt(document.getElementById('importContrast').value, 10),
+      invert: document.getElementById('importInvert').checked,
+    },
+  };
+}
+
+// At most one conversion in flight; changes made meanwhile collapse into one rerun
+function requestImportPreview(){
+  if(!importSource) return;
+  if(previewBusy){
+    previewQueued = true;
+    return;
+  }
+  previewBusy = true;
+  const { rows, cols, opts } = importSettings();
+  document.getElementById('importThresholdOut').textContent = opts.threshold;
+  document.getElementById('importContrastOut').textContent = opts.contrast;
+  document.getElementById('importSizeOut').textContent = `${cols}×${rows}`;
+  convertPhoto(rows, cols, opts)
+    .then(cells => drawImportPreview(cells, rows, cols))
+    .catch(err => console.error('Import preview error:', err))
+    .finally(() => {
+      previewBusy = false;
+      if(previewQueued){
+        previewQueued = false;
+        requestImportPreview();
+      }
+    });
+}
+
+// One pixel per cell, scaled up by CSS
+function drawImportPreview(cells, rows, cols){
+  const pc = document.getElementById('importPreview');
+  if(pc.width !== cols || pc.height !== rows){
+    pc.width = cols; pc.height = rows;
+  }
+  const pCtx = pc.getContext('2d');
+  const img = pCtx.createImageData(cols, rows);
+  const px = new Uint32Array(img.data.buffer);
+  for(let i=0; i<cells.length; i++) px[i] = STITCH_RGBA[cells[i]];
+  pCtx.putImageData(img, 0, 0);
+  // Keep cells square on screen
+  const k = Math.min(640 / cols, 400 / rows);
+  pc.style.width = Math.round(cols * k) + 'px';
+  pc.style.height = Math.round(rows * k) + 'px';
+}
+
+function openImport(){
+  document.getElementById('importCols').value = COLS;
+  document.getElementById('importApply').disabled = false;
+  document.getElementById('importBackdrop').style.display = 'flex';
+  requestImportPreview();
+}
+function closeImport(){
+  document.getElementById('importBackdrop').style.display = 'none';
+  releasePhoto();
+}
+function closeImportFromBackdrop(e){
+  if(e.target && e.target.id === 'importBackdrop') closeImport();
+}
+
+async function applyImport(){
+  if(!importSource) return;
+  const { rows, cols, opts } = importSettings();
+  if(rows * cols > LARGE_GRID_CELLS){
+    if(!confirm(`Dette er et meget stort grid (${rows}×${cols} = ${rows*cols} celler). Det kan være langsomt. Fortsæt?`)){
+      return;
+    }
+  }
+  document.getElementById('importApply').disabled = true;
+  let cells;
+  try {
+    cells = await convertPhoto(rows, cols, opts);
+  } catch(err){
+    console.error('Image processing error:', err);
+    alert('Kunne ikke behandle billedet. Prøv en anden fil.');
+    document.getElementById('importApply').disabled = false;
+    return;
+  }
+
+  replaceGrid(rows, cols, cells);
+  schedulePersist('settings');
+  closeImport();
+
+  // Close menu
+  const panel = document.getElementById('panel');
+  if(panel.style.display === 'block') togglePanel();
+}
+
+document.getElementById('imgInput').onchange = async function(e){
+  const file = e.target.files && e.target.files[0];
+  e.target.value = "";
+  if(!file) return;
+
+  // Validate file type
+  if(!file.type.startsWith('image/')){
+    alert('Vælg venligst en billedfil (PNG, JPEG, etc.)');
+    return;
+  }
+
+  // Check file size (limit to 10MB)
+  if(file.size > 10 * 1024 * 1024){
+    alert('Billedet er for stort. Vælg venligst et billede under 10MB.');
+    return;
+  }
+
+  try {
+    await loadPhoto(file);
+  } catch(err){
+    console.error('Image load error:', err);
+    alert('Kunne ikke indlæse billedet. Prøv en anden fil.');
+    return;
+  }
+  openImport();
+};
+
+async function resetCanvas(){
+  if(confirm("Vil du slette ALT? Dette kan ikke fortrydes.")){
+    try {
+      storeReady = false;
+      const db = await openStore();
+      if(db){
+        const tx = db.transaction(IDB_STORE, 'readwrite');
+        tx.objectStore(IDB_STORE).clear();
+        await idbDone(tx);
+      }
+      // Only this editor's keys: the origin is shared with the rest of the app
+      LEGACY_KEYS.forEach(k => localStorage.removeItem(k));
+
+      // Start over in place with an empty grid of the same size and no
+      // history. It is saved and synced like an edit, so a chart in the
+      // app's store is emptied too instead of coming back on reload.
+      commitStroke();
+      history = [];
+      redoStack = [];
+      historyBytes = 0;
+      setGridSize(ROWS, COLS, createGrid(ROWS, COLS));
+      storeReady = true;
+      schedulePersist('grid', 'history', 'settings');
+      requestSync();
+    } catch(e){
+      console.error('Reset error:', e);
+      storeReady = true;
+      alert('Kunne ikke nulstille. Prøv at genindlæse siden manuelt.');
+    }
+  }
+}
+
+init();
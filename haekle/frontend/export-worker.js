@@ -0,0 +1,18 @@
+// Export worker (see getExportWorker): runs export jobs with renderCore.
+importScripts('render-core.js' + self.location.search);
+
+const cancelledJobs = new Set();
+
+self.onmessage = async (e) => {
+  const msg = e.data;
+  if(msg.type === 'cancel'){ cancelledJobs.add(msg.id); return; }
+  if(msg.type !== 'export') return;
+
+  const post = (m, transfer=[]) => self.postMessage(Object.assign({ id: msg.id }, m), transfer);
+  try {
+    await runExportJob(msg, post, () => cancelledJobs.has(msg.id));
+  } catch(err){
+    post({ type: 'error', message: String((err && err.message) || err) });
+  }
+  cancelledJobs.delete(msg.id);
+};
@@ -0,0 +1,216 @@
+// --- IMAGE CONVERSION ---
+const IMPORT_METHODS = ['otsu', 'adaptive', 'dither'];
+
+// Rec. 601 luma (0..255) of an RGBA buffer; transparent pixels count as white
+function lumaFromRGBA(pix, w, h){
+  const out = new Float32Array(w * h);
+  for(let i=0, p=0; i<out.length; i++, p+=4){
+    const y = 0.299*pix[p] + 0.587*pix[p+1] + 0.114*pix[p+2];
+    const a = pix[p+3] / 255;
+    out[i] = y*a + 255*(1 - a);
+  }
+  return out;
+}
+
+// 2×2 box average; an odd last row/column is averaged with itself
+function halveLuma(src, w, h){
+  const dw = Math.max(1, w >> 1), dh = Math.max(1, h >> 1);
+  const out = new Float32Array(dw * dh);
+  for(let y=0; y<dh; y++){
+    const r0 = Math.min(h-1, 2*y) * w, r1 = Math.min(h-1, 2*y+1) * w;
+    for(let x=0; x<dw; x++){
+      const c0 = Math.min(w-1, 2*x), c1 = Math.min(w-1, 2*x+1);
+      out[y*dw + x] = (src[r0+c0] + src[r0+c1] + src[r1+c0] + src[r1+c1]) * 0.25;
+    }
+  }
+  return { data: out, w: dw, h: dh };
+}
+
+// Mip levels from full size down to 1×1
+function buildLumaPyramid(luma, w, h){
+  const levels = [{ data: luma, w, h }];
+  while(w > 1 || h > 1){
+    const next = halveLuma(levels[levels.length-1].data, w, h);
+    levels.push(next);
+    w = next.w; h = next.h;
+  }
+  return levels;
+}
+
+// Per output sample: first source index and the covered fraction of each
+// source sample, for an area average from n to m samples (n >= m)
+function areaWeights(n, m){
+  const scale = n / m;
+  const start = new Int32Array(m), count = new Int32Array(m);
+  const weights = [];
+  for(let i=0; i<m; i++){
+    const a = i * scale, b = a + scale;
+    const first = Math.floor(a), last = Math.min(n, Math.ceil(b));
+    start[i] = first;
+    count[i] = last - first;
+    for(let k=first; k<last; k++) weights.push((Math.min(b, k+1) - Math.max(a, k)) / scale);
+  }
+  return { start, count, weights: Float32Array.from(weights) };
+}
+
+// Exact area-average resample (separable: rows first, then columns)
+function resampleArea(src, sw, sh, dw, dh){
+  const wx = areaWeights(sw, dw), wy = areaWeights(sh, dh);
+  const tmp = new Float32Array(dw * sh);
+  for(let y=0; y<sh; y++){
+    const row = y * sw;
+    for(let x=0, k=0; x<dw; x++){
+      let sum = 0;
+      for(let j=0; j<wx.count[x]; j++, k++) sum += src[row + wx.start[x] + j] * wx.weights[k];
+      tmp[y*dw + x] = sum;
+    }
+  }
+  const out = new Float32Array(dw * dh);
+  for(let y=0, k0=0; y<dh; y++){
+    for(let x=0; x<dw; x++){
+      let sum = 0;
+      for(let j=0, k=k0; j<wy.count[y]; j++, k++) sum += tmp[(wy.start[y] + j)*dw + x] * wy.weights[k];
+      out[y*dw + x] = sum;
+    }
+    k0 += wy.count[y];
+  }
+  return out;
+}
+
+// Downsample through the pyramid: start from the smallest level that is
+// still at least the target size, so the last area pass is short
+function sampleLuma(levels, dw, dh){
+  let lv = levels[0];
+  for(const l of levels){
+    if(l.w < dw || l.h < dh) break;
+    lv = l;
+  }
+  if(lv.w < dw || lv.h < dh){
+    // Target larger than the photo: nearest sample from the full image
+    const out = new Float32Array(dw * dh);
+    for(let y=0; y<dh; y++){
+      const sy = Math.min(lv.h-1, Math.floor(y * lv.h / dh));
+      for(let x=0; x<dw; x++) out[y*dw + x] = lv.data[sy*lv.w + Math.min(lv.w-1, Math.floor(x * lv.w / dw))];
+    }
+    return out;
+  }
+  return resampleArea(lv.data, lv.w, lv.h, dw, dh);
+}
+
+// Threshold that best separates dark and light values (Otsu)
+function otsuThreshold(luma){
+  const hist = new Float64Array(256);
+  for(let i=0; i<luma.length; i++) hist[Math.max(0, Math.min(255, luma[i] | 0))]++;
+  let total = 0;
+  for(let t=0; t<256; t++) total += t * hist[t];
+  let wB = 0, sumB = 0, best = 0, bestT = 128;
+  for(let t=0; t<256; t++){
+    wB += hist[t];
+    if(!wB) continue;
+    const wF = luma.length - wB;
+    if(!wF) break;
+    sumB += t * hist[t];
+    const mB = sumB / wB, mF = (total - sumB) / wF;
+    const between = wB * wF * (mB - mF) * (mB - mF);
+    if(between > best){ best = between; bestT = t + 0.5; }
+  }
+  return bestT;
+}
+
+// Invert and contrast (percent, around mid grey), in place
+function adjustLuma(luma, contrast, invert){
+  const k = 1 + contrast / 100;
+  for(let i=0; i<luma.length; i++){
+    const v = invert ? 255 - luma[i] : luma[i];
+    luma[i] = Math.max(0, Math.min(255, (v - 128) * k + 128));
+  }
+  return luma;
+}
+
+function thresholdCells(luma, t){
+  const out = new Uint8Array(luma.length);
+  for(let i=0; i<luma.length; i++) out[i] = luma[i] < t ? FILL : EMPTY;
+  return out;
+}
+
+// Dark relative to the local mean (summed-area table); bias keeps flat areas empty
+function adaptiveCells(luma, w, h, radius, bias){
+  const sat = new Float64Array((w+1) * (h+1));
+  for(let y=0; y<h; y++){
+    let rowSum = 0;
+    for(let x=0; x<w; x++){
+      rowSum += luma[y*w + x];
+      sat[(y+1)*(w+1) + x+1] = sat[y*(w+1) + x+1] + rowSum;
+    }
+  }
+  const out = new Uint8Array(w * h);
+  for(let y=0; y<h; y++){
+    const y0 = Math.max(0, y-radius), y1 = Math.min(h, y+radius+1);
+    for(let x=0; x<w; x++){
+      const x0 = Math.max(0, x-radius), x1 = Math.min(w, x+radius+1);
+      const sum = sat[y1*(w+1) + x1] - sat[y0*(w+1) + x1] - sat[y1*(w+1) + x0] + sat[y0*(w+1) + x0];
+      const mean = sum / ((x1-x0) * (y1-y0));
+      out[y*w + x] = luma[y*w + x] < mean - bias ? FILL : EMPTY;
+    }
+  }
+  return out;
+}
+
+// Stretches the values in place to the full 0..255 range
+function stretchLuma(luma){
+  let lo = 255, hi = 0;
+  for(let i=0; i<luma.length; i++){
+    if(luma[i] < lo) lo = luma[i];
+    if(luma[i] > hi) hi = luma[i];
+  }
+  if(hi - lo < 1) return luma;
+  const k = 255 / (hi - lo);
+  for(let i=0; i<luma.length; i++) luma[i] = (luma[i] - lo) * k;
+  return luma;
+}
+
+// Floyd–Steinberg error diffusion, serpentine, quantizing at t
+function ditherCells(luma, w, h, t){
+  const err = Float32Array.from(luma);
+  const out = new Uint8Array(w * h);
+  for(let y=0; y<h; y++){
+    const ltr = (y & 1) === 0, dir = ltr ? 1 : -1;
+    for(let n=0, x=ltr ? 0 : w-1; n<w; n++, x+=dir){
+      const i = y*w + x;
+      const v = err[i];
+      const dark = v < t;
+      out[i] = dark ? FILL : EMPTY;
+      const e = v - (dark ? 0 : 255);
+      if(x+dir >= 0 && x+dir < w) err[i+dir] += e * 7/16;
+      if(y+1 < h){
+        if(x-dir >= 0 && x-dir < w) err[i+w-dir] += e * 3/16;
+        err[i+w] += e * 5/16;
+        if(x+dir >= 0 && x+dir < w) err[i+w+dir] += e * 1/16;
+      }
+    }
+  }
+  return out;
+}
+
+// Converts a luma pyramid to rows×cols stitch codes. opts: method,
+// threshold (added to the automatic level; higher = more filled cells),
+// contrast (percent) and invert. Only this last pass depends on opts.
+function convertLuma(levels, rows, cols, opts){
+  const luma = adjustLuma(sampleLuma(levels, cols, rows), opts.contrast || 0, !!opts.invert);
+  const shift = opts.threshold || 0;
+  if(opts.method === 'adaptive'){
+    return adaptiveCells(luma, cols, rows, Math.max(2, Math.round(Math.min(rows, cols) / 8)), 4 - shift / 4);
+  }
+  if(opts.method === 'dither') return ditherCells(stretchLuma(luma), cols, rows, 128 + shift);
+  return thresholdCells(luma, otsuThreshold(luma) + shift);
+}
+
+// Decoded bitmap (ImageBitmap or <img>) to a luma pyramid
+function pyramidFromBitmap(bitmap){
+  const w = bitmap.width, h = bitmap.height;
+  const c = createCanvas(w, h);
+  const cCtx = c.getContext('2d');
+  cCtx.drawImage(bitmap, 0, 0);
+  const pix = cCtx.getImageData(0, 0, w, h).data;
+  return buildLumaPyramid(lumaFromRGBA(pix, w, h), w, h);
+}
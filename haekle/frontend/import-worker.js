@@ -0,0 +1,24 @@
+// Import worker (see getImportWorker). 'load' decodes a photo into a cached
+// luma pyramid, 'convert' runs the final pass on it, 'clear' drops it.
+importScripts('render-core.js' + self.location.search, 'import-core.js' + self.location.search);
+
+let levels = null;
+
+self.onmessage = (e) => {
+  const msg = e.data;
+  try {
+    if(msg.type === 'load'){
+      levels = pyramidFromBitmap(msg.bitmap);
+      msg.bitmap.close();
+      self.postMessage({ id: msg.id, type: 'loaded', width: levels[0].w, height: levels[0].h });
+    } else if(msg.type === 'convert'){
+      if(!levels) throw new Error('No photo loaded');
+      const cells = convertLuma(levels, msg.rows, msg.cols, msg.opts);
+      self.postMessage({ id: msg.id, type: 'result', cells: cells.buffer }, [cells.buffer]);
+    } else if(msg.type === 'clear'){
+      levels = null;
+    }
+  } catch(err){
+    self.postMessage({ id: msg.id, type: 'error', message: String((err && err.message) || err) });
+  }
+};
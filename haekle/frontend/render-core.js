@@ -0,0 +1,267 @@
+// --- GRID STATE ---
+let COLS = 23, ROWS = 114, SIZE = 25, OFFSET = 45;
+let gridData = new Uint8Array(0);
+const EXPORT_MARGIN = 40; // White border around exported charts (chart px)
+
+// --- GRID MODEL ---
+// gridData is one flat row-major Uint8Array (index = r*COLS + c), one byte per cell.
+// The byte is a stitch code; STITCH_NAMES maps codes back to the #mode values.
+const EMPTY = 0;
+const STITCH_NAMES = [null, 'fill', 'X', 'O'];
+const STITCH_CODES = { fill: 1, X: 2, O: 3 };
+const FILL = STITCH_CODES.fill;
+
+function createGrid(rows, cols){ return new Uint8Array(rows * cols); }
+function cellIndex(r, c){ return r * COLS + c; }
+function getCell(r, c){ return gridData[r * COLS + c]; }
+function setCell(r, c, code){ gridData[r * COLS + c] = code; }
+function gridRow(r){ return gridData.subarray(r * COLS, (r + 1) * COLS); }
+
+// Copy cells into a grid of a new size, keeping the top-left overlap
+function resizeCells(src, rows, cols, nRows, nCols){
+  const out = createGrid(nRows, nCols);
+  const w = Math.min(cols, nCols);
+  for(let r=0; r<Math.min(rows, nRows); r++){
+    out.set(src.subarray(r * cols, r * cols + w), r * nCols);
+  }
+  return out;
+}
+
+// Canvas that works both in the page and in a worker
+function createCanvas(w, h){
+  if(typeof document === 'undefined') return new OffscreenCanvas(w, h);
+  const c = document.createElement('canvas');
+  c.width = w;
+  c.height = h;
+  return c;
+}
+
+// --- DRAW ---
+// Line styles by weight: every 10th line, every 5th line, the rest
+const LINE_STYLES = [
+  { key: 'minor', color: "#ddd", gray: 221, width: 0.8 },
+  { key: 'mid',   color: "#888", gray: 136, width: 1.5 },
+  { key: 'major', color: "#000", gray: 0,   width: 1.5 },
+];
+function lineWeight(i){ return (i%10===0) ? 'major' : (i%5===0 ? 'mid' : 'minor'); }
+
+// One Path2D per line weight for rows r0..r1 and columns c0..c1 (line indices,
+// inclusive), in grid coordinates with the top-left grid corner at 0,0
+function buildGridPaths(s, r0, r1, c0, c1){
+  const paths = { minor: new Path2D(), mid: new Path2D(), major: new Path2D() };
+  for(let i=c0;i<=c1;i++){
+    const p = paths[lineWeight(i)];
+    p.moveTo(i*s, r0*s);
+    p.lineTo(i*s, r1*s);
+  }
+  for(let j=r0;j<=r1;j++){
+    const p = paths[lineWeight(j)];
+    p.moveTo(c0*s, j*s);
+    p.lineTo(c1*s, j*s);
+  }
+  return paths;
+}
+
+function strokeGridPaths(tCtx, paths, ox, oy, minorLines=true){
+  tCtx.save();
+  tCtx.translate(ox, oy);
+  for(const st of LINE_STYLES){
+    if(!minorLines && st.key === 'minor') continue;
+    tCtx.strokeStyle = st.color;
+    tCtx.lineWidth = st.width;
+    tCtx.stroke(paths[st.key]);
+  }
+  tCtx.restore();
+}
+
+// Grid lines and ruler numbers only change with ROWS, COLS and cell size, so
+// they are built once and reused every frame; updateCanvas() invalidates them.
+let gridLayer = null;
+function getGridLayer(s){
+  if(gridLayer && gridLayer.s === s && gridLayer.rows === ROWS && gridLayer.cols === COLS) return gridLayer;
+  const colLabels = [], rowLabels = [];
+  for(let i=0;i<COLS;i++){
+    if((i+1===1) || ((i+1)%5===0)) colLabels.push({ text: String(i+1), x: i*s + s/2 });
+  }
+  for(let j=0;j<ROWS;j++){
+    if((j+1===1) || ((j+1)%5===0)) rowLabels.push({ text: String(j+1), y: j*s + s/1.5 });
+  }
+  gridLayer = { s, rows: ROWS, cols: COLS, paths: buildGridPaths(s, 0, ROWS, 0, COLS), colLabels, rowLabels };
+  return gridLayer;
+}
+function invalidateGridLayer(){ gridLayer = null; }
+
+// Column numbers along y; x0..x1 (grid coordinates) limits which are drawn
+function drawColumnNumbers(tCtx, layer, ox, y, x0=-Infinity, x1=Infinity){
+  tCtx.font = "bold 12px Arial";
+  tCtx.fillStyle = "#000";
+  tCtx.textAlign = "center";
+  for(const l of layer.colLabels){
+    if(l.x >= x0 && l.x <= x1) tCtx.fillText(l.text, l.x + ox, y);
+  }
+}
+
+// Row numbers left of the grid; y0..y1 (grid coordinates) limits which are drawn
+function drawRowNumbers(tCtx, layer, ox, oy, y0=-Infinity, y1=Infinity){
+  tCtx.font = "bold 12px Arial";
+  tCtx.fillStyle = "#000";
+  tCtx.textAlign = "right";
+  for(const l of layer.rowLabels){
+    if(l.y >= y0 && l.y <= y1) tCtx.fillText(l.text, ox - 10, l.y + oy);
+  }
+}
+
+// view (optional) limits the labels to a visible area in the same coordinates
+function drawNumbering(tCtx, layer, ox, oy, view=null){
+  if(!view){
+    drawColumnNumbers(tCtx, layer, ox, oy - 12);
+    drawRowNumbers(tCtx, layer, ox, oy);
+    return;
+  }
+  drawColumnNumbers(tCtx, layer, ox, oy - 12, view.x0 - ox - 20, view.x1 - ox + 20);
+  drawRowNumbers(tCtx, layer, ox, oy, view.y0 - oy - 20, view.y1 - oy + 20);
+}
+
+// --- GLYPH ATLAS ---
+// X/O symbols are rasterized once per cell size and pixel ratio (device pixels
+// per chart px) into a strip with one s×s slot per stitch code, then blitted
+// with drawImage instead of shaping text for every cell.
+const glyphAtlases = new Map();
+const MAX_GLYPH_ATLASES = 6;
+
+function getGlyphAtlas(s, pxRatio){
+  const key = `${s}@${pxRatio}`;
+  let atlas = glyphAtlases.get(key);
+  if(atlas) return atlas;
+
+  const px = Math.max(1, Math.ceil(s * pxRatio));
+  const aCanvas = createCanvas(px * STITCH_NAMES.length, px);
+  const aCtx = aCanvas.getContext('2d');
+  aCtx.scale(px / s, px / s);
+  aCtx.textAlign = "center";
+  aCtx.fillStyle = "black";
+  aCtx.font = `bold ${s*0.7}px Arial`;
+  for(let code=0; code<STITCH_NAMES.length; code++){
+    if(code === EMPTY || code === FILL) continue;
+    aCtx.fillText(STITCH_NAMES[code], code*s + s/2, s/1.3);
+  }
+
+  if(glyphAtlases.size >= MAX_GLYPH_ATLASES){
+    glyphAtlases.delete(glyphAtlases.keys().next().value);
+  }
+  atlas = { canvas: aCanvas, px };
+  glyphAtlases.set(key, atlas);
+  return atlas;
+}
+
+// Stitches in rows r0..r1-1 and columns c0..c1-1. With glyphs=false the X/O
+// cells are filled with their STITCH_TINTS colour instead (zoomed-out view).
+function drawCells(tCtx, s, ox, oy, r0, r1, c0, c1, pxRatio=1, glyphs=true){
+  const atlas = glyphs ? getGlyphAtlas(s, pxRatio) : null;
+  const ap = glyphs ? atlas.px : 0;
+  let tint = "black";
+  tCtx.fillStyle = tint;
+  for(let r=r0;r<r1;r++){
+    const row = gridRow(r);
+    const y = r*s + oy;
+    for(let c=c0;c<c1;c++){
+      const code = row[c];
+      if(code === EMPTY) continue;
+      const x = c*s + ox;
+
+      if(code === FILL || !glyphs){
+        if(STITCH_TINTS[code] !== tint){
+          tint = STITCH_TINTS[code];
+          tCtx.fillStyle = tint;
+        }
+        tCtx.fillRect(x+1,y+1,s-1,s-1);
+      } else {
+        tCtx.drawImage(atlas.canvas, code*ap, 0, ap, ap, x, y, s, s);
+      }
+    }
+  }
+}
+
+// Solid colour per stitch code for zoomed-out drawing (CSS and packed RGBA)
+const STITCH_TINTS = ["white", "black", "#666", "#aaa"];
+const STITCH_RGBA = new Uint32Array([0xffffffff, 0xff000000, 0xff666666, 0xffaaaaaa]);
+
+// pxRatio is the device pixels per chart px of tCtx (e.g. the export scale)
+function drawOnContext(tCtx, s, off, isExport=false, pxRatio=1){
+  const margin = isExport ? EXPORT_MARGIN : 0;
+  const o = off + margin;
+  tCtx.fillStyle = "white";
+  tCtx.fillRect(0,0,tCtx.canvas.width,tCtx.canvas.height);
+
+  const layer = getGridLayer(s);
+  strokeGridPaths(tCtx, layer.paths, o, o);
+  drawNumbering(tCtx, layer, o, o);
+  drawCells(tCtx, s, o, o, 0, ROWS, 0, COLS, pxRatio);
+}
+
+// One export page: the column ruler band (same height as on the full chart),
+// then rows r0..r1-1 directly below it. Pages are drawn one at a time so
+// export memory is bounded by a single page.
+function pageChartHeight(s, off, rowCount){
+  return off + EXPORT_MARGIN + rowCount*s + 2;
+}
+function drawPageOnContext(tCtx, s, off, r0, r1, pxRatio=1){
+  const ox = off + EXPORT_MARGIN;
+  const top = off + EXPORT_MARGIN;
+  const oy = top - r0*s;
+  tCtx.fillStyle = "white";
+  tCtx.fillRect(0, 0, tCtx.canvas.width, tCtx.canvas.height);
+
+  const layer = getGridLayer(s);
+  strokeGridPaths(tCtx, buildGridPaths(s, r0, r1, 0, COLS), ox, oy);
+  drawColumnNumbers(tCtx, layer, ox, top - 12);
+  drawRowNumbers(tCtx, layer, ox, oy, r0*s, r1*s);
+  drawCells(tCtx, s, ox, oy, r0, r1, 0, COLS, pxRatio);
+}
+
+// --- EXPORT JOBS ---
+function canvasToBlob(c, type, quality){
+  if(c.convertToBlob) return c.convertToBlob({ type, quality });
+  return new Promise((resolve, reject) => {
+    c.toBlob(b => b ? resolve(b) : reject(new Error('toBlob failed')), type, quality);
+  });
+}
+
+// Renders an export and reports through post(msg, transfer):
+//   kind 'png': { type:'png', blob }
+//   kind 'pdf': { type:'page', page, total, width, height, data:ArrayBuffer (JPEG) } per page
+// followed by { type:'done' }, or { type:'cancelled' } once isCancelled() is true.
+// A job that carries cells (the worker's copy of the grid) is loaded into the
+// grid globals first; without them the current grid is used.
+async function runExportJob(job, post, isCancelled){
+  if(job.cells){
+    ROWS = job.rows; COLS = job.cols; SIZE = job.size; OFFSET = job.offset;
+    gridData = new Uint8Array(job.cells);
+  }
+
+  if(job.kind === 'png'){
+    const c = createCanvas((COLS * SIZE) + OFFSET, (ROWS * SIZE) + OFFSET);
+    drawOnContext(c.getContext('2d'), SIZE, OFFSET, false);
+    const blob = await canvasToBlob(c, 'image/png');
+    if(isCancelled()){ post({ type: 'cancelled' }); return; }
+    post({ type: 'png', blob });
+    post({ type: 'done' });
+    return;
+  }
+
+  const { exportScale, jpegQuality, rowsPerPage } = job;
+  const total = Math.ceil(ROWS / rowsPerPage);
+  const pageCanvas = createCanvas(Math.ceil(((COLS * SIZE) + OFFSET + 2*EXPORT_MARGIN) * exportScale), 1);
+  const pCtx = pageCanvas.getContext('2d');
+  for(let page = 0; page < total; page++){
+    if(isCancelled()){ post({ type: 'cancelled' }); return; }
+    const r0 = page * rowsPerPage;
+    const r1 = Math.min(ROWS, r0 + rowsPerPage);
+    pageCanvas.height = Math.ceil(pageChartHeight(SIZE, OFFSET, r1 - r0) * exportScale);
+    pCtx.setTransform(exportScale, 0, 0, exportScale, 0, 0);
+    drawPageOnContext(pCtx, SIZE, OFFSET, r0, r1, exportScale);
+    const data = await (await canvasToBlob(pageCanvas, 'image/jpeg', jpegQuality)).arrayBuffer();
+    post({ type: 'page', page, total, width: pageCanvas.width, height: pageCanvas.height, data }, [data]);
+  }
+  post({ type: 'done' });
+}
@@ -0,0 +1,25 @@
+// The Streamlit component protocol, as streamlit-component-lib speaks it:
+// 'streamlit:render' messages bring the Python arguments, and the component
+// answers with its frame height and return value. Outside Streamlit (the page
+// opened on its own) nothing answers and the editor works as before.
+const Streamlit = (() => {
+  const renderListeners = [];
+
+  function send(type, data){
+    if(window.parent === window) return;
+    window.parent.postMessage(Object.assign({ isStreamlitMessage: true, type }, data), '*');
+  }
+
+  window.addEventListener('message', (e) => {
+    const msg = e.data;
+    if(!msg || msg.type !== 'streamlit:render') return;
+    for(const fn of renderListeners) fn(msg.args || {});
+  });
+
+  return {
+    ready(){ send('streamlit:componentReady', { apiVersion: 1 }); },
+    onRender(fn){ renderListeners.push(fn); },
+    setFrameHeight(height){ send('streamlit:setFrameHeight', { height }); },
+    setComponentValue(value){ send('streamlit:setComponentValue', { value, dataType: 'json' }); },
+  };
+})();
@@ -0,0 +1,12 @@
+"""Stitch codes, as stored in the editor's gridData and in Pattern cells."""
+
+EMPTY, FILL, X, O = 0, 1, 2, 3
+STITCH_NAMES = {EMPTY: "", FILL: "■", X: "X", O: "O"}   # As drawn in a cell
+# The editor's names (STITCH_NAMES in render-core.js, the #mode values), as
+# written in files such as the .hgrid palette
+STITCH_KEYS = {EMPTY: "", FILL: "fill", X: "X", O: "O"}
+
+# Largest chart the editor makes (MAX_GRID_SIDE/MAX_GRID_CELLS in editor.js):
+# rows and cols are u16 in the relay protocol, and 64M cells are 64 MB
+MAX_SIDE = 65535
+MAX_CELLS = 1 << 26
@@ -0,0 +1,199 @@
+"""The .hgrid chart file format.
+
+Little-endian, version 1:
+
+    0   4s   magic b"HGRD"
+    4   u8   version (1)
+    5   u8   encoding: 0 raw (one byte per cell), 1 packed (2 bits per cell,
+             each row padded to whole bytes, first cell in the low bits),
+             2 rle (the editor's run-length packRuns format)
+    6   u8   palette size n
+    7   u8   reserved (0)
+    8   u32  rows
+    12  u32  cols
+    16  u32  chunk_rows: rows per chunk, 0 when the payload is one chunk
+    20  u32  payload offset from the start of the file
+    24       palette: n × (u8 length, UTF-8 stitch name as grid.STITCH_KEYS),
+             code = position; a cell code outside the palette is an error
+             chunk index when chunk_rows > 0: (chunks + 1) × u64 offsets of
+             each chunk's payload, relative to the payload offset
+             payload
+
+Raw and packed payloads have a fixed size per row, so rows are read straight
+from a numpy.memmap. RLE payloads are usually much smaller and are split into
+independently packed row chunks, so a row range only decodes its chunks.
+"""
+
+import struct
+
+import numpy as np
+
+from .codecs import pack_runs, unpack_runs
+from .grid import STITCH_KEYS
+
+MAGIC = b"HGRD"
+VERSION = 1
+RAW, PACKED, RLE = 0, 1, 2
+ENCODINGS = {"raw": RAW, "packed": PACKED, "rle": RLE}
+DEFAULT_CHUNK_ROWS = 64
+_HEADER = struct.Struct("<4sBBBBIIII")
+
+
+# --- PAYLOAD CODECS ---
+def _pack_rows(cells):
+    rows, cols = cells.shape
+    width = -(-cols // 4)
+    padded = np.zeros((rows, width * 4), dtype=np.uint8)
+    padded[:, :cols] = cells
+    q = padded.reshape(rows, width, 4)
+    return (q[..., 0] | (q[..., 1] << 2) | (q[..., 2] << 4) | (q[..., 3] << 6)).astype(np.uint8)
+
+
+def _unpack_rows(packed, cols):
+    packed = np.asarray(packed, dtype=np.uint8)
+    out = np.stack([(packed >> shift) & 3 for shift in (0, 2, 4, 6)], axis=-1)
+    return out.reshape(packed.shape[0], -1)[:, :cols]
+
+
+def _rle_chunks(cells, chunk_rows):
+    """pack_runs of each chunk_rows rows; one chunk when chunk_rows is 0."""
+    step = chunk_rows or max(1, cells.shape[0])
+    return [pack_runs(cells[r:r + step]) for r in range(0, cells.shape[0], step)]
+
+
+# --- WRITE ---
+def encode_hgrid(pattern, encoding="auto", chunk_rows=DEFAULT_CHUNK_ROWS):
+    """The .hgrid bytes for pattern. encoding "auto" picks rle when it is
+    smaller than packed, else packed. chunk_rows 0 writes the rle payload as
+    one chunk, without an index."""
+    cells = np.ascontiguousarray(pattern.cells, dtype=np.uint8)
+    rows, cols = cells.shape
+    if not isinstance(chunk_rows, int) or chunk_rows < 0:
+        raise ValueError(f"chunk_rows must be 0 (one chunk) or a positive number of rows, got {chunk_rows!r}")
+    index_size = 8 * (-(-rows // chunk_rows) + 1) if chunk_rows else 0
+    if encoding == "auto":
+        chunks = _rle_chunks(cells, chunk_rows)
+        packed_size = rows * -(-cols // 4)
+        enc = RLE if sum(map(len, chunks)) + index_size < packed_size else PACKED
+    elif encoding in ENCODINGS:
+        enc = ENCODINGS[encoding]
+        chunks = _rle_chunks(cells, chunk_rows) if enc == RLE else None
+    else:
+        raise ValueError(f"Unknown encoding {encoding!r}, expected 'auto' or one of {sorted(ENCODINGS)}")
+
+    palette = b"".join(bytes([len(name.encode())]) + name.encode() for _, name in sorted(STITCH_KEYS.items()))
+    if enc == RLE:
+        index = b""
+        if chunk_rows:
+            index = np.cumsum([0] + [len(c) for c in chunks], dtype=np.uint64).astype("<u8").tobytes()
+        payload = b"".join(chunks)
+        chunk_field = chunk_rows
+    else:
+        index = b""
+        payload = cells.tobytes() if enc == RAW else _pack_rows(cells).tobytes()
+        chunk_field = 0
+    payload_offset = _HEADER.size + len(palette) + len(index)
+    header = _HEADER.pack(MAGIC, VERSION, enc, len(STITCH_KEYS), 0, rows, cols, chunk_field, payload_offset)
+    return header + palette + index + payload
+
+
+def write_hgrid(pattern, path, encoding="auto", chunk_rows=DEFAULT_CHUNK_ROWS):
+    data = encode_hgrid(pattern, encoding, chunk_rows)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+# --- READ ---
+class HgridFile:
+    """A .hgrid file opened for reading. Only the header, palette and chunk
+    index are read up front; read_rows() reads just the rows asked for."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            head = f.read(_HEADER.size)
+            if len(head) < _HEADER.size:
+                raise ValueError(f"{path}: not a .hgrid file (too short)")
+            magic, version, enc, n_pal, _, rows, cols, chunk_rows, payload_offset = _HEADER.unpack(head)
+            if magic != MAGIC:
+                raise ValueError(f"{path}: not a .hgrid file")
+            if version != VERSION:
+                raise ValueError(f"{path}: unsupported .hgrid version {version}")
+            if enc not in (RAW, PACKED, RLE):
+                raise ValueError(f"{path}: unknown .hgrid encoding {enc}")
+            names = []
+            for _ in range(n_pal):
+                n = f.read(1)[0]
+                names.append(f.read(n).decode())
+            codes = {name: code for code, name in STITCH_KEYS.items()}
+            unknown = [n for n in names if n not in codes]
+            if unknown:
+                raise ValueError(f"{path}: unknown stitches {unknown}")
+            # File codes -> our codes (identity for files written here)
+            self._remap = np.array([codes[n] for n in names], dtype=np.uint8)
+            self._identity = np.array_equal(self._remap, np.arange(len(names)))
+            self.chunk_offsets = None
+            if chunk_rows:
+                n_chunks = -(-rows // chunk_rows)
+                self.chunk_offsets = np.frombuffer(f.read(8 * (n_chunks + 1)), dtype="<u8").astype(np.int64)
+        self.encoding = enc
+        self.rows, self.cols = rows, cols
+        self.chunk_rows = chunk_rows
+        self.payload_offset = payload_offset
+
+    @property
+    def shape(self):
+        return self.rows, self.cols
+
+    def memmap(self):
+        """The payload as a read-only memmap: (rows, cols) cells for raw
+        files, (rows, bytes per row) packed rows for packed files."""
+        if self.encoding == RAW:
+            shape = (self.rows, self.cols)
+        elif self.encoding == PACKED:
+            shape = (self.rows, -(-self.cols // 4))
+        else:
+            raise ValueError("RLE .hgrid files cannot be memory-mapped; use read_rows()")
+        return np.memmap(self.path, dtype=np.uint8, mode="r", offset=self.payload_offset, shape=shape)
+
+    def _map_codes(self, cells):
+        # Same as the editor: a code the palette does not name is an error
+        if cells.size and cells.max() >= len(self._remap):
+            raise ValueError(f"{self.path}: cell codes outside the palette of {len(self._remap)} stitches")
+        return cells if self._identity else self._remap[cells]
+
+    def read_rows(self, start, stop):
+        """Cells of rows start..stop-1 as a (stop-start, cols) array."""
+        start, stop = max(0, start), min(self.rows, stop)
+        if stop <= start:
+            return np.zeros((0, self.cols), dtype=np.uint8)
+        if self.encoding == RAW:
+            return self._map_codes(np.array(self.memmap()[start:stop]))
+        if self.encoding == PACKED:
+            return self._map_codes(_unpack_rows(self.memmap()[start:stop], self.cols))
+
+        if self.chunk_offsets is None:
+            chunk_rows, offsets = self.rows, np.array([0, -1])
+        else:
+            chunk_rows, offsets = self.chunk_rows, self.chunk_offsets
+        first, last = start // chunk_rows, (stop - 1) // chunk_rows
+        parts = []
+        with open(self.path, "rb") as f:
+            for k in range(first, last + 1):
+                f.seek(self.payload_offset + int(offsets[k]))
+                size = int(offsets[k + 1] - offsets[k]) if offsets[k + 1] >= 0 else -1
+                n_rows = min(chunk_rows, self.rows - k * chunk_rows)
+                chunk = unpack_runs(f.read(size), n_rows * self.cols)
+                parts.append(np.frombuffer(chunk, dtype=np.uint8).reshape(n_rows, self.cols))
+        block = np.concatenate(parts)
+        return self._map_codes(block[start - first * chunk_rows:stop - first * chunk_rows])
+
+    def read(self):
+        from .pattern import Pattern
+
+        return Pattern(self.read_rows(0, self.rows))
+
+
+def read_hgrid(path):
+    """The whole chart in a .hgrid file as a Pattern."""
+    return HgridFile(path).read()
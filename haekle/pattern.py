@@ -0,0 +1,245 @@
+"""Chart model on a NumPy uint8 array, with photo conversion and transforms.
+
+Cells use the same codes as the editor: 0 empty, 1 fill, 2 X, 3 O. The photo
+conversion follows the editor's import (import-core.js): the photo is turned
+upright from its EXIF orientation, as browsers decode it; Rec. 601 luma,
+transparent counts as white; 2×2 box-average pyramid then an exact area
+average; Otsu / local mean / Floyd–Steinberg. A chart converted here is the
+one converted in the browser, up to float rounding at the threshold.
+"""
+
+import numpy as np
+
+from .grid import EMPTY, FILL, O, STITCH_NAMES, X  # noqa: F401
+
+METHODS = ("otsu", "adaptive", "dither")
+
+
+# --- IMAGE CONVERSION ---
+def image_luma(image):
+    """Rec. 601 luma (0..255, float32) of a PIL image, alpha over white."""
+    rgba = np.asarray(image.convert("RGBA"), dtype=np.float32)
+    luma = rgba[..., 0] * 0.299 + rgba[..., 1] * 0.587 + rgba[..., 2] * 0.114
+    alpha = rgba[..., 3] / 255.0
+    return luma * alpha + 255.0 * (1.0 - alpha)
+
+
+def _halve_luma(luma):
+    """2×2 box average; an odd last row/column is dropped, except that a
+    single row/column is averaged with itself (halveLuma)."""
+    h, w = luma.shape
+    dh, dw = max(1, h >> 1), max(1, w >> 1)
+    r0 = np.minimum(h - 1, 2 * np.arange(dh))
+    r1 = np.minimum(h - 1, 2 * np.arange(dh) + 1)
+    c0 = np.minimum(w - 1, 2 * np.arange(dw))
+    c1 = np.minimum(w - 1, 2 * np.arange(dw) + 1)
+    rows = luma[r0] + luma[r1]
+    return (rows[:, c0] + rows[:, c1]) * np.float32(0.25)
+
+
+def _area_weights(n, m):
+    """m×n matrix averaging n samples down to m by covered area (n >= m)."""
+    scale = n / m
+    a = np.arange(m)[:, None] * scale
+    k = np.arange(n)[None, :]
+    covered = np.minimum(a + scale, k + 1) - np.maximum(a, k)
+    return (np.clip(covered, 0, None) / scale).astype(np.float32)
+
+
+def resample_luma(luma, rows, cols):
+    """Downsample to rows×cols like the editor's sampleLuma: halve by 2×2
+    box averages while the result is still at least rows×cols, then an
+    exact area average. A target larger than the photo takes the nearest
+    sample."""
+    level = np.asarray(luma, dtype=np.float32)
+    if level.shape[0] < rows or level.shape[1] < cols:
+        h, w = level.shape
+        ys = np.minimum(h - 1, np.arange(rows) * h // rows)
+        xs = np.minimum(w - 1, np.arange(cols) * w // cols)
+        return level[ys][:, xs]
+    while level.shape != (1, 1):
+        smaller = _halve_luma(level)
+        if smaller.shape[0] < rows or smaller.shape[1] < cols:
+            break
+        level = smaller
+    h, w = level.shape
+    return _area_weights(h, rows) @ level @ _area_weights(w, cols).T
+
+
+def adjust_luma(luma, contrast=0, invert=False):
+    """Invert, then scale contrast (percent) around mid grey."""
+    if invert:
+        luma = 255.0 - luma
+    return np.clip((luma - 128.0) * (1.0 + contrast / 100.0) + 128.0, 0, 255)
+
+
+def otsu_threshold(luma):
+    """Threshold that best separates dark and light values."""
+    hist = np.bincount(np.clip(luma, 0, 255).astype(np.uint8).ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    w_b = np.cumsum(hist)
+    w_f = hist.sum() - w_b
+    sum_b = np.cumsum(hist * levels)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m_b = sum_b / w_b
+        m_f = (sum_b[-1] - sum_b) / w_f
+        between = w_b * w_f * (m_b - m_f) ** 2
+    between[~np.isfinite(between)] = 0
+    if not between.any():
+        return 128.0
+    return float(np.argmax(between)) + 0.5
+
+
+def adaptive_cells(luma, radius, bias):
+    """Fill cells darker than their local mean minus bias (summed-area table)."""
+    h, w = luma.shape
+    sat = np.zeros((h + 1, w + 1), dtype=np.float64)
+    sat[1:, 1:] = luma.cumsum(0).cumsum(1)
+    y = np.arange(h)
+    x = np.arange(w)
+    y0, y1 = np.maximum(0, y - radius), np.minimum(h, y + radius + 1)
+    x0, x1 = np.maximum(0, x - radius), np.minimum(w, x + radius + 1)
+    total = (sat[y1][:, x1] - sat[y0][:, x1] - sat[y1][:, x0] + sat[y0][:, x0])
+    mean = total / np.outer(y1 - y0, x1 - x0)
+    return np.where(luma < mean - bias, FILL, EMPTY).astype(np.uint8)
+
+
+def stretch_luma(luma):
+    lo, hi = float(luma.min()), float(luma.max())
+    if hi - lo < 1:
+        return luma
+    return (luma - lo) * (255.0 / (hi - lo))
+
+
+def dither_cells(luma, threshold=128.0):
+    """Serpentine Floyd–Steinberg error diffusion, quantizing at threshold."""
+    h, w = luma.shape
+    # Plain lists: the scan is sequential, and element access is much
+    # cheaper than on NumPy arrays
+    err = luma.astype(np.float64).tolist()
+    out = np.zeros((h, w), dtype=np.uint8)
+    for y in range(h):
+        row = err[y]
+        below = err[y + 1] if y + 1 < h else None
+        dark_row = out[y]
+        step = 1 if y % 2 == 0 else -1
+        marks = []
+        for x in range(0, w) if step == 1 else range(w - 1, -1, -1):
+            v = row[x]
+            dark = v < threshold
+            if dark:
+                marks.append(x)
+            e = v - (0.0 if dark else 255.0)
+            nx, px = x + step, x - step
+            if 0 <= nx < w:
+                row[nx] += e * 7 / 16
+            if below is not None:
+                if 0 <= px < w:
+                    below[px] += e * 3 / 16
+                below[x] += e * 5 / 16
+                if 0 <= nx < w:
+                    below[nx] += e * 1 / 16
+        dark_row[marks] = FILL
+    return out
+
+
+def convert_luma(luma, method="otsu", threshold=0):
+    """Stitch codes for grid-sized luma; threshold shifts the automatic level
+    (higher gives more filled cells)."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+    rows, cols = luma.shape
+    if method == "adaptive":
+        return adaptive_cells(luma, max(2, round(min(rows, cols) / 8)), 4 - threshold / 4)
+    if method == "dither":
+        return dither_cells(stretch_luma(luma), 128 + threshold)
+    return np.where(luma < otsu_threshold(luma) + threshold, FILL, EMPTY).astype(np.uint8)
+
+
+# --- PATTERN ---
+class Pattern:
+    """A rows×cols chart of stitch codes. Transforms return new patterns."""
+
+    def __init__(self, cells):
+        cells = np.asarray(cells)
+        if cells.ndim != 2 or cells.size == 0:
+            raise ValueError(f"Pattern cells must be a non-empty 2D array, got shape {cells.shape}")
+        if cells.dtype != np.uint8:
+            if cells.min() < 0 or cells.max() > O:
+                raise ValueError("Pattern cells must be stitch codes 0..3")
+            cells = cells.astype(np.uint8)
+        elif cells.max() > O:
+            raise ValueError("Pattern cells must be stitch codes 0..3")
+        self.cells = cells
+
+    @classmethod
+    def empty(cls, rows, cols):
+        return cls(np.zeros((rows, cols), dtype=np.uint8))
+
+    @classmethod
+    def from_bytes(cls, data, rows, cols):
+        """From the editor's flat row-major cell bytes."""
+        return cls(np.frombuffer(data, dtype=np.uint8).reshape(rows, cols).copy())
+
+    @classmethod
+    def from_image(cls, image, cols, rows=None, method="otsu", threshold=0, contrast=0, invert=False):
+        """Convert a PIL image (or path) to a chart cols wide. Without rows the
+        row count follows the image's aspect ratio (square cells)."""
+        from PIL import Image, ImageOps
+
+        if not isinstance(image, Image.Image):
+            image = Image.open(image)
+        # Upright, as the browser decodes it (phone photos carry the turn in EXIF)
+        image = ImageOps.exif_transpose(image)
+        if rows is None:
+            # Halves round up, as Math.round in the editor
+            rows = max(1, int(cols * image.height / image.width + 0.5))
+        luma = resample_luma(image_luma(image), rows, cols)
+        return cls(convert_luma(adjust_luma(luma, contrast, invert), method, threshold))
+
+    @property
+    def rows(self):
+        return self.cells.shape[0]
+
+    @property
+    def cols(self):
+        return self.cells.shape[1]
+
+    @property
+    def shape(self):
+        return self.cells.shape
+
+    def to_bytes(self):
+        """Flat row-major cell bytes, the layout of the editor's gridData."""
+        return np.ascontiguousarray(self.cells).tobytes()
+
+    def mirror(self, axis="horizontal"):
+        """Flip left-right ("horizontal") or top-bottom ("vertical")."""
+        if axis == "horizontal":
+            return Pattern(self.cells[:, ::-1].copy())
+        if axis == "vertical":
+            return Pattern(self.cells[::-1, :].copy())
+        raise ValueError(f"Unknown axis {axis!r}, expected 'horizontal' or 'vertical'")
+
+    def rotate(self, quarter_turns=1):
+        """Rotate clockwise by quarter_turns × 90°."""
+        return Pattern(np.rot90(self.cells, -quarter_turns).copy())
+
+    def crop(self, top, left, rows, cols):
+        if top < 0 or left < 0 or rows < 1 or cols < 1 or top + rows > self.rows or left + cols > self.cols:
+            raise ValueError(f"Crop {rows}×{cols} at ({top}, {left}) is outside the {self.rows}×{self.cols} pattern")
+        return Pattern(self.cells[top:top + rows, left:left + cols].copy())
+
+    def tile(self, down=1, across=1):
+        """Repeat the pattern down×across times."""
+        if down < 1 or across < 1:
+            raise ValueError("Tile counts must be at least 1")
+        return Pattern(np.tile(self.cells, (down, across)))
+
+    def __eq__(self, other):
+        if not isinstance(other, Pattern):
+            return NotImplemented
+        return np.array_equal(self.cells, other.cells)
+
+    def __repr__(self):
+        return f"Pattern({self.rows}×{self.cols})"
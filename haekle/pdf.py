@@ -0,0 +1,202 @@
+"""Streaming vector PDF export with the editor's A4 page layout.
+
+Pages are laid out like exportPDF()'s vector mode (drawPageVector): 8 mm
+margins, the chart scaled to the page width, the column ruler repeated on
+every page and rows split across pages. The file is produced by a generator
+one object at a time, so memory does not grow with the number of pages.
+Content that repeats is written once as a form XObject: the column ruler,
+one X and one O glyph, and the grid lines of a page (one form per line
+weight phase, since every 5th and 10th line is heavier). Text uses the
+standard Helvetica-Bold font, so nothing needs embedding or downloading.
+"""
+
+import zlib
+
+from .grid import EMPTY, FILL, O, X
+from .render import LINE_STYLES, OFFSET, SIZE, line_weight
+
+EXPORT_MARGIN = 40          # Chart px around the chart, as in the editor
+PAGE_W_MM, PAGE_H_MM = 210, 297
+MARGIN_MM = 8
+PT_PER_MM = 72 / 25.4
+
+# Helvetica-Bold advance widths (1/1000 em) of the characters we draw
+_CHAR_WIDTHS = {**{d: 556 for d in "0123456789"}, "X": 667, "O": 778}
+
+
+def _num(v):
+    return f"{v:.3f}".rstrip("0").rstrip(".") or "0"
+
+
+def _text_width(text, size):
+    return sum(_CHAR_WIDTHS[ch] for ch in text) * size / 1000
+
+
+def _text(text, x, y, size, align="left"):
+    """Text op in a y-down space: the text matrix flips glyphs upright."""
+    if align == "center":
+        x -= _text_width(text, size) / 2
+    elif align == "right":
+        x -= _text_width(text, size)
+    return f"BT /F1 {_num(size)} Tf 1 0 0 -1 {_num(x)} {_num(y)} Tm ({text}) Tj ET\n"
+
+
+def page_layout(rows, cols, size=SIZE, offset=OFFSET):
+    """(mm per chart px, rows per page, page count) for an A4 export."""
+    usable_w = PAGE_W_MM - 2 * MARGIN_MM
+    usable_h = PAGE_H_MM - 2 * MARGIN_MM
+    chart_w = cols * size + offset + 2 * EXPORT_MARGIN
+    k = usable_w / chart_w
+    header = offset + EXPORT_MARGIN + 2
+    rows_per_page = max(1, int((usable_h / k - header) // size))
+    return k, rows_per_page, -(-rows // rows_per_page)
+
+
+class _Writer:
+    """Numbers objects and records their offsets while chunks are yielded."""
+
+    def __init__(self):
+        self.offsets = {}
+        self.pos = 0
+        self.count = 0
+
+    def reserve(self):
+        self.count += 1
+        return self.count
+
+    def chunk(self, data):
+        self.pos += len(data)
+        return data
+
+    def obj(self, num, body):
+        self.offsets[num] = self.pos
+        return self.chunk(f"{num} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    def stream(self, num, content, extra=""):
+        data = zlib.compress(content.encode("latin-1"))
+        head = f"<< /Length {len(data)} /Filter /FlateDecode {extra}>>\nstream\n".encode()
+        return self.obj(num, head + data + b"\nendstream")
+
+
+def _grid_lines(cols, s, ox, top, r0, r1):
+    """Grid lines for rows r0..r1-1, one stroke per weight, in chart px."""
+    out = []
+    for key, gray, width in LINE_STYLES:
+        out.append(f"{_num(gray / 255)} G {_num(width)} w\n")
+        y0, y1 = top, top + (r1 - r0) * s
+        for i in range(cols + 1):
+            if line_weight(i) == key:
+                x = ox + i * s
+                out.append(f"{_num(x)} {_num(y0)} m {_num(x)} {_num(y1)} l\n")
+        for j in range(r0, r1 + 1):
+            if line_weight(j) == key:
+                y = top + (j - r0) * s
+                out.append(f"{_num(ox)} {_num(y)} m {_num(ox + cols * s)} {_num(y)} l\n")
+        out.append("S\n")
+    return "".join(out)
+
+
+def iter_pdf(pattern, size=SIZE, offset=OFFSET, title="Hækle mønster"):
+    """Yield the PDF for pattern as byte chunks."""
+    cells = pattern.cells
+    rows, cols = cells.shape
+    s = size
+    ox = top = offset + EXPORT_MARGIN
+    k, rows_per_page, total = page_layout(rows, cols, s, offset)
+    k_pt = k * PT_PER_MM
+    w = _Writer()
+
+    catalog, pages, font, info = w.reserve(), w.reserve(), w.reserve(), w.reserve()
+    ruler, glyph_x, glyph_o = w.reserve(), w.reserve(), w.reserve()
+    yield w.chunk(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    yield w.obj(catalog, f"<< /Type /Catalog /Pages {pages} 0 R >>".encode())
+    yield w.obj(font, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+    yield w.obj(info, b"<< /Title (" + title.encode("latin-1", "replace") + b") /Producer (haekle) >>")
+
+    form_res = f"/Resources << /Font << /F1 {font} 0 R >> >>"
+    labels = "".join(_text(str(i + 1), ox + i * s + s / 2, top - 12, 12, "center")
+                     for i in range(cols) if i == 0 or (i + 1) % 5 == 0)
+    chart_w = cols * s + offset + 2 * EXPORT_MARGIN
+    yield w.stream(ruler, "0 g\n" + labels, f"/Type /XObject /Subtype /Form /BBox [0 0 {chart_w} {top}] {form_res} ")
+    for num, code in ((glyph_x, X), (glyph_o, O)):
+        name = "X" if code == X else "O"
+        yield w.stream(num, "0 g\n" + _text(name, s / 2, s / 1.3, s * 0.7, "center"),
+                       f"/Type /XObject /Subtype /Form /BBox [0 0 {s} {s}] {form_res} ")
+
+    grid_forms = {}   # (first row % 10, row count) -> object number
+    kids = []
+    for page in range(total):
+        r0 = page * rows_per_page
+        r1 = min(rows, r0 + rows_per_page)
+        grid_key = (r0 % 10, r1 - r0)
+        if grid_key not in grid_forms:
+            grid_forms[grid_key] = w.reserve()
+            bbox = f"[0 0 {chart_w} {top + (r1 - r0) * s + 2}]"
+            yield w.stream(grid_forms[grid_key], _grid_lines(cols, s, ox, top, r0, r1),
+                           f"/Type /XObject /Subtype /Form /BBox {bbox} ")
+        grid = grid_forms[grid_key]
+
+        # Chart px with y down, origin at the top-left page margin
+        x0_pt = MARGIN_MM * PT_PER_MM
+        y0_pt = (PAGE_H_MM - MARGIN_MM) * PT_PER_MM
+        out = [f"q {_num(k_pt)} 0 0 {_num(-k_pt)} {_num(x0_pt)} {_num(y0_pt)} cm\n",
+               f"/G{grid} Do /Ruler Do\n", "0 g\n"]
+        for j in range(r0, r1):
+            if j == 0 or (j + 1) % 5 == 0:
+                out.append(_text(str(j + 1), ox - 10, top + (j - r0) * s + s / 1.5, 12, "right"))
+
+        # Runs of filled cells in a row become one rectangle; all rectangles
+        # of the page are filled at once
+        rects, glyphs = [], []
+        for r in range(r0, r1):
+            row = cells[r]
+            y = top + (r - r0) * s
+            c = 0
+            while c < cols:
+                code = row[c]
+                if code == FILL:
+                    end = c + 1
+                    while end < cols and row[end] == FILL:
+                        end += 1
+                    rects.append(f"{_num(ox + c * s + 1)} {_num(y + 1)} {(end - c) * s - 1} {s - 1} re\n")
+                    c = end
+                    continue
+                if code != EMPTY:
+                    name = "GX" if code == X else "GO"
+                    glyphs.append(f"q 1 0 0 1 {_num(ox + c * s)} {_num(y)} cm /{name} Do Q\n")
+                c += 1
+        if rects:
+            out.extend(rects)
+            out.append("f\n")
+        out.extend(glyphs)
+        out.append("Q\n")
+
+        content, page_obj = w.reserve(), w.reserve()
+        yield w.stream(content, "".join(out))
+        resources = (f"<< /Font << /F1 {font} 0 R >> /XObject << /Ruler {ruler} 0 R /GX {glyph_x} 0 R "
+                     f"/GO {glyph_o} 0 R /G{grid} {grid} 0 R >> >>")
+        box = f"[0 0 {_num(PAGE_W_MM * PT_PER_MM)} {_num(PAGE_H_MM * PT_PER_MM)}]"
+        yield w.obj(page_obj, (f"<< /Type /Page /Parent {pages} 0 R /MediaBox {box} "
+                               f"/Resources {resources} /Contents {content} 0 R >>").encode())
+        kids.append(page_obj)
+
+    yield w.obj(pages, f"<< /Type /Pages /Count {len(kids)} /Kids [{' '.join(f'{n} 0 R' for n in kids)}] >>".encode())
+    xref = w.pos
+    entries = "".join(f"{w.offsets[n]:010d} 00000 n \n" for n in range(1, w.count + 1))
+    yield w.chunk(f"xref\n0 {w.count + 1}\n0000000000 65535 f \n{entries}".encode())
+    yield w.chunk(f"trailer\n<< /Size {w.count + 1} /Root {catalog} 0 R /Info {info} 0 R >>\n"
+                  f"startxref\n{xref}\n%%EOF\n".encode())
+
+
+def write_pdf(pattern, fp, **kwargs):
+    """Stream the PDF to a path or binary file object."""
+    if hasattr(fp, "write"):
+        for chunk in iter_pdf(pattern, **kwargs):
+            fp.write(chunk)
+        return
+    with open(fp, "wb") as f:
+        write_pdf(pattern, f, **kwargs)
+
+
+def pdf_bytes(pattern, **kwargs):
+    return b"".join(iter_pdf(pattern, **kwargs))
@@ -0,0 +1,298 @@
+"""WebSocket relay for editing one chart together.
+
+    python -m haekle.relay --host 0.0.0.0 --port 8765
+
+Run it next to the Streamlit app and set HAEKLE_RELAY_URL to its address as
+browsers see it (ws://host:8765); editors on the same chart then join the
+room /<chart id>. The WebSocket protocol (RFC 6455) is implemented on
+asyncio streams, so the relay needs nothing outside the standard library.
+
+Clients send binary batches: a type byte (OPS) followed by ops of
+(row u16, col u16, clock u32, client u16, code u8), little-endian. clock is
+a Lamport clock and client the id from the relay's welcome message
+({"type": "welcome", "client", "clock"} as text). Each cell takes the op with
+the highest (clock, client), so every client ends with the same cells
+whatever order the ops arrive in. The relay forwards each batch to the rest
+of the room, stamped with the sender's id, and keeps the newest op per cell
+for clients that join later. Rooms are dropped when the last client leaves;
+the chart itself is kept by the app's chart store, and each cell is synced
+there only by the editor that wrote it last.
+
+RelayClient is a headless client for scripts and tests.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import os
+import struct
+import sys
+from urllib.parse import urlsplit
+
+OPS = 1
+OP = struct.Struct("<HHIHB")
+MAX_MESSAGE_BYTES = 4 << 20          # A batch of about 380k ops
+MAX_BUFFERED_BYTES = 8 << 20         # Clients this far behind are dropped
+STATE_BATCH_OPS = 65536              # Room state is sent to newcomers in batches this big
+_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+TEXT, BINARY, CLOSE, PING, PONG = 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+def pack_ops(ops):
+    """Batch bytes for (row, col, clock, client, code) tuples."""
+    return bytes([OPS]) + b"".join(OP.pack(*op) for op in ops)
+
+
+def unpack_ops(data):
+    """(row, col, clock, client, code) tuples of a batch; [] for other messages."""
+    if not data or data[0] != OPS or (len(data) - 1) % OP.size:
+        return []
+    return list(OP.iter_unpack(memoryview(data)[1:]))
+
+
+# --- WEBSOCKET FRAMES ---
+class ConnectionClosed(Exception):
+    pass
+
+
+def _frame(opcode, payload, mask=False):
+    head = bytearray([0x80 | opcode])
+    n = len(payload)
+    bit = 0x80 if mask else 0
+    if n < 126:
+        head.append(bit | n)
+    elif n < 1 << 16:
+        head.append(bit | 126)
+        head += struct.pack(">H", n)
+    else:
+        head.append(bit | 127)
+        head += struct.pack(">Q", n)
+    if not mask:
+        return bytes(head) + payload
+    key = os.urandom(4)
+    return bytes(head) + key + _mask(payload, key)
+
+
+def _mask(payload, key):
+    # XOR with the repeated key, as one big integer operation
+    n = len(payload)
+    keys = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, "little") ^ int.from_bytes(keys, "little")).to_bytes(n, "little")
+
+
+async def _read_message(reader, writer):
+    """The next text or binary message as (opcode, payload). Answers pings;
+    raises ConnectionClosed on close frames and EOF."""
+    opcode, parts, size = None, [], 0
+    while True:
+        try:
+            b0, b1 = await reader.readexactly(2)
+            n = b1 & 0x7F
+            if n == 126:
+                (n,) = struct.unpack(">H", await reader.readexactly(2))
+            elif n == 127:
+                (n,) = struct.unpack(">Q", await reader.readexactly(8))
+            key = await reader.readexactly(4) if b1 & 0x80 else None
+            if size + n > MAX_MESSAGE_BYTES:
+                raise ConnectionClosed("message too big")
+            payload = await reader.readexactly(n)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            raise ConnectionClosed(str(e)) from None
+        if key:
+            payload = _mask(payload, key)
+        op = b0 & 0x0F
+        if op == CLOSE:
+            raise ConnectionClosed("closed by peer")
+        if op == PING:
+            writer.write(_frame(PONG, payload, mask=key is None))
+            continue
+        if op == PONG:
+            continue
+        if op in (TEXT, BINARY):
+            opcode = op
+        parts.append(payload)
+        size += n
+        if b0 & 0x80:
+            return opcode, b"".join(parts)
+
+
+# --- RELAY ---
+class _Room:
+    def __init__(self):
+        self.clients = {}      # client id -> StreamWriter
+        self.cells = {}        # (row, col) -> (clock, client, code)
+        self.clock = 0
+
+
+class Relay:
+    def __init__(self):
+        self.rooms = {}
+        self._ids = itertools.count(1)
+
+    async def handle(self, reader, writer):
+        try:
+            path = await _accept(reader, writer)
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        room = self.rooms.setdefault(path, _Room())
+        # Ids stay below 2**16 (the op field); reuse is fine once a client has left
+        client = next(self._ids) % 0xFFFF + 1
+        while client in room.clients:
+            client = next(self._ids) % 0xFFFF + 1
+        room.clients[client] = writer
+        try:
+            welcome = {"type": "welcome", "client": client, "clock": room.clock}
+            writer.write(_frame(TEXT, json.dumps(welcome).encode()))
+            state = [(r, c, clock, cl, code) for (r, c), (clock, cl, code) in room.cells.items()]
+            for start in range(0, len(state), STATE_BATCH_OPS):
+                writer.write(_frame(BINARY, pack_ops(state[start:start + STATE_BATCH_OPS])))
+            while True:
+                opcode, data = await _read_message(reader, writer)
+                if opcode != BINARY:
+                    continue
+                ops = [(r, c, clock, client, code) for r, c, clock, _, code in unpack_ops(data)]
+                if ops:
+                    self._merge(room, ops)
+                    self._broadcast(room, client, _frame(BINARY, pack_ops(ops)))
+        except ConnectionClosed:
+            pass
+        finally:
+            room.clients.pop(client, None)
+            if not room.clients:
+                self.rooms.pop(path, None)
+            writer.close()
+
+    @staticmethod
+    def _merge(room, ops):
+        cells = room.cells
+        for r, c, clock, client, code in ops:
+            room.clock = max(room.clock, clock)
+            old = cells.get((r, c))
+            if old is None or (clock, client) > old[:2]:
+                cells[(r, c)] = (clock, client, code)
+
+    @staticmethod
+    def _broadcast(room, sender, frame):
+        for client, writer in list(room.clients.items()):
+            if client == sender:
+                continue
+            if writer.transport.get_write_buffer_size() > MAX_BUFFERED_BYTES:
+                writer.close()
+                continue
+            writer.write(frame)
+
+
+async def _accept(reader, writer):
+    """Read the HTTP upgrade request and answer it; returns the request path."""
+    request = await reader.readuntil(b"\r\n\r\n")
+    lines = request.decode("latin-1").split("\r\n")
+    method, path, _ = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            k, v = line.split(":", 1)
+            headers[k.strip().lower()] = v.strip()
+    key = headers.get("sec-websocket-key")
+    if method != "GET" or headers.get("upgrade", "").lower() != "websocket" or not key:
+        writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+        raise ValueError("not a WebSocket request")
+    accept = base64.b64encode(hashlib.sha1(key.encode() + _GUID).digest()).decode()
+    writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                  f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+    return urlsplit(path).path
+
+
+async def serve_relay(host="127.0.0.1", port=8765):
+    """Start a relay; returns the asyncio server (port 0 picks a free port)."""
+    relay = Relay()
+    server = await asyncio.start_server(relay.handle, host, port)
+    server.relay = relay
+    return server
+
+
+# --- HEADLESS CLIENT ---
+class RelayClient:
+    """A client that keeps the room's cells as a dict of (row, col) ->
+    (clock, client, code), merged like the editor merges them."""
+
+    def __init__(self, reader, writer, client, clock):
+        self._reader, self._writer = reader, writer
+        self.client = client
+        self.clock = clock
+        self.cells = {}
+
+    @classmethod
+    async def connect(cls, url):
+        parts = urlsplit(url)
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((f"GET {parts.path or '/'} HTTP/1.1\r\nHost: {parts.netloc}\r\nUpgrade: websocket\r\n"
+                      f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        response = await reader.readuntil(b"\r\n\r\n")
+        if not response.startswith(b"HTTP/1.1 101"):
+            raise ConnectionError(f"Relay refused the connection: {response.splitlines()[0]!r}")
+        _, data = await _read_message(reader, writer)
+        welcome = json.loads(data)
+        return cls(reader, writer, welcome["client"], welcome["clock"])
+
+    def send(self, changes):
+        """Send (row, col, code) changes as one batch with one new clock."""
+        self.clock += 1
+        ops = [(r, c, self.clock, self.client, code) for r, c, code in changes]
+        self._merge(ops)
+        self._writer.write(_frame(BINARY, pack_ops(ops), mask=True))
+
+    async def receive(self, timeout=None):
+        """Wait for the next batch, merge it and return its ops."""
+        while True:
+            opcode, data = await asyncio.wait_for(_read_message(self._reader, self._writer), timeout)
+            if opcode == BINARY:
+                ops = unpack_ops(data)
+                self._merge(ops)
+                return ops
+
+    def _merge(self, ops):
+        for r, c, clock, client, code in ops:
+            self.clock = max(self.clock, clock)
+            old = self.cells.get((r, c))
+            if old is None or (clock, client) > old[:2]:
+                self.cells[(r, c)] = (clock, client, code)
+
+    def codes(self):
+        """(row, col) -> code of every cell touched in the room."""
+        return {k: v[2] for k, v in self.cells.items()}
+
+    async def close(self):
+        self._writer.write(_frame(CLOSE, b"", mask=True))
+        self._writer.close()
+        try:
+            await self._writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m haekle.relay", description="Relay for editing charts together.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    async def run():
+        server = await serve_relay(args.host, args.port)
+        print(f"Relay on ws://{args.host}:{args.port}/<chart id>", file=sys.stderr, flush=True)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
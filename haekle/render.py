@@ -0,0 +1,194 @@
+"""Chart PNG renderer with the editor's layout, for servers without a browser.
+
+Reproduces drawOnContext() as used by exportPNG(): SIZE/OFFSET geometry, grid
+lines stroked per weight (minor, every 5th, every 10th) with the canvas'
+area coverage antialiasing, ruler numbers at 1 and every 5th, filled cells
+inset by one pixel and X/O glyphs. Lines and cells are composed with array
+operations: every pixel row of the chart is one of a handful of row
+templates, filled cells are a slice assignment and glyphs are pasted from
+cached tiles. Only the ruler and glyph text go through a font rasterizer, so
+those pixels can differ slightly from a browser's.
+"""
+
+import functools
+
+import numpy as np
+
+from .grid import EMPTY, FILL, STITCH_NAMES
+
+SIZE, OFFSET = 25, 45  # Editor defaults (cell size and ruler band, px)
+GLYPH_BATCH = 16384    # Glyph cells written per fancy-index assignment
+
+# (weight, gray, line width) in stroke order, as LINE_STYLES in the editor
+LINE_STYLES = (("minor", 221, 0.8), ("mid", 136, 1.5), ("major", 0, 1.5))
+FONT_NAMES = ("arialbd.ttf", "Arial Bold.ttf", "LiberationSans-Bold.ttf", "DejaVuSans-Bold.ttf")
+
+
+def line_weight(i):
+    return "major" if i % 10 == 0 else ("mid" if i % 5 == 0 else "minor")
+
+
+@functools.lru_cache(maxsize=8)
+def _font(px):
+    from PIL import ImageFont
+
+    for name in FONT_NAMES:
+        try:
+            return ImageFont.truetype(name, px)
+        except OSError:
+            continue
+    return ImageFont.load_default(px)
+
+
+def _line_coverage(n, positions, width):
+    """Pixel coverage (0..1, length n) of lines of the given width centred on
+    integer positions."""
+    cov = np.zeros(n, dtype=np.float64)
+    half = width / 2
+    for d in range(-int(np.ceil(half)), int(np.ceil(half))):
+        px = positions + d
+        overlap = np.minimum(px + 1, positions + half) - np.maximum(px, positions - half)
+        ok = (px >= 0) & (px < n) & (overlap > 0)
+        cov[px[ok]] = 1 - (1 - cov[px[ok]]) * (1 - overlap[ok])
+    return cov
+
+
+def _blend(dst, gray, alpha8):
+    """Source-over of a gray at 8-bit alpha, rounded like an 8-bit canvas."""
+    return (gray * alpha8 + dst.astype(np.int32) * (255 - alpha8) + 127) // 255
+
+
+def _row_templates(rows, cols, s, o, width, height):
+    """Grid lines on white as (templates, row_class): pixel row y of the chart
+    is templates[row_class[y]]."""
+    x = np.arange(width)
+    y = np.arange(height)
+    in_x = (x >= o) & (x < o + cols * s)      # Under a horizontal line's length
+    in_y = (y >= o) & (y < o + rows * s)      # Under a vertical line's length
+    cov_x, cov_y = {}, {}
+    for key, _, w in LINE_STYLES:
+        xs = [o + i * s for i in range(cols + 1) if line_weight(i) == key]
+        ys = [o + j * s for j in range(rows + 1) if line_weight(j) == key]
+        cov_x[key] = _line_coverage(width, np.array(xs, dtype=np.int64), w)
+        cov_y[key] = _line_coverage(height, np.array(ys, dtype=np.int64), w)
+
+    # A pixel row depends only on whether vertical lines reach it and how much
+    # of it each weight's horizontal lines cover
+    keys = np.stack([in_y] + [cov_y[k] for k, _, _ in LINE_STYLES], axis=1)
+    classes, row_class = np.unique(keys, axis=0, return_inverse=True)
+    templates = np.empty((len(classes), width), dtype=np.uint8)
+    for t, (vertical, *h_cov) in enumerate(classes):
+        row = np.full(width, 255, dtype=np.int32)
+        for (key, gray, _), ch in zip(LINE_STYLES, h_cov):
+            a_v = cov_x[key] * vertical
+            a_h = ch * in_x
+            a = 1 - (1 - a_v) * (1 - a_h)    # One stroke: overlapping lines are not blended twice
+            row = _blend(row, gray, np.rint(a * 255).astype(np.int32))
+        templates[t] = row
+    return templates, row_class.ravel()
+
+
+@functools.lru_cache(maxsize=16)
+def _glyph_tile(code, s):
+    """s×s coverage mask of an X/O glyph, placed as in the editor's atlas."""
+    from PIL import Image, ImageDraw
+
+    tile = Image.new("L", (s, s), 0)
+    ImageDraw.Draw(tile).text((s / 2, s / 1.3), STITCH_NAMES[code], fill=255, font=_font(round(s * 0.7)), anchor="ms")
+    return np.asarray(tile, dtype=np.int32)
+
+
+def _ruler_bands(rows, cols, s, o, width, height):
+    """Top band (column numbers) and left band (row numbers) as arrays."""
+    from PIL import Image, ImageDraw
+
+    font = _font(12)
+    top = Image.new("L", (width, max(1, o - 1)), 255)
+    draw = ImageDraw.Draw(top)
+    for i in range(cols):
+        if i == 0 or (i + 1) % 5 == 0:
+            draw.text((o + i * s + s / 2, o - 12), str(i + 1), fill=0, font=font, anchor="ms")
+    left = Image.new("L", (max(1, o - 1), height), 255)
+    draw = ImageDraw.Draw(left)
+    for j in range(rows):
+        if j == 0 or (j + 1) % 5 == 0:
+            draw.text((o - 10, o + j * s + s / 1.5), str(j + 1), fill=0, font=font, anchor="rs")
+    return np.asarray(top), np.asarray(left)
+
+
+def render_array(pattern, size=SIZE, offset=OFFSET):
+    """The chart as a (height, width) uint8 gray array, height = rows*size +
+    offset and width = cols*size + offset, like exportPNG()."""
+    cells = pattern.cells
+    rows, cols = cells.shape
+    s, o = size, offset
+    width, height = cols * s + o, rows * s + o
+    templates, row_class = _row_templates(rows, cols, s, o, width, height)
+
+    # Filled cells cover y and x 1..s-1 of their cell, so inside a cell row
+    # every pixel row but the first is a template with the fill spans zeroed.
+    # One more template per (cell row, row class) pair turns the whole chart
+    # into a single row gather.
+    fill_x = np.zeros((rows, width), dtype=bool)
+    spans = np.zeros((rows, cols, s), dtype=bool)
+    spans[:, :, 1:] = (cells == FILL)[:, :, None]
+    fill_x[:, o:o + cols * s] = spans.reshape(rows, cols * s)
+    ys = np.arange(o, height)
+    cell_row = (ys - o) // s
+    filled = (ys - o) % s != 0
+    pairs, pair_idx = np.unique(np.stack([cell_row[filled], row_class[ys[filled]]], axis=1), axis=0, return_inverse=True)
+    table = np.concatenate([templates, templates[pairs[:, 1]]])
+    table[len(templates):][fill_x[pairs[:, 0]]] = 0
+    index = row_class.copy()
+    index[ys[filled]] = len(templates) + pair_idx.ravel()
+    img = table[index]
+
+    if o > 1:
+        top, left = _ruler_bands(rows, cols, s, o, width, height)
+        img[:o - 1, :] = top
+        img[:, :o - 1] = np.minimum(img[:, :o - 1], left)
+
+    # Glyph cells: the lines under a cell depend only on the weights of its
+    # four border lines, so each (code, border weights) tile is blended once
+    # and then assigned to all glyph cells at once in the grid viewed as
+    # (row, y in cell, col, x in cell). Kinds are counted with bincount
+    # (there are only 2*81 of them) instead of sorting every glyph cell.
+    grid = img[o:o + rows * s, o:o + cols * s].view()
+    grid.shape = (rows, s, cols, s)
+    weight = {key: n for n, (key, _, _) in enumerate(LINE_STYLES)}
+    w_row = np.array([weight[line_weight(j)] for j in range(rows + 1)])
+    w_col = np.array([weight[line_weight(i)] for i in range(cols + 1)])
+    glyph_codes = [int(code) for code in np.unique(cells) if code not in (EMPTY, FILL)]
+    if glyph_codes:
+        code_slot = np.zeros(256, dtype=np.intp)
+        code_slot[glyph_codes] = np.arange(len(glyph_codes))
+        rr, cc = np.nonzero((cells != EMPTY) & (cells != FILL))
+        borders = ((w_row[rr] * 3 + w_row[rr + 1]) * 3 + w_col[cc]) * 3 + w_col[cc + 1]
+        kind = code_slot[cells[rr, cc]] * 81 + borders
+        kinds = np.flatnonzero(np.bincount(kind, minlength=len(glyph_codes) * 81))
+        first = np.empty(len(glyph_codes) * 81, dtype=np.intp)
+        first[kind[::-1]] = np.arange(len(kind) - 1, -1, -1)   # First cell of each kind
+        tile_of = np.empty_like(first)
+        tile_of[kinds] = np.arange(len(kinds))
+        tiles = np.stack([
+            _blend(grid[rr[k], :, cc[k], :], 0, _glyph_tile(glyph_codes[kd // 81], s))
+            for kd, k in zip(kinds, first[kinds])
+        ]).astype(np.uint8)
+        tile_idx = tile_of[kind]
+        # In batches: tiles[tile_idx] for every glyph cell at once would be
+        # a temporary as big as the glyph cells' pixels
+        for a in range(0, len(rr), GLYPH_BATCH):
+            b = a + GLYPH_BATCH
+            grid[rr[a:b], :, cc[a:b], :] = tiles[tile_idx[a:b]]
+    return img
+
+
+def render_chart(pattern, size=SIZE, offset=OFFSET):
+    """The chart as a PIL image (mode "L")."""
+    from PIL import Image
+
+    return Image.fromarray(render_array(pattern, size, offset), mode="L")
+
+
+def save_png(pattern, fp, size=SIZE, offset=OFFSET):
+    render_chart(pattern, size, offset).save(fp, format="PNG")
@@ -0,0 +1,174 @@
+"""Server-side chart store and the editor's sync protocol.
+
+Charts live in SQLite, one row per chart id: size, zlib-compressed cells and
+a version that grows by one with every change. The editor syncs through the
+component value (editor -> server) and the sync argument (server -> editor):
+
+    editor:  {"seq", "base", "kind": "snapshot", "rows", "cols", "cells"}
+             {"seq", "base", "kind": "delta", "idx", "codes"}
+             {"seq", "base", "kind": "ack"}
+    server:  {"chart", "version", "ack": seq}
+             {"chart", "version", "ack": seq, "snapshot": {"rows", "cols", "cells"}}
+
+cells is base64 packRuns (codecs.pack_runs), idx base64 little-endian u32
+cell indexes and codes base64 stitch codes, one byte per index. base is the
+version the editor's chart is built on. A delta only applies when base is
+the current version; otherwise the reply carries the stored chart, and the
+editor puts its own unsent cells on top of it and sends them again, so the
+last writer wins per cell. The editor sends a full snapshot only when the
+store has no chart yet, after a resize, or when the delta would be bigger.
+A message that does not follow this format (missing or mistyped fields, bad
+base64, a size beyond grid.MAX_SIDE/MAX_CELLS, codes that are not stitches)
+gets the same reply as a conflict.
+"""
+
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from .codecs import decode_cells, encode_cells, pack_runs, unpack_runs
+from .grid import MAX_CELLS, MAX_SIDE, O
+from .pattern import Pattern
+
+
+class VersionConflict(Exception):
+    """A change was based on an older version of the chart."""
+
+    def __init__(self, chart_id, base, version):
+        super().__init__(f"Chart {chart_id} is at version {version}, change was based on {base}")
+        self.base = base
+        self.version = version
+
+
+def _int_field(message, name):
+    value = message.get(name)
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f"{name} must be an integer")
+    return value
+
+
+def _bytes_field(message, name):
+    value = message.get(name)
+    if not isinstance(value, str):
+        raise ValueError(f"{name} must be a base64 string")
+    return decode_cells(value)   # binascii.Error is a ValueError
+
+
+def _parse_message(message):
+    """(kind, base, payload) of an editor message; ValueError when malformed.
+    payload is (rows, cols, cells) for a snapshot and (idx, codes) for a delta."""
+    if not isinstance(message, dict):
+        raise ValueError("Sync message must be an object")
+    kind = message.get("kind")
+    base = _int_field(message, "base")
+    if kind == "snapshot":
+        rows, cols = _int_field(message, "rows"), _int_field(message, "cols")
+        if not (1 <= rows <= MAX_SIDE and 1 <= cols <= MAX_SIDE and rows * cols <= MAX_CELLS):
+            raise ValueError(f"Chart size {rows}x{cols} is out of range")
+        try:
+            cells = unpack_runs(_bytes_field(message, "cells"), rows * cols)
+        except IndexError:
+            raise ValueError("Packed cells end in the middle of a run") from None
+        return kind, base, (rows, cols, cells)
+    if kind == "delta":
+        idx = np.frombuffer(_bytes_field(message, "idx"), dtype="<u4")   # ValueError unless whole u32s
+        codes = np.frombuffer(_bytes_field(message, "codes"), dtype=np.uint8)
+        if codes.size and codes.max() > O:
+            raise ValueError("Delta codes must be stitch codes")
+        return kind, base, (idx, codes)
+    if kind == "ack":
+        return kind, base, None
+    raise ValueError(f"Unknown sync message kind {kind!r}")
+
+
+class ChartStore:
+    """Charts in one SQLite file, safe to share between sessions (threads)."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._lock = threading.RLock()   # One connection, shared by all threads
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS charts ("
+            " id TEXT PRIMARY KEY, rows INTEGER NOT NULL, cols INTEGER NOT NULL,"
+            " cells BLOB NOT NULL, version INTEGER NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def close(self):
+        self._db.close()
+
+    def version(self, chart_id):
+        """The chart's current version, 0 when it is not stored."""
+        with self._lock:
+            row = self._db.execute("SELECT version FROM charts WHERE id = ?", (chart_id,)).fetchone()
+        return row[0] if row else 0
+
+    def load(self, chart_id):
+        """(version, Pattern), or (0, None) when the chart is not stored."""
+        with self._lock:
+            row = self._db.execute("SELECT version, rows, cols, cells FROM charts WHERE id = ?", (chart_id,)).fetchone()
+        if row is None:
+            return 0, None
+        version, rows, cols, cells = row
+        return version, Pattern.from_bytes(zlib.decompress(cells), rows, cols)
+
+    def _write(self, chart_id, base, version, pattern):
+        if base != version:
+            raise VersionConflict(chart_id, base, version)
+        self._db.execute(
+            "INSERT OR REPLACE INTO charts (id, rows, cols, cells, version, updated) VALUES (?, ?, ?, ?, ?, ?)",
+            (chart_id, pattern.rows, pattern.cols, zlib.compress(pattern.to_bytes(), 1), version + 1, time.time()),
+        )
+        return version + 1
+
+    def save(self, chart_id, pattern, base):
+        """Store a whole chart on top of version base; returns the new version."""
+        with self._lock:
+            return self._write(chart_id, base, self.version(chart_id), pattern)
+
+    def apply_delta(self, chart_id, base, idx, codes):
+        """Set cells idx (flat indexes) to codes on top of version base;
+        returns the new version."""
+        with self._lock:
+            version, pattern = self.load(chart_id)
+            if pattern is None or base != version:
+                raise VersionConflict(chart_id, base, version)
+            idx = np.asarray(idx, dtype=np.int64)
+            codes = np.asarray(codes, dtype=np.uint8)
+            if idx.shape != codes.shape or (idx.size and (idx.min() < 0 or idx.max() >= pattern.cells.size)):
+                raise ValueError("Delta does not match the chart")
+            cells = pattern.cells.copy()
+            cells.reshape(-1)[idx] = codes
+            return self._write(chart_id, base, version, Pattern(cells))
+
+    def snapshot(self, chart_id):
+        """The stored chart as the editor's snapshot payload, with its version."""
+        version, pattern = self.load(chart_id)
+        if pattern is None:
+            return version, None
+        return version, {"rows": pattern.rows, "cols": pattern.cols, "cells": encode_cells(pack_runs(pattern.to_bytes()))}
+
+    def sync(self, chart_id, message):
+        """Apply one editor message and return the reply for its sync argument."""
+        seq = message.get("seq") if isinstance(message, dict) else None
+        try:
+            kind, base, payload = _parse_message(message)
+            if kind == "snapshot":
+                rows, cols, cells = payload
+                version = self.save(chart_id, Pattern.from_bytes(cells, rows, cols), base)
+            elif kind == "delta":
+                version = self.apply_delta(chart_id, base, *payload)
+            else:
+                version = self.version(chart_id)
+                if base != version:
+                    raise VersionConflict(chart_id, base, version)
+        except (VersionConflict, ValueError):
+            # Also for a malformed message or a delta that does not fit the
+            # stored chart: the editor starts again from the stored chart
+            version, snapshot = self.snapshot(chart_id)
+            return {"chart": chart_id, "version": version, "ack": seq, "snapshot": snapshot}
+        return {"chart": chart_id, "version": version, "ack": seq}
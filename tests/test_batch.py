@@ -0,0 +1,73 @@
+"""haekle.batch: photos in, chart files out, unchanged photos skipped."""
+
+import json
+
+import numpy as np
+from PIL import Image
+
+from haekle import codecs, read_hgrid
+from haekle.batch import FORMATS, MANIFEST_NAME, find_images, output_names, run
+from haekle.render import OFFSET, SIZE
+
+SETTINGS = {"cols": 20, "rows": None, "method": "otsu", "threshold": 0, "contrast": 0,
+            "invert": False, "formats": sorted(FORMATS)}
+
+
+def save_photo(path, width, height, orientation=None):
+    pixels = np.full((height, width, 3), 230, dtype=np.uint8)
+    pixels[: height // 2] = 20
+    img = Image.fromarray(pixels)
+    exif = img.getexif()
+    if orientation is not None:
+        exif[0x0112] = orientation
+    img.save(path, exif=exif)
+
+
+def test_exif_rotated_photo_gives_upright_chart(tmp_path):
+    src = tmp_path / "photos"
+    src.mkdir()
+    # Stored 40×30, shown 30×40 (Orientation 8: rotated 90° counter-clockwise)
+    save_photo(src / "portrait.jpg", 40, 30, orientation=8)
+    save_photo(src / "landscape.jpg", 40, 30)
+    out = tmp_path / "charts"
+    logs = []
+    assert run(find_images([src]), out, SETTINGS, jobs=1, log=logs.append) == (2, 0, 0)
+
+    shapes = {}
+    for name in ("portrait", "landscape"):
+        chart = json.loads((out / f"{name}.json").read_text())
+        cells = np.frombuffer(codecs.decode_cells(chart["cells"]), dtype=np.uint8)
+        assert cells.size == chart["rows"] * chart["cols"]
+        hgrid = read_hgrid(out / f"{name}.hgrid")
+        assert hgrid.cells.tobytes() == cells.tobytes()
+        with Image.open(out / f"{name}.png") as png:
+            assert png.size == (chart["cols"] * SIZE + OFFSET, chart["rows"] * SIZE + OFFSET)
+        assert (out / f"{name}.pdf").read_bytes().startswith(b"%PDF-")
+        shapes[name] = (chart["rows"], chart["cols"])
+    assert shapes == {"portrait": (27, 20), "landscape": (15, 20)}
+    # Orientation 8 puts the stored dark top on the left
+    portrait = read_hgrid(out / "portrait.hgrid").cells
+    assert (portrait[:, :10] == 1).all() and (portrait[:, 10:] == 0).all()
+
+
+def test_unchanged_photos_are_skipped(tmp_path):
+    photo = tmp_path / "a.png"
+    save_photo(photo, 12, 8)
+    out = tmp_path / "charts"
+    assert run([photo], out, SETTINGS, jobs=1, log=lambda msg: None) == (1, 0, 0)
+    assert run([photo], out, SETTINGS, jobs=1, log=lambda msg: None) == (0, 1, 0)
+    assert run([photo], out, {**SETTINGS, "cols": 6}, jobs=1, log=lambda msg: None) == (1, 0, 0)
+    assert list(json.loads((out / MANIFEST_NAME).read_text())) == ["a"]
+
+
+def test_broken_photo_fails_alone(tmp_path):
+    (tmp_path / "broken.jpg").write_bytes(b"not a jpeg")
+    save_photo(tmp_path / "ok.png", 12, 8)
+    logs = []
+    assert run(find_images([tmp_path]), tmp_path / "charts", SETTINGS, jobs=1, log=logs.append) == (1, 0, 1)
+    assert any("broken.jpg: FAILED" in line for line in logs)
+
+
+def test_output_names_number_repeated_stems(tmp_path):
+    paths = [tmp_path / "a" / "x.jpg", tmp_path / "b" / "x.png", tmp_path / "y.jpg"]
+    assert output_names(paths) == ["x", "x_2", "y"]
@@ -0,0 +1,61 @@
+"""Vendoring jsPDF (haekle.editor), against local tarballs instead of npm."""
+
+import base64
+import hashlib
+import io
+import json
+import tarfile
+
+import pytest
+
+from haekle.editor import JSPDF_VERSION, vendor_jspdf
+
+
+def tarball(tmp_path, version=JSPDF_VERSION):
+    """An npm-style jspdf package; returns (tarball url, metadata url, integrity)."""
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for name, data in (("package/package.json", json.dumps({"version": version}).encode()),
+                           ("package/dist/jspdf.umd.min.js", b"/* jspdf */"),
+                           ("package/LICENSE", b"MIT")):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    path = tmp_path / "jspdf.tgz"
+    path.write_bytes(buf.getvalue())
+    integrity = "sha512-" + base64.b64encode(hashlib.sha512(buf.getvalue()).digest()).decode()
+    meta = tmp_path / "jspdf.json"
+    meta.write_text(json.dumps({"version": version, "dist": {"integrity": integrity}}))
+    return path.as_uri(), meta.as_uri(), integrity
+
+
+def test_vendors_after_checking_published_integrity(tmp_path):
+    url, meta, _ = tarball(tmp_path)
+    target = tmp_path / "vendor" / "jspdf.umd.min.js"
+    assert vendor_jspdf(target, url, metadata_url=meta) == target
+    assert target.read_bytes() == b"/* jspdf */"
+    assert target.with_name("jspdf.LICENSE").read_bytes() == b"MIT"
+
+
+def test_pinned_integrity_is_used_without_metadata(tmp_path):
+    url, _, integrity = tarball(tmp_path)
+    target = tmp_path / "jspdf.umd.min.js"
+    vendor_jspdf(target, url, integrity=integrity, metadata_url=(tmp_path / "missing.json").as_uri())
+    assert target.exists()
+
+
+def test_mismatch_writes_nothing(tmp_path):
+    url, _, integrity = tarball(tmp_path)
+    target = tmp_path / "vendor" / "jspdf.umd.min.js"
+    wrong = "sha512-" + base64.b64encode(hashlib.sha512(b"other").digest()).decode()
+    with pytest.raises(ValueError, match="expected sha512-"):
+        vendor_jspdf(target, url, integrity=wrong)
+    with pytest.raises(ValueError, match="Only sha512"):
+        vendor_jspdf(target, url, integrity="sha1-" + integrity[7:])
+    assert not target.parent.exists()
+
+
+def test_wrong_version_is_rejected(tmp_path):
+    url, meta, _ = tarball(tmp_path, version="2.5.0")
+    with pytest.raises(ValueError, match="Expected jsPDF"):
+        vendor_jspdf(tmp_path / "jspdf.umd.min.js", url, metadata_url=meta)
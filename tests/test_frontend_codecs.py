@@ -0,0 +1,119 @@
+"""The editor's codecs (frontend/codecs.js) against haekle.codecs and
+haekle.hgrid: both sides must produce the same bytes and read each other's."""
+
+import base64
+import json
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+from haekle import Pattern, encode_hgrid, pack_runs, read_hgrid, unpack_runs
+from haekle.editor import FRONTEND_DIR
+
+from test_hgrid import hgrid_with_palette
+
+NODE = shutil.which("node")
+pytestmark = pytest.mark.skipif(NODE is None, reason="needs node")
+
+# Loads the DOM-free editor scripts into node's global scope and answers one
+# JSON request from stdin
+RUNNER = """
+const fs = require('fs'), vm = require('vm');
+for(const f of ['render-core.js', 'codecs.js']){
+  vm.runInThisContext(fs.readFileSync(process.argv[1] + '/' + f, 'utf8'), { filename: f });
+}
+const req = JSON.parse(fs.readFileSync(0, 'utf8'));
+const out = req.charts.map(ch => {
+  const cells = decodeCells(ch.cells);
+  return {
+    packed: encodeCells(packRuns(cells)),
+    unpacked: encodeCells(unpackRuns(decodeCells(ch.packed), cells.length)),
+    hgrid: encodeCells(encodeHgrid(ch.rows, ch.cols, cells)),
+    decoded: ch.hgrid.map(h => {
+      const d = decodeHgrid(decodeCells(h));
+      return { rows: d.rows, cols: d.cols, cells: encodeCells(d.cells) };
+    }),
+  };
+});
+const errors = req.bad.map(h => {
+  try { decodeHgrid(decodeCells(h)); return null; } catch(e){ return e.message; }
+});
+process.stdout.write(JSON.stringify({ charts: out, errors }));
+"""
+
+
+def _charts():
+    rng = np.random.default_rng(7)
+    blocky = np.zeros((300, 500), dtype=np.uint8)
+    blocky[::3, :250] = 1
+    stripes = np.repeat(rng.integers(0, 4, (130, 1)), 61, axis=1)
+    return [
+        np.array([[2]], dtype=np.uint8),
+        rng.integers(0, 4, (7, 13)).astype(np.uint8),
+        rng.integers(0, 4, (130, 61)).astype(np.uint8),
+        stripes.astype(np.uint8),
+        blocky,
+        np.full((1, 20000), 3, dtype=np.uint8),        # One run with a multi-byte varint
+    ]
+
+
+@pytest.fixture(scope="module")
+def results():
+    charts = _charts()
+    request = {"charts": [], "bad": [
+        base64.b64encode(hgrid_with_palette(names, np.array([[0, 1, code]]))).decode()
+        for names, code in ((["", "fill", "X"], 3), (["", "fill", "X", "O"], 200), (["O", "", "X", "fill"], 3))
+    ]}
+    for cells in charts:
+        pattern = Pattern(cells)
+        request["charts"].append({
+            "rows": pattern.rows,
+            "cols": pattern.cols,
+            "cells": base64.b64encode(cells.tobytes()).decode(),
+            "packed": base64.b64encode(pack_runs(cells.tobytes())).decode(),
+            "hgrid": [base64.b64encode(encode_hgrid(pattern, enc, chunk_rows)).decode()
+                      for enc, chunk_rows in (("raw", 64), ("packed", 64), ("rle", 64), ("rle", 0))],
+        })
+    proc = subprocess.run(
+        [NODE, "-e", RUNNER, str(FRONTEND_DIR)],
+        input=json.dumps(request), capture_output=True, text=True, check=True, timeout=120,
+    )
+    out = json.loads(proc.stdout)
+    return list(zip(charts, out["charts"])), out["errors"]
+
+
+def test_pack_runs_matches_editor(results):
+    for cells, out in results[0]:
+        flat = cells.tobytes()
+        assert base64.b64decode(out["packed"]) == pack_runs(flat)
+        assert base64.b64decode(out["unpacked"]) == flat
+        assert unpack_runs(base64.b64decode(out["packed"]), len(flat)) == flat
+
+
+def test_editor_hgrid_bytes_match_python(results):
+    for cells, out in results[0]:
+        assert base64.b64decode(out["hgrid"]) == encode_hgrid(Pattern(cells))
+
+
+def test_editor_reads_python_hgrid(results):
+    for cells, out in results[0]:
+        for decoded in out["decoded"]:
+            assert (decoded["rows"], decoded["cols"]) == cells.shape
+            assert base64.b64decode(decoded["cells"]) == cells.tobytes()
+
+
+def test_python_reads_editor_hgrid(results, tmp_path):
+    for k, (cells, out) in enumerate(results[0]):
+        path = tmp_path / f"{k}.hgrid"
+        path.write_bytes(base64.b64decode(out["hgrid"]))
+        assert np.array_equal(read_hgrid(path).cells, cells)
+
+
+def test_codes_outside_the_palette_fail_in_both(results):
+    # haekle.hgrid raises ValueError for the same files (test_hgrid.py)
+    bad_palette, bad_code, remapped = results[1]
+    assert "outside the palette" in bad_palette
+    assert "outside the palette" in bad_code
+    assert remapped is None
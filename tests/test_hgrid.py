@@ -0,0 +1,78 @@
+"""The .hgrid format in Python (haekle.hgrid)."""
+
+import numpy as np
+import pytest
+
+from haekle import HgridFile, Pattern, encode_hgrid, read_hgrid
+from haekle.grid import STITCH_KEYS
+from haekle.hgrid import _HEADER, MAGIC, RAW, VERSION
+
+
+def hgrid_with_palette(names, cells):
+    """A raw .hgrid file with its own palette, as another writer might make it."""
+    palette = b"".join(bytes([len(n.encode())]) + n.encode() for n in names)
+    rows, cols = cells.shape
+    header = _HEADER.pack(MAGIC, VERSION, RAW, len(names), 0, rows, cols, 0, _HEADER.size + len(palette))
+    return header + palette + cells.astype(np.uint8).tobytes()
+
+
+@pytest.fixture
+def cells():
+    rng = np.random.default_rng(11)
+    cells = rng.integers(0, 4, (150, 37)).astype(np.uint8)
+    cells[40:90] = 0        # Long runs, so rle is picked by "auto"
+    return cells
+
+
+@pytest.mark.parametrize("encoding", ["auto", "raw", "packed", "rle"])
+@pytest.mark.parametrize("chunk_rows", [0, 1, 64, 1000])
+def test_round_trip(tmp_path, cells, encoding, chunk_rows):
+    path = tmp_path / "chart.hgrid"
+    path.write_bytes(encode_hgrid(Pattern(cells), encoding, chunk_rows))
+    f = HgridFile(path)
+    assert f.shape == cells.shape
+    assert np.array_equal(read_hgrid(path).cells, cells)
+    for start, stop in ((0, 1), (63, 130), (149, 400), (-5, 3)):
+        assert np.array_equal(f.read_rows(start, stop), cells[max(0, start):stop])
+
+
+def test_one_chunk_has_no_index(cells):
+    data = encode_hgrid(Pattern(cells), "rle", 0)
+    assert _HEADER.unpack(data[:_HEADER.size])[7] == 0
+    assert len(data) == len(encode_hgrid(Pattern(cells), "rle", len(cells))) - 16
+
+
+@pytest.mark.parametrize("chunk_rows", [-1, 2.5, None])
+def test_bad_chunk_rows_are_rejected(cells, chunk_rows):
+    with pytest.raises(ValueError, match="chunk_rows"):
+        encode_hgrid(Pattern(cells), "rle", chunk_rows)
+
+
+def test_palette_uses_the_editor_names(cells):
+    data = encode_hgrid(Pattern(cells), "raw")
+    names, pos = [], _HEADER.size
+    for _ in range(data[6]):
+        names.append(data[pos + 1:pos + 1 + data[pos]].decode())
+        pos += 1 + data[pos]
+    assert names == [STITCH_KEYS[code] for code in range(len(STITCH_KEYS))]
+
+
+def test_palette_order_is_remapped(tmp_path):
+    path = tmp_path / "other.hgrid"
+    path.write_bytes(hgrid_with_palette(["O", "", "X", "fill"], np.array([[0, 1, 2, 3]])))
+    assert read_hgrid(path).cells.tolist() == [[3, 0, 2, 1]]
+
+
+@pytest.mark.parametrize("names, code", [(["", "fill", "X"], 3), (["", "fill", "X", "O"], 200)])
+def test_code_outside_the_palette_is_an_error(tmp_path, names, code):
+    path = tmp_path / "bad.hgrid"
+    path.write_bytes(hgrid_with_palette(names, np.array([[0, 1, code]])))
+    with pytest.raises(ValueError, match="outside the palette"):
+        read_hgrid(path)
+
+
+def test_unknown_stitch_name_is_an_error(tmp_path):
+    path = tmp_path / "bad.hgrid"
+    path.write_bytes(hgrid_with_palette(["", "fill", "V"], np.array([[0]])))
+    with pytest.raises(ValueError, match="unknown stitches"):
+        HgridFile(path)
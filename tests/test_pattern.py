@@ -0,0 +1,86 @@
+"""Photo conversion in haekle.pattern: EXIF orientation and the resampling
+shared with the editor's import (frontend/import-core.js)."""
+
+import io
+import json
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from haekle import Pattern
+from haekle.editor import FRONTEND_DIR
+from haekle.pattern import resample_luma
+
+NODE = shutil.which("node")
+
+RUNNER = """
+const fs = require('fs'), vm = require('vm');
+vm.runInThisContext(fs.readFileSync(process.argv[1] + '/import-core.js', 'utf8'), { filename: 'import-core.js' });
+const req = JSON.parse(fs.readFileSync(0, 'utf8'));
+const luma = Float32Array.from(req.luma);
+const levels = buildLumaPyramid(luma, req.w, req.h);
+process.stdout.write(JSON.stringify(req.sizes.map(([rows, cols]) => Array.from(sampleLuma(levels, cols, rows)))));
+"""
+
+
+def jpeg(width, height, orientation=None):
+    """A JPEG whose stored pixels are width×height: dark top half, light bottom."""
+    pixels = np.full((height, width), 230, dtype=np.uint8)
+    pixels[: height // 2] = 20
+    img = Image.fromarray(pixels).convert("RGB")
+    exif = img.getexif()
+    if orientation is not None:
+        exif[0x0112] = orientation
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", exif=exif)
+    buf.seek(0)
+    return buf
+
+
+def test_exif_orientation_turns_photo_upright():
+    # Stored landscape 40×30, shown portrait 30×40 (rotated 90° clockwise)
+    pattern = Pattern.from_image(jpeg(40, 30, orientation=6), 40)
+    assert (pattern.rows, pattern.cols) == (53, 40)
+    # The stored dark top half ends up on the right
+    assert (pattern.cells[:, :20] == 0).all() and (pattern.cells[:, 20:] == 1).all()
+
+
+def test_no_orientation_keeps_stored_shape():
+    pattern = Pattern.from_image(jpeg(40, 30), 40)
+    assert (pattern.rows, pattern.cols) == (30, 40)
+    assert (pattern.cells[:15] == 1).all() and (pattern.cells[15:] == 0).all()
+
+
+def test_row_count_rounds_half_up():
+    # 10 × 5/4 = 12.5: Math.round in the editor gives 13, round() would give 12
+    assert Pattern.from_image(Image.new("L", (4, 5), 255), 10).rows == 13
+
+
+def test_resample_averages_by_area():
+    luma = np.arange(12, dtype=np.float32).reshape(3, 4)
+    # 3 rows to 2: each output row covers one and a half source rows
+    assert np.allclose(resample_luma(luma, 2, 2), [[11 / 6, 23 / 6], [43 / 6, 55 / 6]])
+    # Halving drops an odd last row, as in the editor
+    assert np.allclose(resample_luma(luma, 1, 2), [[2.5, 4.5]])
+    assert np.allclose(resample_luma(luma, 3, 4), luma)
+    assert resample_luma(luma, 6, 8).shape == (6, 8)
+
+
+@pytest.mark.skipif(NODE is None, reason="needs node")
+def test_resample_matches_editor():
+    rng = np.random.default_rng(3)
+    h, w = 97, 131
+    luma = rng.uniform(0, 255, (h, w)).astype(np.float32)
+    sizes = [(1, 1), (7, 5), (24, 33), (48, 65), (49, 66), (97, 131), (120, 200)]
+    proc = subprocess.run(
+        [NODE, "-e", RUNNER, str(FRONTEND_DIR)],
+        input=json.dumps({"luma": luma.ravel().tolist(), "w": w, "h": h, "sizes": sizes}),
+        capture_output=True, text=True, check=True, timeout=120,
+    )
+    for (rows, cols), js in zip(sizes, json.loads(proc.stdout)):
+        ours = resample_luma(luma, rows, cols)
+        assert ours.shape == (rows, cols)
+        assert np.allclose(ours.ravel(), js, atol=1e-3)
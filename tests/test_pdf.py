@@ -0,0 +1,54 @@
+"""haekle.pdf: page split, object table and page content."""
+
+import re
+import zlib
+
+import numpy as np
+
+from haekle import Pattern
+from haekle.pdf import page_layout, pdf_bytes, write_pdf
+
+
+def objects(data):
+    """{number: (dictionary, decompressed stream or None)}, checked against the xref table."""
+    xref = int(re.search(rb"startxref\n(\d+)\n%%EOF\n$", data).group(1))
+    count = int(re.match(rb"xref\n0 (\d+)\n", data[xref:]).group(1))
+    table = data[xref:].split(b"\n")[3:3 + count - 1]
+    out = {}
+    for num, line in enumerate(table, start=1):
+        start = int(line[:10])
+        assert data[start:].startswith(f"{num} 0 obj\n".encode())
+        body = data[start:data.index(b"\nendobj\n", start)]
+        head, _, stream = body.partition(b"stream\n")
+        out[num] = (head, zlib.decompress(stream[:-len(b"\nendstream")]) if stream else None)
+    return out
+
+
+def test_rows_split_across_pages():
+    rows, cols = 130, 40
+    cells = np.zeros((rows, cols), dtype=np.uint8)
+    cells[:, 0] = 1
+    cells[::7, 5] = 2
+    data = pdf_bytes(Pattern(cells))
+    assert data.startswith(b"%PDF-1.4\n")
+    _, rows_per_page, total = page_layout(rows, cols)
+    assert total > 1
+    objs = objects(data)
+    heads = b"".join(head for head, _ in objs.values())
+    assert heads.count(b"/Type /Page ") == total
+    assert re.search(rb"/Type /Pages /Count (\d+)", heads).group(1) == str(total).encode()
+    # One filled rectangle per row (the first column) and one X per 7th row, page by page
+    contents = [stream for head, stream in objs.values() if stream and b"re\n" in stream]
+    assert len(contents) == total
+    for page, content in enumerate(contents):
+        n = min(rows_per_page, rows - page * rows_per_page)
+        first = page * rows_per_page
+        assert content.count(b" re\n") == n
+        assert content.count(b"/GX Do") == len(range(-first % 7, n, 7))
+
+
+def test_write_pdf_matches_pdf_bytes(tmp_path):
+    pattern = Pattern(np.eye(9, dtype=np.uint8) * 3)
+    path = tmp_path / "chart.pdf"
+    write_pdf(pattern, path, title="Test")
+    assert path.read_bytes() == pdf_bytes(pattern, title="Test")
@@ -0,0 +1,183 @@
+"""Several headless clients against a local relay."""
+
+import asyncio
+import random
+
+import numpy as np
+
+from haekle import ChartStore, Pattern, encode_cells
+from haekle.relay import OPS, STATE_BATCH_OPS, RelayClient, pack_ops, serve_relay, unpack_ops
+
+TIMEOUT = 5
+
+
+def run(scenario):
+    """Run scenario(url_for_room, relay) against a relay on a free port."""
+    async def main():
+        server = await serve_relay("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            await scenario(lambda room: f"ws://127.0.0.1:{port}/{room}", server.relay)
+        finally:
+            server.close()
+            await server.wait_closed()
+    asyncio.run(main())
+
+
+async def drain(client, batches):
+    # One reader per client: receive() must not run concurrently on one connection
+    for _ in range(batches):
+        await client.receive(TIMEOUT)
+
+
+def test_pack_ops_round_trip():
+    ops = [(0, 0, 1, 1, 0), (65535, 65535, 2**32 - 1, 65535, 3)]
+    data = pack_ops(ops)
+    assert data[0] == OPS
+    assert unpack_ops(data) == ops
+    assert unpack_ops(b"") == []
+    assert unpack_ops(data[:-1]) == []
+
+
+def test_concurrent_batches_converge():
+    async def scenario(url, relay):
+        clients = [await RelayClient.connect(url("chart")) for _ in range(3)]
+        assert len({c.client for c in clients}) == 3
+        rng = random.Random(1)
+        rounds = 40
+        for _ in range(rounds):
+            for c in clients:
+                # Small grid, so clients keep overwriting each other's cells
+                c.send([(rng.randrange(8), rng.randrange(8), rng.randrange(4)) for _ in range(rng.randrange(1, 12))])
+        await asyncio.gather(*(drain(c, rounds * (len(clients) - 1)) for c in clients))
+        codes = [c.codes() for c in clients]
+        assert codes[0] == codes[1] == codes[2]
+        assert len(codes[0]) == 64
+        for c in clients:
+            await c.close()
+    run(scenario)
+
+
+def test_relay_stamps_sender_id():
+    async def scenario(url, relay):
+        a = await RelayClient.connect(url("chart"))
+        b = await RelayClient.connect(url("chart"))
+        a.client = 999   # A client cannot write under another id
+        a.send([(1, 2, 3)])
+        (op,) = await b.receive(TIMEOUT)
+        assert op[:3] == (1, 2, 1) and op[3] != 999 and op[4] == 3
+        await a.close()
+        await b.close()
+    run(scenario)
+
+
+def test_late_joiner_gets_room_state():
+    async def scenario(url, relay):
+        a = await RelayClient.connect(url("chart"))
+        b = await RelayClient.connect(url("chart"))
+        a.send([(0, 0, 1), (0, 1, 2)])
+        await b.receive(TIMEOUT)
+        b.send([(0, 1, 3)])
+        await a.receive(TIMEOUT)
+        late = await RelayClient.connect(url("chart"))
+        assert late.clock == 2
+        await late.receive(TIMEOUT)
+        assert late.codes() == a.codes() == b.codes() == {(0, 0): 1, (0, 1): 3}
+        for c in (a, b, late):
+            await c.close()
+    run(scenario)
+
+
+def test_large_room_state_is_sent_in_batches():
+    async def scenario(url, relay):
+        a = await RelayClient.connect(url("chart"))
+        changes = [(r, c, 1 + (r + c) % 3) for r in range(300) for c in range(300)]
+        assert len(changes) > STATE_BATCH_OPS
+        a.send(changes)
+        while len(relay.rooms["/chart"].cells) < len(changes):
+            await asyncio.sleep(0.01)
+        late = await RelayClient.connect(url("chart"))
+        sizes = [len(await late.receive(TIMEOUT)) for _ in range(2)]
+        assert sizes == [STATE_BATCH_OPS, len(changes) - STATE_BATCH_OPS]
+        assert late.codes() == a.codes()
+        await a.close()
+        await late.close()
+    run(scenario)
+
+
+def test_rooms_are_separate_and_dropped_when_empty():
+    async def scenario(url, relay):
+        a = await RelayClient.connect(url("one"))
+        b = await RelayClient.connect(url("two"))
+        a.send([(0, 0, 1)])
+        try:
+            await b.receive(0.2)
+        except asyncio.TimeoutError:
+            pass
+        else:
+            raise AssertionError("an op crossed rooms")
+        await a.close()
+        await b.close()
+        for _ in range(100):
+            if not relay.rooms:
+                break
+            await asyncio.sleep(0.01)
+        assert relay.rooms == {}
+    run(scenario)
+
+
+def sync_own_cells(store, client, synced, version, cols):
+    """Sync like the editor in a room: the delta holds only the cells this
+    client wrote last (relay cells are their author's to sync). On a
+    conflict the stored chart is adopted without sending anything to the
+    relay, and the delta goes again. Returns the new version."""
+    while True:
+        own = {k: v[2] for k, v in client.cells.items() if v[1] == client.client and synced.get(k) != v[2]}
+        if not own:
+            return version
+        idx = np.array([r * cols + c for r, c in own], dtype="<u4")
+        reply = store.sync("chart", {"seq": 1, "base": version, "kind": "delta",
+                                     "idx": encode_cells(idx.tobytes()), "codes": encode_cells(bytes(own.values()))})
+        version = reply["version"]
+        if "snapshot" not in reply:
+            synced.update(own)
+            return version
+
+
+def test_store_sync_does_not_overwrite_newer_relay_ops(tmp_path):
+    store = ChartStore(tmp_path / "charts.db")
+    rows, cols = 4, 4
+    version = store.save("chart", Pattern(np.zeros((rows, cols), dtype=np.uint8)), 0)
+
+    async def scenario(url, relay):
+        a = await RelayClient.connect(url("chart"))
+        b = await RelayClient.connect(url("chart"))
+        synced_a, synced_b = {}, {}
+        a.send([(0, 0, 1), (1, 1, 1)])
+        await b.receive(TIMEOUT)
+        b.send([(0, 0, 2)])          # Newer than a's op on the same cell
+        await a.receive(TIMEOUT)
+        assert a.codes() == b.codes() == {(0, 0): 2, (1, 1): 1}
+
+        # b syncs first; a's delta is then stale, a adopts the stored chart
+        # and sends only (1, 1): it does not upload b's cell, nor an old one
+        vb = sync_own_cells(store, b, synced_b, version, cols)
+        va = sync_own_cells(store, a, synced_a, version, cols)
+        assert va == vb + 1
+        try:
+            await b.receive(0.2)
+        except asyncio.TimeoutError:
+            pass
+        else:
+            raise AssertionError("adopting the stored chart went out to the relay")
+
+        _, stored = store.load("chart")
+        room = a.codes()
+        assert room == b.codes() == {(0, 0): 2, (1, 1): 1}
+        assert all(stored.cells[r, c] == code for (r, c), code in room.items())
+        await a.close()
+        await b.close()
+    try:
+        run(scenario)
+    finally:
+        store.close()
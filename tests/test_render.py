@@ -0,0 +1,56 @@
+"""haekle.render: chart PNG geometry and cell drawing."""
+
+import io
+
+import numpy as np
+from PIL import Image
+
+from haekle import Pattern
+from haekle import render
+from haekle.render import OFFSET, SIZE, render_array, save_png
+
+
+def chart():
+    cells = np.zeros((12, 17), dtype=np.uint8)
+    cells[0, 0] = 1
+    cells[3, 4:9] = 1
+    cells[5, 2] = 2
+    cells[7, 11] = 3
+    cells[9:, 13:] = np.array([2, 3])[np.indices((3, 4)).sum(axis=0) % 2]
+    return Pattern(cells)
+
+
+def cell_pixels(img, r, c):
+    y, x = OFFSET + r * SIZE, OFFSET + c * SIZE
+    # Inside the cell, clear of the grid lines
+    return img[y + 2:y + SIZE - 1, x + 2:x + SIZE - 1]
+
+
+def test_size_and_cells():
+    pattern = chart()
+    img = render_array(pattern)
+    assert img.dtype == np.uint8
+    assert img.shape == (pattern.rows * SIZE + OFFSET, pattern.cols * SIZE + OFFSET)
+    assert (cell_pixels(img, 0, 0) == 0).all()
+    assert (cell_pixels(img, 3, 6) == 0).all()
+    assert (cell_pixels(img, 1, 1) == 255).all()
+    for r, c in ((5, 2), (7, 11)):
+        glyph = cell_pixels(img, r, c)
+        assert glyph.min() < 64 and glyph.max() == 255
+    assert not np.array_equal(cell_pixels(img, 5, 2), cell_pixels(img, 7, 11))
+
+
+def test_glyph_batches_do_not_change_the_image(monkeypatch):
+    pattern = chart()
+    whole = render_array(pattern)
+    monkeypatch.setattr(render, "GLYPH_BATCH", 3)
+    assert np.array_equal(render_array(pattern), whole)
+
+
+def test_save_png_round_trips():
+    pattern = chart()
+    buf = io.BytesIO()
+    save_png(pattern, buf, size=10, offset=20)
+    with Image.open(io.BytesIO(buf.getvalue())) as img:
+        assert img.mode == "L"
+        assert np.array_equal(np.asarray(img), render_array(pattern, 10, 20))
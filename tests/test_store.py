@@ -0,0 +1,94 @@
+"""ChartStore and the editor's sync protocol (haekle.store)."""
+
+import numpy as np
+import pytest
+
+from haekle import ChartStore, Pattern, VersionConflict, decode_cells, encode_cells, pack_runs, unpack_runs
+from haekle.grid import MAX_CELLS, MAX_SIDE
+
+CHART = "0123456789abcdef"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ChartStore(tmp_path / "charts.db")
+    yield store
+    store.close()
+
+
+def snapshot_msg(cells, base, seq=1):
+    rows, cols = cells.shape
+    return {"seq": seq, "base": base, "kind": "snapshot", "rows": rows, "cols": cols,
+            "cells": encode_cells(pack_runs(cells.tobytes()))}
+
+
+def delta_msg(changes, base, seq=2):
+    idx = np.array([i for i, _ in changes], dtype="<u4")
+    return {"seq": seq, "base": base, "kind": "delta", "idx": encode_cells(idx.tobytes()),
+            "codes": encode_cells(bytes(code for _, code in changes))}
+
+
+def reply_cells(reply):
+    snap = reply["snapshot"]
+    cells = unpack_runs(decode_cells(snap["cells"]), snap["rows"] * snap["cols"])
+    return np.frombuffer(cells, dtype=np.uint8).reshape(snap["rows"], snap["cols"])
+
+
+def test_snapshot_then_delta(store):
+    cells = np.zeros((5, 7), dtype=np.uint8)
+    cells[1, 2] = 3
+    assert store.sync(CHART, snapshot_msg(cells, 0)) == {"chart": CHART, "version": 1, "ack": 1}
+    assert store.sync(CHART, delta_msg([(0, 1), (34, 2)], 1)) == {"chart": CHART, "version": 2, "ack": 2}
+    version, pattern = store.load(CHART)
+    cells[0, 0], cells[4, 6] = 1, 2
+    assert version == 2 and np.array_equal(pattern.cells, cells)
+    assert store.sync(CHART, {"seq": 3, "base": 2, "kind": "ack"}) == {"chart": CHART, "version": 2, "ack": 3}
+
+
+def test_stale_base_gets_the_stored_chart(store):
+    cells = np.zeros((3, 3), dtype=np.uint8)
+    store.sync(CHART, snapshot_msg(cells, 0))
+    store.sync(CHART, delta_msg([(4, 1)], 1))
+    for msg in (delta_msg([(0, 2)], 1, seq=7), snapshot_msg(cells, 1, seq=7), {"seq": 7, "base": 1, "kind": "ack"}):
+        reply = store.sync(CHART, msg)
+        assert reply["version"] == 2 and reply["ack"] == 7
+        assert reply_cells(reply)[1, 1] == 1 and reply_cells(reply).sum() == 1
+    with pytest.raises(VersionConflict):
+        store.save(CHART, Pattern(cells), 1)
+
+
+def test_first_delta_without_a_chart_asks_for_a_snapshot(store):
+    reply = store.sync(CHART, delta_msg([(0, 1)], 0))
+    assert reply == {"chart": CHART, "version": 0, "ack": 2, "snapshot": None}
+
+
+MALFORMED = [
+    None,
+    ["not", "a", "dict"],
+    {"seq": 9, "kind": "delta"},                                            # No base, idx, codes
+    {"seq": 9, "base": "1", "kind": "ack"},
+    {"seq": 9, "base": 1, "kind": "delta", "idx": 5, "codes": "AA=="},
+    {"seq": 9, "base": 1, "kind": "delta", "idx": "AAAA", "codes": None},
+    {"seq": 9, "base": 1, "kind": "delta", "idx": "!!!", "codes": "AA=="},  # Not base64
+    {"seq": 9, "base": 1, "kind": "delta", "idx": encode_cells(b"\0\0\0"), "codes": "AA=="},
+    {"seq": 9, "base": 1, "kind": "delta", "idx": encode_cells(b"\0\0\0\0\0\0\0\0"), "codes": "AA=="},
+    {"seq": 9, "base": 1, "kind": "delta", "idx": encode_cells(b"\0\0\0\0"), "codes": encode_cells(b"\x07")},
+    {"seq": 9, "base": 1, "kind": "delta", "idx": encode_cells(b"\xff\0\0\0"), "codes": encode_cells(b"\x01")},
+    {"seq": 9, "base": 1, "kind": "snapshot", "rows": 3},
+    {"seq": 9, "base": 1, "kind": "snapshot", "rows": 3.0, "cols": 3, "cells": ""},
+    {"seq": 9, "base": 1, "kind": "snapshot", "rows": 0, "cols": 3, "cells": ""},
+    {"seq": 9, "base": 1, "kind": "snapshot", "rows": MAX_SIDE + 1, "cols": 1, "cells": ""},
+    {"seq": 9, "base": 1, "kind": "snapshot", "rows": MAX_SIDE, "cols": MAX_CELLS // MAX_SIDE + 1, "cells": ""},
+    {"seq": 9, "base": 1, "kind": "snapshot", "rows": 3, "cols": 3, "cells": encode_cells(b"\xfd\x80")},
+    {"seq": 9, "base": 1, "kind": "resize"},
+]
+
+
+@pytest.mark.parametrize("msg", MALFORMED)
+def test_malformed_message_is_answered_like_a_conflict(store, msg):
+    cells = np.arange(9, dtype=np.uint8).reshape(3, 3) % 4
+    store.sync(CHART, snapshot_msg(cells, 0))
+    reply = store.sync(CHART, msg)
+    assert reply["version"] == 1 and reply["ack"] == (9 if isinstance(msg, dict) else None)
+    assert np.array_equal(reply_cells(reply), cells)
+    assert np.array_equal(store.load(CHART)[1].cells, cells)